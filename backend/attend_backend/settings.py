@@ -10,11 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +32,8 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv("DJANGO_DEBUG", "False").lower() == "true"
 
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = [
     host.strip()
     for host in os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
@@ -57,6 +61,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'attendance.middleware.RequestTimingMiddleware',
+    'attendance.middleware.MetricsMiddleware',
+    'attendance.middleware.NPlusOneMiddleware',
+    'attendance.middleware.CompressionMiddleware',
+    'attendance.middleware.RateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -98,6 +107,22 @@ DATABASES = {
 }
 
 
+# Cache
+# Defaults to per-process memory; multi-worker deployments should point this
+# at a shared backend, e.g. django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# Worker processes serving the app (gunicorn.conf.py sets it from its workers
+# setting). Above one, Idempotency-Key replays need a shared cache, and scans
+# confirm every cached enrollment in the database unless the cache is shared
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -118,12 +143,22 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',  # Keep for admin
+        'attendance.authentication.TimedJWTAuthentication',
+        'attendance.authentication.TimedSessionAuthentication',  # Keep for admin
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON when installed, stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'attendance.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'attendance.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -133,6 +168,79 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Monthly range partitioning of attendance_records (PostgreSQL only), applied
+# by migration 0006; convert later with create_attendance_partitions --convert
+ATTENDANCE_RECORDS_PARTITIONED = os.getenv("ATTENDANCE_RECORDS_PARTITIONED", "False").lower() == "true"
+
+# Request timing (Server-Timing header + JSON log line per sampled request)
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "False").lower() == "true"
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv("REQUEST_TIMING_SAMPLE_RATE", "1.0"))
+REQUEST_TIMING_SLOW_MS = float(os.getenv("REQUEST_TIMING_SLOW_MS", "500"))
+
+# Idempotency-Key replays of write endpoints are kept in the default cache
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 60 * 60)))
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Session rows and class rosters read by scans and the teacher's polling are
+# cached until the session ends plus this many seconds (see session_cache.py)
+SESSION_CACHE_TIMEOUT = int(os.getenv("SESSION_CACHE_TIMEOUT", "900"))
+
+# Token-bucket rate limits, checked before authentication. Backend 'cache'
+# shares buckets across workers through CACHES; 'local' keeps them per process.
+# 'login' counts per account and address, 'login_account' per account from any
+# address and 'login_address' per address only.
+# Behind reverse proxies, RATE_LIMIT_TRUSTED_PROXIES is how many of them append
+# to X-Forwarded-For; clients are told apart by the hop the outermost one added
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true" and not TESTING
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "cache")
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+RATE_LIMITS = {
+    'scan': os.getenv("RATE_LIMIT_SCAN", "20/min"),
+    'login': os.getenv("RATE_LIMIT_LOGIN", "10/min"),
+    'login_account': os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "30/min"),
+    'login_address': os.getenv("RATE_LIMIT_LOGIN_ADDRESS", "300/min"),
+    'history': os.getenv("RATE_LIMIT_HISTORY", "30/min"),
+}
+RATE_LIMIT_VIEWS = {
+    'scan': ['mark_attendance', 'sync_offline_scans'],
+    'login': ['token_obtain_pair'],
+    'history': ['student_attendance_history', 'teacher_attendance_history'],
+}
+
+# Response compression (gzip, or brotli when the brotli package is installed)
+RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "True").lower() == "true"
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_COMPRESSION_GZIP_LEVEL = int(os.getenv("RESPONSE_COMPRESSION_GZIP_LEVEL", "6"))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.getenv("RESPONSE_COMPRESSION_BROTLI_QUALITY", "5"))
+RESPONSE_COMPRESSION_CONTENT_TYPES = ['application/json']
+
+# Prometheus metrics; set PROMETHEUS_MULTIPROC_DIR for multi-worker servers.
+# /api/v1/metrics/ is only served to scrapers sending METRICS_TOKEN as a bearer token
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# N+1 query detection: raise in DEBUG and tests, sample and log in production
+NPLUSONE_RAISE = DEBUG or TESTING
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "5"))
+NPLUSONE_SAMPLE_RATE = float(os.getenv("NPLUSONE_SAMPLE_RATE", "0.01"))
+# Admin changelists have query budgets in tests; change/delete pages look up
+# widget labels and related object names per row by design.
+NPLUSONE_IGNORE_VIEWS = ['admin:']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'attendance': {
+            'handlers': ['console'],
+            'level': os.getenv("ATTENDANCE_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -182,3 +290,4 @@ CSRF_TRUSTED_ORIGINS = [
 
 # CORS settings
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
@@ -21,24 +21,38 @@ from attendance.views import (
     MeView, 
     MyTokenObtainPairView, 
     ping,
+    metrics,
     class_list_create,
     class_detail,
+    clone_class,
+    rollover_classes,
     get_class_students,
+    get_class_attendance_matrix,
+    get_class_attendance_trend,
+    get_class_at_risk_students,
     add_student_to_class,
     remove_student_from_class,
+    bulk_enroll_students,
+    bulk_unenroll_students,
     create_session,
     get_active_sessions,
     get_session_details,
     mark_attendance,
+    sync_offline_scans,
     end_session,
     get_student_enrolled_classes,  
     get_student_attendance_history,
+    get_student_dashboard,
     check_student_by_email,
+    check_students_by_email,
     update_student_in_class,
     get_teacher_attendance_history,
+    get_defaulter_report,
     get_session_attendance_details,
     update_attendance_status,
+    bulk_update_attendance_status,
     manual_mark_attendance,
+    bulk_manual_mark_attendance,
 )
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -53,36 +67,50 @@ urlpatterns = [
     path('api/v1/auth/register/', RegisterView.as_view(), name='register'),
     path('api/v1/auth/me/', MeView.as_view(), name='me'),
     path('api/v1/auth/check-student/', check_student_by_email, name='check-student'),  
+    path('api/v1/auth/check-students/', check_students_by_email, name='check-students'),
     
     # Class management (Teacher)
     path('api/v1/classes/', class_list_create, name='class_list_create'),
     path('api/v1/classes/<int:class_id>/', class_detail, name='class_detail'),
+    path('api/v1/classes/<int:class_id>/clone/', clone_class, name='clone_class'),
+    path('api/v1/classes/rollover/', rollover_classes, name='rollover_classes'),
     path('api/v1/classes/<int:class_id>/students/', get_class_students, name='class_students'),
+    path('api/v1/classes/<int:class_id>/attendance-matrix/', get_class_attendance_matrix, name='class_attendance_matrix'),
+    path('api/v1/classes/<int:class_id>/attendance-trend/', get_class_attendance_trend, name='class_attendance_trend'),
+    path('api/v1/classes/<int:class_id>/at-risk/', get_class_at_risk_students, name='class_at_risk_students'),
     path('api/v1/classes/<int:class_id>/add-student/', add_student_to_class, name='add_student'),
     path('api/v1/classes/<int:class_id>/remove-student/<int:student_id>/', remove_student_from_class, name='remove_student'),
     path('api/v1/classes/<int:class_id>/update-student/<int:student_id>/', update_student_in_class, name='update_student'),
+    path('api/v1/classes/<int:class_id>/enroll-students/', bulk_enroll_students, name='bulk_enroll_students'),
+    path('api/v1/classes/<int:class_id>/unenroll-students/', bulk_unenroll_students, name='bulk_unenroll_students'),
 
     # Student enrolled classes
     path('api/v1/students/my-classes/', get_student_enrolled_classes, name='student_enrolled_classes'),
     path('api/v1/students/my-attendance/', get_student_attendance_history, name='student_attendance_history'),
+    path('api/v1/students/dashboard/', get_student_dashboard, name='student_dashboard'),
     
     # Session management
     path('api/v1/sessions/create/', create_session, name='create_session'),
     path('api/v1/sessions/active/', get_active_sessions, name='active_sessions'),
     path('api/v1/sessions/<uuid:session_id>/', get_session_details, name='session_details'),
     path('api/v1/sessions/<uuid:session_id>/mark/', mark_attendance, name='mark_attendance'),
+    path('api/v1/attendance/sync/', sync_offline_scans, name='sync_offline_scans'),
     path('api/v1/sessions/<uuid:session_id>/end/', end_session, name='end_session'),
     
     # Manual mark attendance
     path('api/v1/sessions/<uuid:session_id>/mark-student/', manual_mark_attendance, name='manual_mark_attendance'),
+    path('api/v1/sessions/<uuid:session_id>/mark-students/', bulk_manual_mark_attendance, name='bulk_manual_mark_attendance'),
     
     
     # Teacher attendance history
     path('api/v1/teachers/attendance-history/', get_teacher_attendance_history, name='teacher_attendance_history'),
+    path('api/v1/teachers/reports/defaulters/', get_defaulter_report, name='defaulter_report'),
     path('api/v1/attendance/<int:record_id>/update/', update_attendance_status, name='update_attendance'),
+    path('api/v1/attendance/bulk-update/', bulk_update_attendance_status, name='bulk_update_attendance'),
     path('api/v1/sessions/<uuid:session_id>/attendance/', get_session_attendance_details, name='session_attendance_details'),
 
     
     # Utility
     path('api/v1/ping/', ping, name='ping'),
+    path('api/v1/metrics/', metrics, name='metrics'),
 ]
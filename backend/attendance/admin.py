@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import User, StudentProfile, Class, Enrollment, AttendanceSession, AttendanceRecord
 
@@ -20,6 +21,7 @@ class UserAdmin(BaseUserAdmin):
 class StudentProfileAdmin(admin.ModelAdmin):
     list_display = ('get_username', 'roll_no', 'get_email')
     search_fields = ('student__username', 'roll_no', 'student__email')  # Fixed: was 'user__'
+    list_select_related = ('student',)
     
     def get_username(self, obj):
         return obj.student.username  # Fixed: was obj.user.username
@@ -43,6 +45,10 @@ class ClassAdmin(admin.ModelAdmin):
     search_fields = ('class_code', 'class_name', 'teacher__username')
     inlines = [EnrollmentInline]
     
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return qs.select_related('teacher').annotate(enrollment_count=Count('enrollments'))
+    
     def get_student_count(self, obj):
         return obj.student_count
     get_student_count.short_description = 'Students'
@@ -54,6 +60,7 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_filter = ('enrolled_at', 'class_obj')
     search_fields = ('class_obj__class_code', 'student__username')
     raw_id_fields = ('class_obj', 'student')
+    list_select_related = ('class_obj', 'student')
 
 
 # @admin.register(AttendanceSession)
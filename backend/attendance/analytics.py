@@ -0,0 +1,176 @@
+"""
+Attendance analytics on a dense students x sessions matrix.
+
+A class's completed sessions are loaded with one records query (plus one
+for the bitmaps of compacted sessions) into an int8 matrix (rows follow the roster, columns run chronologically):
+1 = present, 0 = absent, -1 = no record (e.g. enrolled after the session).
+Rates, rolling windows and absence streaks are then computed with
+vectorized NumPy operations instead of per-record Python loops.
+"""
+from collections import namedtuple
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+from .compact import statuses
+from .models import AttendanceRecord, AttendanceSession, CompactSessionAttendance, Enrollment
+
+PRESENT, ABSENT, NO_RECORD = 1, 0, -1
+
+ClassMatrix = namedtuple('ClassMatrix', 'students sessions values')
+
+
+def _positions(keys, column):
+    """Index of each column value in keys, and a mask of values that were found"""
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    found = np.searchsorted(ordered, column)
+    found[found == len(keys)] = 0
+    valid = ordered[found] == column
+    return order[found], valid
+
+
+def build_matrix(student_ids, session_ids, records):
+    """
+    Dense matrix from (student_id, session_pk, status) rows.
+    student_ids / session_ids give the row and column order; records for
+    students or sessions outside them are ignored.
+    """
+    student_keys = np.asarray(student_ids, dtype=np.int64)
+    session_keys = np.asarray(session_ids, dtype=np.int64)
+    values = np.full((len(student_keys), len(session_keys)), NO_RECORD, dtype=np.int8)
+
+    if not values.size:
+        return values
+    records = list(records)
+    if not records:
+        return values
+    # One pass per column; zip(*records) is several times slower at this size
+    count = len(records)
+    rows, row_valid = _positions(student_keys, np.fromiter(map(itemgetter(0), records), np.int64, count))
+    cols, col_valid = _positions(session_keys, np.fromiter(map(itemgetter(1), records), np.int64, count))
+    present = np.fromiter((r[2] == 'present' for r in records), np.int8, count)
+
+    valid = row_valid & col_valid
+    values[rows[valid], cols[valid]] = present[valid]
+    return values
+
+
+def load_class_matrix(class_obj, date_from=None, date_to=None):
+    """
+    ClassMatrix for a class's completed sessions.
+    students: (id, username, roll_no) in roll number order
+    sessions: (pk, session_id, start_time) in chronological order
+    """
+    sessions = AttendanceSession.objects.filter(class_obj=class_obj, status='completed')
+    if date_from:
+        sessions = sessions.filter(start_time__date__gte=date_from)
+    if date_to:
+        sessions = sessions.filter(start_time__date__lte=date_to)
+    records = chain(
+        AttendanceRecord.objects.filter(session__in=sessions).values_list('student_id', 'session_id', 'status'),
+        statuses(CompactSessionAttendance.objects.filter(session__in=sessions).values_list(
+            'session_id', 'student_ids', 'present'
+        )),
+    )
+    sessions = list(sessions.order_by('start_time', 'id').values_list('id', 'session_id', 'start_time'))
+
+    students = list(Enrollment.objects.filter(class_obj=class_obj).order_by(
+        'student__student_profile__roll_no', 'student__username'
+    ).values_list('student_id', 'student__username', 'student__student_profile__roll_no'))
+
+    values = build_matrix([s[0] for s in students], [s[0] for s in sessions], records)
+    return ClassMatrix(students, sessions, values)
+
+
+def attendance_rates(values):
+    """Percentage present of the sessions each student has a record for (NaN if none)"""
+    present = (values == PRESENT).sum(axis=1)
+    marked = (values != NO_RECORD).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return present * 100.0 / marked
+
+
+def rolling_rates(values, window):
+    """
+    Attendance percentage over every run of `window` consecutive sessions.
+    Returns shape (students, sessions - window + 1); NaN where a student has
+    no records in the window.
+    """
+    if window < 1 or values.shape[1] < window:
+        return np.empty((values.shape[0], 0))
+    zero = np.zeros((values.shape[0], 1), dtype=np.int64)
+    present = np.concatenate([zero, np.cumsum(values == PRESENT, axis=1)], axis=1)
+    marked = np.concatenate([zero, np.cumsum(values != NO_RECORD, axis=1)], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (present[:, window:] - present[:, :-window]) * 100.0 / (marked[:, window:] - marked[:, :-window])
+
+
+def absence_streaks(values):
+    """
+    (longest, current) runs of consecutive absences per student.
+    current is the run ending at the latest session; a missing record breaks a run.
+    """
+    students, sessions = values.shape
+    absent = np.zeros((students, sessions + 2), dtype=np.int8)
+    absent[:, 1:-1] = values == ABSENT
+    edges = np.diff(absent, axis=1)
+    # Row-major order pairs each run's start with its end
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    lengths = end_cols - start_cols
+
+    longest = np.zeros(students, dtype=np.int64)
+    np.maximum.at(longest, start_rows, lengths)
+    current = np.zeros(students, dtype=np.int64)
+    trailing = end_cols == sessions
+    current[start_rows[trailing]] = lengths[trailing]
+    return longest, current
+
+
+def analyze(values, window=5):
+    """
+    Per-student arrays: overall rate, latest window rate, the window before
+    it, their delta, and the longest and current absence streaks.
+    """
+    students = values.shape[0]
+    rolling = rolling_rates(values, window)
+    missing = np.full(students, np.nan)
+    recent = rolling[:, -1] if rolling.shape[1] else missing
+    previous = rolling[:, -1 - window] if rolling.shape[1] > window else missing
+    longest, current = absence_streaks(values)
+    return {
+        'attendance_rate': attendance_rates(values),
+        'recent_rate': recent,
+        'previous_rate': previous,
+        'delta': recent - previous,
+        'longest_absence_streak': longest,
+        'current_absence_streak': current,
+    }
+
+
+def at_risk(values, streak=3, window=5, drop=20.0):
+    """
+    Indices of students currently absent `streak` sessions in a row or whose
+    latest-window rate fell by at least `drop` points, with the analysis and
+    each flagged student's reasons. Ordered by current streak, then delta.
+    """
+    stats = analyze(values, window)
+    on_streak = stats['current_absence_streak'] >= streak
+    with np.errstate(invalid='ignore'):
+        declining = stats['delta'] <= -drop
+    flagged = np.flatnonzero(on_streak | declining)
+
+    delta = np.nan_to_num(stats['delta'][flagged], nan=0.0)
+    flagged = flagged[np.lexsort((delta, -stats['current_absence_streak'][flagged]))]
+    reasons = {
+        int(i): [reason for reason, hit in (('absence_streak', on_streak[i]), ('declining', declining[i])) if hit]
+        for i in flagged
+    }
+    return flagged, stats, reasons
+
+
+def percentage(value):
+    """JSON-friendly percentage: rounded to 2 places, None for NaN"""
+    return None if np.isnan(value) else round(float(value), 2)
@@ -0,0 +1,107 @@
+"""
+Archival of finished semesters.
+
+Completed sessions and their records are moved from attendance_sessions /
+attendance_records into the *_archive tables with INSERT ... SELECT, one
+chunk of sessions per transaction, so the live tables stay small and no row
+passes through Python. Each chunk also adds its per-(class, student) counts
+to attendance_archive_totals. Archived rows keep their ids and field names,
+so history views can read them with the same filters and serializers.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivedAttendanceRecord, ArchivedAttendanceSession, ArchivedAttendanceTotal,
+    AttendanceRecord, AttendanceSession,
+)
+
+ARCHIVE_CHUNK_SIZE = 200
+
+
+def archivable_sessions(semesters=None, before=None):
+    """
+    Completed sessions of the given semesters and/or starting before a date.
+    Compacted sessions have no records to move and stay where they are.
+    """
+    sessions = AttendanceSession.objects.filter(status='completed', compact_attendance__isnull=True)
+    if semesters:
+        sessions = sessions.filter(class_obj__semester__in=semesters)
+    if before:
+        sessions = sessions.filter(start_time__date__lt=before)
+    return sessions
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _columns(model, names):
+    return ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in names)
+
+
+def _archive_chunk(cursor, session_ids, archived_at):
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    quote = connection.ops.quote_name
+    record_session = quote(AttendanceRecord._meta.get_field('session').column)
+
+    session_fields = ['id', 'session_id', 'class_obj', 'teacher', 'start_time', 'duration_minutes', 'end_time', 'status']
+    cursor.execute(
+        f'INSERT INTO {_table(ArchivedAttendanceSession)} '
+        f'({_columns(ArchivedAttendanceSession, session_fields + ["archived_at"])}) '
+        f'SELECT {_columns(AttendanceSession, session_fields)}, %s '
+        f'FROM {_table(AttendanceSession)} WHERE {quote("id")} IN ({placeholders})',
+        [archived_at, *session_ids]
+    )
+    sessions = cursor.rowcount
+
+    record_fields = ['id', 'session', 'student', 'marked_at', 'status']
+    cursor.execute(
+        f'INSERT INTO {_table(ArchivedAttendanceRecord)} ({_columns(ArchivedAttendanceRecord, record_fields)}) '
+        f'SELECT {_columns(AttendanceRecord, record_fields)} '
+        f'FROM {_table(AttendanceRecord)} WHERE {record_session} IN ({placeholders})',
+        session_ids
+    )
+    records = cursor.rowcount
+
+    totals = _table(ArchivedAttendanceTotal)
+    class_col = quote(AttendanceSession._meta.get_field('class_obj').column)
+    student_col = quote(AttendanceRecord._meta.get_field('student').column)
+    cursor.execute(
+        f'INSERT INTO {totals} ({_columns(ArchivedAttendanceTotal, ["class_obj", "student", "present", "absent"])}) '
+        f'SELECT s.{class_col}, r.{student_col}, '
+        f"SUM(CASE WHEN r.{quote('status')} = 'present' THEN 1 ELSE 0 END), "
+        f"SUM(CASE WHEN r.{quote('status')} = 'absent' THEN 1 ELSE 0 END) "
+        f'FROM {_table(AttendanceRecord)} r INNER JOIN {_table(AttendanceSession)} s ON r.{record_session} = s.{quote("id")} '
+        f'WHERE r.{record_session} IN ({placeholders}) '
+        f'GROUP BY s.{class_col}, r.{student_col} '
+        f'ON CONFLICT ({_columns(ArchivedAttendanceTotal, ["class_obj", "student"])}) DO UPDATE SET '
+        f'{quote("present")} = {totals}.{quote("present")} + EXCLUDED.{quote("present")}, '
+        f'{quote("absent")} = {totals}.{quote("absent")} + EXCLUDED.{quote("absent")}',
+        session_ids
+    )
+
+    AttendanceRecord.objects.filter(session_id__in=session_ids).delete()
+    AttendanceSession.objects.filter(id__in=session_ids).delete()
+    return sessions, records
+
+
+def archive_sessions(sessions, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """
+    Move sessions (a queryset) and their records into the archive tables.
+    Each chunk commits on its own, so an interrupted run can simply be re-run.
+    progress: optional callable receiving (sessions, records) after each chunk.
+    Returns the total (sessions, records) moved.
+    """
+    session_ids = list(sessions.order_by('id').values_list('id', flat=True))
+    archived_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    moved_sessions = moved_records = 0
+    for start in range(0, len(session_ids), chunk_size):
+        chunk = session_ids[start:start + chunk_size]
+        with transaction.atomic(), connection.cursor() as cursor:
+            sessions_done, records_done = _archive_chunk(cursor, chunk, archived_at)
+        moved_sessions += sessions_done
+        moved_records += records_done
+        if progress:
+            progress(moved_sessions, moved_records)
+    return moved_sessions, moved_records
@@ -0,0 +1,38 @@
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .timing import timed
+
+
+class TimedAuthenticationMixin:
+    """Record authentication as the 'auth' phase of the request timing"""
+
+    def authenticate(self, request):
+        with timed(request, 'auth'):
+            return super().authenticate(request)
+
+
+class TimedJWTAuthentication(TimedAuthenticationMixin, JWTAuthentication):
+    pass
+
+
+class TimedSessionAuthentication(TimedAuthenticationMixin, SessionAuthentication):
+    pass
+
+
+def token_user_id(request):
+    """
+    User id claim of a valid bearer access token, or None.
+    Verifies the signature and expiry only, without loading the user, for
+    code that runs before authentication (idempotency replays, rate limits).
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(header[1])[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
@@ -0,0 +1,199 @@
+"""
+Compact storage for finalized sessions.
+
+A completed session normally keeps one AttendanceRecord per enrolled
+student. Compacting replaces them with a single CompactSessionAttendance row:
+
+- student_ids: the sorted roster snapshot as 64-bit deltas, zlib-compressed
+- present: one bit per roster position, zlib-compressed
+- present_offsets: for each present student in roster order, seconds after
+  the session started that the mark was made
+- absent_offsets: the same for each absent student
+
+Mark timestamps are rounded to the second and record ids are dropped; the
+roster and every status are kept exactly. Every (class, student) pair on a snapshot is also kept in
+CompactRosterStudent, which is how a student's history finds the rows
+without relying on the current enrollment. expand() turns a row back into record-like objects carrying the
+attributes history views and serializers read from AttendanceRecord;
+statuses() yields bare (student_id, key, status) rows for readers that
+only count or tabulate marks.
+"""
+import zlib
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceSession, CompactRosterStudent, CompactSessionAttendance
+
+User = get_user_model()
+
+COMPACT_CHUNK_SIZE = 100
+
+
+class CompactRecord:
+    """Read-only stand-in for an AttendanceRecord expanded from a compact row"""
+    __slots__ = ('session', 'student_id', 'student', 'status', 'marked_at')
+    id = None  # The original record ids are not kept
+
+    def __init__(self, session, student_id, status, marked_at, student=None):
+        self.session = session
+        self.student_id = student_id
+        self.student = student
+        self.status = status
+        self.marked_at = marked_at
+
+
+def _pack(values):
+    return zlib.compress(array('q', values).tobytes())
+
+
+def _unpack(blob):
+    values = array('q')
+    values.frombytes(zlib.decompress(bytes(blob)))
+    return values
+
+
+def encode_ids(student_ids):
+    ids = sorted(student_ids)
+    return _pack([b - a for a, b in zip([0] + ids, ids)])
+
+
+def decode_ids(blob):
+    return list(accumulate(_unpack(blob)))
+
+
+def encode_bits(flags):
+    bits = bytearray((len(flags) + 7) // 8)
+    for position, flag in enumerate(flags):
+        if flag:
+            bits[position >> 3] |= 1 << (position & 7)
+    return zlib.compress(bytes(bits))
+
+
+def decode_bits(blob, count):
+    bits = zlib.decompress(bytes(blob))
+    return [bool(bits[position >> 3] >> (position & 7) & 1) for position in range(count)]
+
+
+def encode_offsets(start_time, times):
+    """Whole seconds of each time after start_time"""
+    return _pack([round((marked_at - start_time).total_seconds()) for marked_at in times])
+
+
+def decode_offsets(blob):
+    return list(_unpack(blob))
+
+
+def build_compact(session, records):
+    """CompactSessionAttendance for a session from its (student_id, status, marked_at) rows"""
+    records = sorted(records)
+    present = [record_status == 'present' for _, record_status, _ in records]
+    present_times = [marked_at for _, record_status, marked_at in records if record_status == 'present']
+    absent_times = [marked_at for _, record_status, marked_at in records if record_status != 'present']
+    return CompactSessionAttendance(
+        session=session,
+        student_ids=encode_ids([student_id for student_id, _, _ in records]),
+        present=encode_bits(present),
+        present_offsets=encode_offsets(session.start_time, present_times),
+        absent_offsets=encode_offsets(session.start_time, absent_times),
+        present_count=len(present_times),
+        absent_count=len(absent_times),
+    )
+
+
+def expand(compact, session=None, student_id=None):
+    """
+    CompactRecords for a compact row in roster order, or only the one for
+    student_id (an empty list when that student was not on the roster).
+    """
+    session = session or compact.session
+    ids = decode_ids(compact.student_ids)
+    present = decode_bits(compact.present, len(ids))
+    offsets = {'present': decode_offsets(compact.present_offsets), 'absent': decode_offsets(compact.absent_offsets)}
+
+    def record(position, present_before):
+        # Offsets are kept per status, in roster order
+        record_status = 'present' if present[position] else 'absent'
+        offset_index = present_before if present[position] else position - present_before
+        marked_at = session.start_time + timedelta(seconds=offsets[record_status][offset_index])
+        return CompactRecord(session, ids[position], record_status, marked_at)
+
+    if student_id is not None:
+        position = bisect_left(ids, student_id)
+        if position == len(ids) or ids[position] != student_id:
+            return []
+        return [record(position, sum(present[:position]))]
+
+    records = []
+    present_before = 0
+    for position in range(len(ids)):
+        records.append(record(position, present_before))
+        present_before += present[position]
+    return records
+
+
+def with_students(records):
+    """Load .student (and its profile) on expanded records with one query; returns records"""
+    students = User.objects.select_related('student_profile').in_bulk({record.student_id for record in records})
+    for record in records:
+        record.student = students[record.student_id]
+    return records
+
+
+def statuses(rows):
+    """
+    (student_id, key, status) for every roster position of (key, student_ids,
+    present) rows, e.g. compact values_list('session_id', 'student_ids', 'present')
+    """
+    for key, student_ids, present in rows:
+        ids = decode_ids(student_ids)
+        for student_id, flag in zip(ids, decode_bits(present, len(ids))):
+            yield student_id, key, 'present' if flag else 'absent'
+
+
+def compactable_sessions(older_than_days=30):
+    """Completed, not yet compacted sessions that ended more than older_than_days ago"""
+    return AttendanceSession.objects.filter(
+        status='completed',
+        end_time__lt=timezone.now() - timedelta(days=older_than_days),
+        compact_attendance__isnull=True,
+    )
+
+
+def compact_sessions(sessions, chunk_size=COMPACT_CHUNK_SIZE):
+    """
+    Replace the records of sessions (a queryset) with compact rows, one
+    transaction per chunk. Returns (sessions compacted, records removed).
+    """
+    session_ids = list(sessions.order_by('id').values_list('id', flat=True))
+    compacted = removed = 0
+    for start in range(0, len(session_ids), chunk_size):
+        chunk = session_ids[start:start + chunk_size]
+        with transaction.atomic():
+            chunk_sessions = AttendanceSession.objects.select_for_update().in_bulk(chunk)
+            rows = {pk: [] for pk in chunk_sessions}
+            for session_pk, student_id, record_status, marked_at in AttendanceRecord.objects.filter(
+                session_id__in=chunk
+            ).values_list('session_id', 'student_id', 'status', 'marked_at'):
+                rows[session_pk].append((student_id, record_status, marked_at))
+            CompactSessionAttendance.objects.bulk_create(
+                build_compact(chunk_sessions[pk], records) for pk, records in rows.items()
+            )
+            CompactRosterStudent.objects.bulk_create(
+                [
+                    CompactRosterStudent(class_obj_id=class_id, student_id=student_id)
+                    for class_id, student_id in {
+                        (chunk_sessions[pk].class_obj_id, student_id)
+                        for pk, records in rows.items() for student_id, _, _ in records
+                    }
+                ],
+                ignore_conflicts=True,
+            )
+            removed += AttendanceRecord.objects.filter(session_id__in=chunk).delete()[0]
+            compacted += len(rows)
+    return compacted, removed
@@ -0,0 +1,80 @@
+"""
+Content negotiation and encoders for response compression.
+
+gzip is always available; brotli is offered only when the optional brotli
+package is installed. Streamed responses use incremental compressors that
+flush after every chunk, so clients still receive data as it is produced.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used without it
+    brotli = None
+
+GZIP_WBITS = zlib.MAX_WBITS | 16  # zlib stream with a gzip header and trailer
+
+
+def supported_encodings():
+    """Encodings this server can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header value"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """The supported encoding the client weights highest, or None"""
+    accepted = accepted_encodings(header or '')
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(encoding, data, gzip_level=6, brotli_quality=5):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """Incremental compressor: feed() returns what can be sent after each chunk"""
+
+    def __init__(self, encoding, gzip_level=6, brotli_quality=5):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, GZIP_WBITS)
+
+    def feed(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
@@ -0,0 +1,88 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+first response back instead of a second execution. Keys are scoped to the
+user of the JWT access token, which is verified statelessly (signature and
+expiry, no user lookup), so a replay is answered from the cache without
+touching the database.
+
+Stored entries hold a fingerprint of the method, path and body: reusing a
+key for a different request is rejected with 422. While the first request
+is still running, retries get 409. Server errors are not stored, so they
+can be retried. Requests without a key or a bearer token run as usual.
+
+Stored responses and the in-flight lock must be visible to every worker, so
+the default cache has to be shared (e.g. redis) once WEB_CONCURRENCY is above
+one. With a per-process LocMemCache there, keys are ignored rather than
+replayed by one worker and executed again by another.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .authentication import token_user_id
+from .metrics import record_cache
+from .session_cache import cache_is_shared
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def _error(message, status_code):
+    return HttpResponse(json.dumps({'error': message}), status=status_code, content_type='application/json')
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on a DRF function view"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400)
+        user_id = token_user_id(request)
+        if user_id is None or not cache_is_shared():
+            return view(request, *args, **kwargs)
+
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        cache_key = f'idempotency:{user_id}:{digest}'
+        lock_key = f'{cache_key}:lock'
+        fingerprint = hashlib.sha256(
+            b'\n'.join([request.method.encode(), request.path.encode(), request.body])
+        ).hexdigest()
+
+        stored = cache.get(cache_key)
+        record_cache('idempotency', stored is not None)
+        if stored is not None:
+            if stored['fingerprint'] != fingerprint:
+                return _error('Idempotency-Key was already used for a different request', 422)
+            response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+            response[REPLAY_HEADER] = 'true'
+            return response
+
+        if not cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return _error('A request with this Idempotency-Key is still being processed', 409)
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }, settings.IDEMPOTENCY_KEY_TTL)
+        finally:
+            cache.delete(lock_key)
+        return response
+
+    return wrapper
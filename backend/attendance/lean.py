@@ -0,0 +1,166 @@
+"""
+Lean read serialization for hot list endpoints.
+
+A RowSerializer maps values_list() tuples straight to output dicts with a
+precomputed key list, instead of building DRF field objects and walking
+dotted sources per row. Its output equals the corresponding ModelSerializer's
+.data (and so renders to the same JSON): datetimes are converted like DRF's
+DateTimeField, UUIDs to strings, and missing student profiles to 'N/A'.
+
+A column is (key, path) or (key, path, convert). path is a values() lookup;
+a tuple of lookups passes all of their values to convert.
+"""
+import json
+from functools import partial
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+
+
+def iso_datetime(value, tz=None):
+    """DRF DateTimeField output: ISO 8601 in the current time zone, UTC as 'Z'"""
+    if not value:
+        return None
+    value = value.astimezone(tz or timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+# Looking up the current time zone costs more than the conversion itself, so
+# serialize() passes it once per call to converters marked as zoned
+iso_datetime.zoned = True
+
+
+def uuid_string(value):
+    return None if value is None else str(value)
+
+
+def roll_no(value):
+    """Matches the serializers' get_roll_no: 'N/A' when there is no profile"""
+    return 'N/A' if value is None else value
+
+
+def session_is_active(session_status, end_time):
+    return session_status == 'active' and timezone.now() < end_time
+
+
+def qr_data(value):
+    """Matches SessionSerializer.get_qr_data"""
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _lookup(obj, path):
+    """Follow a values() path on a model instance; None past a missing relation"""
+    for name in path.split('__'):
+        try:
+            obj = getattr(obj, name)
+        except ObjectDoesNotExist:
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+class RowSerializer:
+    """Serializes values_list() rows of `paths` into dicts keyed by `keys`"""
+
+    def __init__(self, columns, keep=()):
+        self.columns = columns
+        self.keys = [column[0] for column in columns]
+        paths, extra, self.fixups = [], [], []
+        for position, (key, path, *convert) in enumerate(columns):
+            sources = (path,) if isinstance(path, str) else tuple(path)
+            paths.append(sources[0])
+            indexes = [position]
+            for source in sources[1:]:
+                indexes.append(len(columns) + len(extra))
+                extra.append(source)
+            if convert:
+                self.fixups.append((position, convert[0], indexes))
+        # Paths loaded for the caller's use (e.g. merge ordering) but not output
+        self.keep = [path for path in keep if path not in paths and path not in extra]
+        self.paths = paths + extra + self.keep
+
+    def select(self, fields, keep=()):
+        """A RowSerializer for the named fields only, in column order"""
+        return RowSerializer([column for column in self.columns if column[0] in fields], keep)
+
+    def index(self, path):
+        """Position of a loaded path in each row"""
+        return self.paths.index(path)
+
+    def values(self, queryset):
+        return queryset.values_list(*self.paths)
+
+    def from_objects(self, objects):
+        """Rows for model-like objects (e.g. expanded compact records)"""
+        return [tuple(_lookup(obj, path) for path in self.paths) for obj in objects]
+
+    def serialize(self, rows):
+        keys = self.keys
+        if not self.fixups:
+            return [dict(zip(keys, row)) for row in rows]
+        tz = timezone.get_current_timezone()
+        single, multiple = [], []
+        for position, convert, indexes in self.fixups:
+            if getattr(convert, 'zoned', False):
+                convert = partial(convert, tz=tz)
+            if len(indexes) == 1:
+                single.append((position, convert))
+            else:
+                multiple.append((position, convert, indexes))
+        data = []
+        for row in rows:
+            values = list(row)
+            for position, convert in single:
+                values[position] = convert(row[position])
+            for position, convert, indexes in multiple:
+                values[position] = convert(*[row[i] for i in indexes])
+            data.append(dict(zip(keys, values)))
+        return data
+
+
+# TeacherAttendanceHistorySerializer
+TEACHER_HISTORY = RowSerializer([
+    ('id', 'id'),
+    ('student_name', 'student__username'),
+    ('student_email', 'student__email'),
+    ('roll_no', 'student__student_profile__roll_no', roll_no),
+    ('class_code', 'session__class_obj__class_code'),
+    ('class_name', 'session__class_obj__class_name'),
+    ('semester', 'session__class_obj__semester'),
+    ('session_date', 'session__start_time', iso_datetime),
+    ('status', 'status'),
+    ('marked_at', 'marked_at', iso_datetime),
+])
+
+# AttendanceRecordSerializer
+ATTENDANCE_RECORD = RowSerializer([
+    ('id', 'id'),
+    ('student_name', 'student__username'),
+    ('student_email', 'student__email'),
+    ('roll_no', 'student__student_profile__roll_no', roll_no),
+    ('status', 'status'),
+    ('marked_at', 'marked_at', iso_datetime),
+])
+
+# SessionSerializer
+SESSION = RowSerializer([
+    ('id', 'id'),
+    ('session_id', 'session_id', uuid_string),
+    ('class_code', 'class_obj__class_code'),
+    ('class_name', 'class_obj__class_name'),
+    ('semester', 'class_obj__semester'),
+    ('teacher_name', 'teacher__username'),
+    ('start_time', 'start_time', iso_datetime),
+    ('end_time', 'end_time', iso_datetime),
+    ('duration_minutes', 'duration_minutes'),
+    ('status', 'status'),
+    ('is_active', ('status', 'end_time'), session_is_active),
+    ('qr_data', 'qr_code_data', qr_data),
+    ('created_at', 'created_at', iso_datetime),
+])
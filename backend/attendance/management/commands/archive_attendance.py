@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.archive import ARCHIVE_CHUNK_SIZE, archivable_sessions, archive_sessions
+from attendance.models import AttendanceRecord
+
+
+class Command(BaseCommand):
+    help = "Move completed sessions and their records of finished semesters into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', action='append', dest='semesters',
+                            help='Archive sessions of classes in this semester (repeatable)')
+        parser.add_argument('--before', help='Archive sessions that started before this date (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE,
+                            help='Sessions moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            try:
+                before = timezone.datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format')
+        if not options['semesters'] and not before:
+            raise CommandError('Pass --semester and/or --before to choose what to archive')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        sessions = archivable_sessions(semesters=options['semesters'], before=before)
+
+        if options['dry_run']:
+            records = AttendanceRecord.objects.filter(session__in=sessions).count()
+            self.stdout.write(f'Would archive {sessions.count()} sessions with {records} records')
+            return
+
+        moved_sessions, moved_records = archive_sessions(
+            sessions,
+            chunk_size=options['chunk_size'],
+            progress=lambda s, r: self.stdout.write(f'  {s} sessions, {r} records'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved_sessions} sessions with {moved_records} records'
+        ))
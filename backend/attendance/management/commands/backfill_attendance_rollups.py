@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from attendance.models import AttendanceSession
+from attendance.rollups import refresh_daily_rollups, session_day
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily per-class attendance rollups from attendance records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', type=int, action='append', dest='class_ids',
+                            help='Only rebuild these classes (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['class_ids']:
+            sessions = AttendanceSession.objects.filter(
+                class_obj_id__in=options['class_ids'], status='completed'
+            ).only('class_obj_id', 'start_time')
+            written = refresh_daily_rollups({(s.class_obj_id, session_day(s)) for s in sessions})
+        else:
+            written = refresh_daily_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily rollup rows'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.compact import COMPACT_CHUNK_SIZE, compact_sessions, compactable_sessions
+
+
+class Command(BaseCommand):
+    help = "Replace the attendance records of finalized sessions with one compact bitmap row each"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30,
+                            help='Only sessions that ended more than this many days ago')
+        parser.add_argument('--class-id', type=int, action='append', dest='class_ids',
+                            help='Only sessions of these classes (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=COMPACT_CHUNK_SIZE,
+                            help='Sessions compacted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be compacted')
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--older-than-days cannot be negative and --chunk-size must be positive')
+
+        sessions = compactable_sessions(options['older_than_days'])
+        if options['class_ids']:
+            sessions = sessions.filter(class_obj_id__in=options['class_ids'])
+
+        if options['dry_run']:
+            self.stdout.write(f'Would compact {sessions.count()} sessions')
+            return
+
+        compacted, removed = compact_sessions(sessions, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} sessions, replacing {removed} attendance records'
+        ))
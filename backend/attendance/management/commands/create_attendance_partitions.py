@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from attendance import partitioning
+
+
+class Command(BaseCommand):
+    help = "Pre-create monthly attendance_records partitions (PostgreSQL only); run it monthly from cron"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Months after the current one to create partitions for')
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert an unpartitioned attendance_records table first (locks the table)')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write('Partitioning needs PostgreSQL; nothing to do on this database')
+            return
+        if options['months_ahead'] < 0:
+            raise CommandError('--months-ahead cannot be negative')
+
+        if options['convert'] and partitioning.convert_to_partitioned(months_ahead=options['months_ahead']):
+            self.stdout.write(self.style.SUCCESS('Converted attendance_records to monthly partitions'))
+        if not partitioning.is_partitioned():
+            raise CommandError('attendance_records is not partitioned; pass --convert to convert it')
+
+        try:
+            names = partitioning.ensure_partitions(months_ahead=options['months_ahead'])
+        except DatabaseError as e:
+            # Usually rows for that month already sit in the default partition
+            raise CommandError(f'Could not create partitions: {e}')
+        self.stdout.write(self.style.SUCCESS(f"Partitions ready: {', '.join(names)}"))
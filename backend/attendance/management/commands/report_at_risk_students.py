@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.analytics import at_risk, load_class_matrix, percentage
+from attendance.models import Class
+
+
+class Command(BaseCommand):
+    help = "List students on an absence streak or with falling attendance, per class"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', type=int, action='append', dest='class_ids',
+                            help='Only analyze these classes (repeatable)')
+        parser.add_argument('--semester', help='Only analyze classes of this semester')
+        parser.add_argument('--streak', type=int, default=3, help='Consecutive absences that flag a student')
+        parser.add_argument('--window', type=int, default=5, help='Sessions per rolling window')
+        parser.add_argument('--drop', type=float, default=20.0,
+                            help='Percentage-point fall between windows that flags a student')
+
+    def handle(self, *args, **options):
+        if options['streak'] < 1 or options['window'] < 1:
+            raise CommandError('--streak and --window must be positive')
+
+        classes = Class.objects.order_by('class_code')
+        if options['class_ids']:
+            classes = classes.filter(id__in=options['class_ids'])
+        if options['semester']:
+            classes = classes.filter(semester=options['semester'])
+
+        started = time.perf_counter()
+        students = flagged_total = 0
+        for class_obj in classes:
+            matrix = load_class_matrix(class_obj)
+            flagged, stats, reasons = at_risk(
+                matrix.values, streak=options['streak'], window=options['window'], drop=options['drop']
+            )
+            students += len(matrix.students)
+            flagged_total += len(flagged)
+            for index in flagged:
+                _, username, roll_no = matrix.students[index]
+                self.stdout.write(
+                    f"{class_obj.class_code}\t{roll_no or 'N/A'}\t{username}\t"
+                    f"rate={percentage(stats['attendance_rate'][index])}\t"
+                    f"delta={percentage(stats['delta'][index])}\t"
+                    f"streak={stats['current_absence_streak'][index]}\t"
+                    f"{','.join(reasons[int(index)])}"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Flagged {flagged_total} of {students} enrolled students in {elapsed:.2f}s'
+        ))
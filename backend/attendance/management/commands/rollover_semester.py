@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+
+from attendance.models import Class
+
+
+class Command(BaseCommand):
+    help = "Clone every class of a semester, with its roster, into a new semester in one transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_semester', help='Semester to copy, e.g. "Fall 2025"')
+        parser.add_argument('to_semester', help='New semester, e.g. "Spring 2026"')
+        parser.add_argument(
+            '--code-format', default='{code}-{semester}',
+            help='New class code; {code} is the old code, {semester} the new semester without spaces'
+        )
+        parser.add_argument('--teacher', help='Only roll over classes of the teacher with this email')
+        parser.add_argument('--no-students', action='store_true', help='Copy classes without their rosters')
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be created')
+
+    def handle(self, *args, **options):
+        classes = Class.objects.filter(semester=options['from_semester']).select_related('teacher')
+        if options['teacher']:
+            classes = classes.filter(teacher__email=options['teacher'])
+        classes = list(classes)
+        if not classes:
+            raise CommandError(f"No classes found for semester {options['from_semester']!r}")
+
+        semester_tag = options['to_semester'].replace(' ', '')
+        plan = [
+            (class_obj, options['code_format'].format(code=class_obj.class_code, semester=semester_tag), None)
+            for class_obj in classes
+        ]
+
+        codes = [code.lower() for _, code, _ in plan]
+        if len(set(codes)) != len(codes):
+            raise CommandError('--code-format produces duplicate class codes')
+        if any(len(code) > Class._meta.get_field('class_code').max_length for code in codes):
+            raise CommandError('--code-format produces class codes longer than 20 characters')
+        taken = list(Class.objects.annotate(code_lower=Lower('class_code')).filter(
+            code_lower__in=codes
+        ).values_list('class_code', flat=True))
+        if taken:
+            raise CommandError(f"Class codes already exist: {', '.join(taken)}")
+
+        if options['dry_run']:
+            for source, code, _ in plan:
+                self.stdout.write(f'{source.class_code} -> {code}')
+            return
+
+        new_classes = Class.rollover(plan, options['to_semester'], include_students=not options['no_students'])
+        enrolled = sum(c.enrollment_count for c in new_classes)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(new_classes)} classes for {options['to_semester']} with {enrolled} enrollments"
+        ))
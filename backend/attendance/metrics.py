@@ -0,0 +1,107 @@
+"""
+Prometheus metrics.
+
+In a single process the default registry is exported as-is. Under gunicorn
+set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so every worker writes
+its values to mmap'd files there and a scrape of any worker aggregates them.
+"""
+import os
+
+from django.utils import timezone
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233)
+
+REQUESTS = Counter(
+    'attendance_http_requests_total', 'HTTP requests by route',
+    ['url_name', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'attendance_http_request_duration_seconds', 'Request latency by route',
+    ['url_name'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'attendance_db_queries_per_request', 'Database queries per request by route',
+    ['url_name'], buckets=QUERY_COUNT_BUCKETS,
+)
+SCANS = Counter(
+    'attendance_scans_total', 'QR scans by outcome',
+    ['result', 'reason'],
+)
+COMPRESSION_SECONDS = Histogram(
+    'attendance_response_compression_seconds', 'Time spent compressing response bodies',
+    ['encoding'], buckets=LATENCY_BUCKETS,
+)
+COMPRESSION_RATIO = Histogram(
+    'attendance_response_compression_ratio', 'Compressed size as a share of the original',
+    ['encoding'], buckets=(0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0),
+)
+THROTTLED = Counter(
+    'attendance_throttled_requests_total', 'Requests rejected by rate limits',
+    ['scope'],
+)
+CACHE_REQUESTS = Counter(
+    'attendance_cache_requests_total', 'Cache lookups by cache and outcome',
+    ['cache', 'result'],
+)
+
+
+def record_scan(reason=None):
+    """Count a scan: accepted when reason is None, otherwise rejected for reason"""
+    if reason is None:
+        SCANS.labels(result='accepted', reason='').inc()
+    else:
+        SCANS.labels(result='rejected', reason=reason).inc()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+class StateCollector:
+    """Values computed at scrape time: active sessions and cache hit ratios"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        from .models import AttendanceSession
+
+        active = GaugeMetricFamily('attendance_active_sessions', 'Sessions currently accepting scans')
+        active.add_metric([], AttendanceSession.objects.filter(
+            status='active', end_time__gt=timezone.now()
+        ).count())
+        yield active
+
+        lookups = {}
+        for family in self.source.collect():
+            if family.name != 'attendance_cache_requests':
+                continue
+            for sample in family.samples:
+                if sample.name.endswith('_total'):
+                    counts = lookups.setdefault(sample.labels['cache'], {'hit': 0, 'miss': 0})
+                    counts[sample.labels['result']] += sample.value
+
+        ratio = GaugeMetricFamily(
+            'attendance_cache_hit_ratio', 'Cache hits over lookups since start', labels=['cache']
+        )
+        for cache, counts in sorted(lookups.items()):
+            total = counts['hit'] + counts['miss']
+            ratio.add_metric([cache], counts['hit'] / total if total else 0.0)
+        yield ratio
+
+
+def render_metrics():
+    """Return the text exposition for every worker's metrics"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        source = CollectorRegistry()
+        multiprocess.MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+    state = CollectorRegistry()
+    state.register(StateCollector(source))
+    return generate_latest(source) + generate_latest(state)
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+from .authentication import token_user_id
+from .compression import StreamCompressor, choose_encoding, compress
+from .nplusone import NPlusOneError, QueryFingerprinter
+from .throttling import RateLimiter
+from .timing import RequestTimer, get_timer
+
+timing_logger = logging.getLogger('attendance.timing')
+nplusone_logger = logging.getLogger('attendance.nplusone')
+
+
+class RequestTimingMiddleware:
+    """
+    Time sampled requests and report where the time went.
+
+    Records DB query count and time (via connection.execute_wrapper), view
+    time, render time and any phases added through attendance.timing.timed(),
+    then emits them as a Server-Timing header and one JSON log line.
+    Requests slower than REQUEST_TIMING_SLOW_MS are logged as warnings.
+    Removed from the chain entirely when REQUEST_TIMING_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        self.slow_ms = settings.REQUEST_TIMING_SLOW_MS
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = request.timer = RequestTimer()
+        with connection.execute_wrapper(timer.execute_wrapper):
+            response = self.get_response(request)
+            # Plain HttpResponses have no render step
+            timer.finish_view()
+        total = timer.total
+
+        response['Server-Timing'] = timer.server_timing(total)
+        self.log(request, response, timer, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = getattr(request, 'timer', None)
+        if timer is not None:
+            timer.start_view()
+
+    def process_template_response(self, request, response):
+        timer = getattr(request, 'timer', None)
+        if timer is not None:
+            timer.finish_view()
+            response.add_post_render_callback(lambda r: timer.finish_render())
+        return response
+
+    def log(self, request, response, timer, total):
+        match = request.resolver_match
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.url_name if match else None,
+            'status': response.status_code,
+            **timer.as_dict(total),
+        }
+        level = logging.WARNING if entry['total_ms'] >= self.slow_ms else logging.INFO
+        timing_logger.log(level, json.dumps(entry))
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency and DB query count per URL name.
+
+    Reuses the RequestTimer when RequestTimingMiddleware has attached one,
+    otherwise counts queries itself. Removed when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timer = get_timer(request)
+        if timer is None:
+            timer = RequestTimer()
+            with connection.execute_wrapper(timer.execute_wrapper):
+                response = self.get_response(request)
+            query_count = timer.db_queries
+        else:
+            queries_before = timer.db_queries
+            response = self.get_response(request)
+            query_count = timer.db_queries - queries_before
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unmatched'
+        metrics.REQUESTS.labels(url_name=url_name, method=request.method, status=response.status_code).inc()
+        metrics.REQUEST_LATENCY.labels(url_name=url_name).observe(elapsed)
+        metrics.DB_QUERIES.labels(url_name=url_name).observe(query_count)
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Flag requests that repeat one statement more than NPLUSONE_THRESHOLD times.
+
+    Raises NPlusOneError when NPLUSONE_RAISE is on (DEBUG and test runs);
+    otherwise logs a warning for a NPLUSONE_SAMPLE_RATE share of requests.
+    Views whose name starts with an NPLUSONE_IGNORE_VIEWS prefix are skipped.
+    """
+
+    def __init__(self, get_response):
+        self.raise_errors = settings.NPLUSONE_RAISE
+        self.sample_rate = 1.0 if self.raise_errors else settings.NPLUSONE_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.NPLUSONE_THRESHOLD
+        self.ignore_views = tuple(settings.NPLUSONE_IGNORE_VIEWS)
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        detector = QueryFingerprinter(self.threshold)
+        with connection.execute_wrapper(detector):
+            response = self.get_response(request)
+
+        violations = detector.violations()
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        if violations and not view_name.startswith(self.ignore_views):
+            report = detector.describe(view_name, violations)
+            if self.raise_errors:
+                raise NPlusOneError(report)
+            nplusone_logger.warning(report)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses with the best encoding the client accepts.
+
+    Buffered responses under RESPONSE_COMPRESSION_MIN_BYTES, or that would
+    not shrink, are sent as-is. Streamed responses are always compressed,
+    chunk by chunk. Time spent compressing is added to the request's timer
+    as the `compress` phase (buffered responses; a stream finishes after the
+    timing headers are sent) and observed in the compression histograms.
+    Removed when RESPONSE_COMPRESSION_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RESPONSE_COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_bytes = settings.RESPONSE_COMPRESSION_MIN_BYTES
+        self.levels = {
+            'gzip_level': settings.RESPONSE_COMPRESSION_GZIP_LEVEL,
+            'brotli_quality': settings.RESPONSE_COMPRESSION_BROTLI_QUALITY,
+        }
+        self.content_types = tuple(settings.RESPONSE_COMPRESSION_CONTENT_TYPES)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.content_types):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = self.compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_bytes:
+                return response
+            started = time.perf_counter()
+            compressed = compress(encoding, response.content, **self.levels)
+            self.record(request, encoding, time.perf_counter() - started, len(compressed) / len(response.content))
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs byte for byte from the original
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, chunks, encoding):
+        compressor = StreamCompressor(encoding, **self.levels)
+        elapsed = 0.0
+        original = produced = 0
+        for chunk in chunks:
+            started = time.perf_counter()
+            data = compressor.feed(chunk)
+            elapsed += time.perf_counter() - started
+            original += len(chunk)
+            produced += len(data)
+            if data:
+                yield data
+        started = time.perf_counter()
+        data = compressor.finish()
+        elapsed += time.perf_counter() - started
+        produced += len(data)
+        self.record(None, encoding, elapsed, produced / original if original else 1.0)
+        yield data
+
+    @staticmethod
+    def record(request, encoding, seconds, ratio):
+        timer = get_timer(request) if request is not None else None
+        if timer is not None:
+            timer.add('compress', seconds)
+        metrics.COMPRESSION_SECONDS.labels(encoding=encoding).observe(seconds)
+        metrics.COMPRESSION_RATIO.labels(encoding=encoding).observe(ratio)
+
+
+class RateLimitMiddleware:
+    """
+    Token-bucket limits per RATE_LIMITS scope, applied before authentication.
+
+    RATE_LIMIT_VIEWS maps URL names to scopes. Clients are identified by the
+    user id of a valid bearer token (checked without a database lookup),
+    otherwise by IP address. Logins are counted per submitted account and
+    address, so users behind one campus NAT do not share a bucket, per
+    account under the looser 'login_account' scope, so rotating addresses
+    does not reset the guesses against one account, and per address under
+    'login_address'. Behind
+    RATE_LIMIT_TRUSTED_PROXIES reverse proxies the address is the
+    X-Forwarded-For entry the outermost proxy added. Rejections are answered
+    with 429 and Retry-After from process_view, so DRF authentication and
+    the view never run. Removed when RATE_LIMIT_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMIT_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limiter = RateLimiter(settings.RATE_LIMITS, settings.RATE_LIMIT_BACKEND)
+        self.scopes = {
+            url_name: scope
+            for scope, url_names in settings.RATE_LIMIT_VIEWS.items()
+            for url_name in url_names
+        }
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = self.scopes.get(request.resolver_match.url_name)
+        if scope is None:
+            return None
+        address = self.client_address(request)
+        if scope == 'login':
+            account = hashlib.sha256(self.login_account(request).encode()).hexdigest()[:32]
+            checks = [
+                ('login', f'account:{account}:{address}'),
+                ('login_account', f'account:{account}'),
+                ('login_address', f'ip:{address}'),
+            ]
+        else:
+            user_id = token_user_id(request)
+            checks = [(scope, f'user:{user_id}' if user_id is not None else f'ip:{address}')]
+        for scope, ident in checks:
+            wait = self.limiter.check(scope, ident)
+            if wait is not None:
+                break
+        else:
+            return None
+        metrics.THROTTLED.labels(scope=scope).inc()
+        retry_after = max(1, round(wait))
+        response = JsonResponse(
+            {'error': 'Too many requests, please retry later', 'retry_after': retry_after},
+            status=429
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+
+    @staticmethod
+    def client_address(request):
+        """REMOTE_ADDR, or the X-Forwarded-For hop added by the outermost trusted proxy"""
+        proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+        if proxies:
+            hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+            if len(hops) >= proxies:
+                return hops[-proxies]
+        return request.META.get('REMOTE_ADDR', '')
+
+    @staticmethod
+    def login_account(request):
+        """The submitted USERNAME_FIELD, case-folded; '' when missing or unreadable"""
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return ''
+        else:
+            data = request.POST
+        value = data.get(get_user_model().USERNAME_FIELD) if isinstance(data, dict) else None
+        return value.strip().casefold() if isinstance(value, str) else ''
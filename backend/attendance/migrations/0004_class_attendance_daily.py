@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_rename_student_name_studentprofile_student_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyClassAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='attendance.class')),
+            ],
+            options={
+                'db_table': 'class_attendance_daily',
+                'ordering': ['class_obj', 'date'],
+                'unique_together': {('class_obj', 'date')},
+            },
+        ),
+    ]
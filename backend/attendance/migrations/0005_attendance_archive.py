@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_class_attendance_daily'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttendanceSession',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('session_id', models.UUIDField(unique=True)),
+                ('start_time', models.DateTimeField()),
+                ('duration_minutes', models.IntegerField()),
+                ('end_time', models.DateTimeField()),
+                ('status', models.CharField(default='completed', max_length=10)),
+                ('archived_at', models.DateTimeField()),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sessions', to='attendance.class')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'attendance_sessions_archive',
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendanceRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('present', 'Present'), ('absent', 'Absent')], max_length=10)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance_records', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='attendance.archivedattendancesession')),
+            ],
+            options={
+                'db_table': 'attendance_records_archive',
+                'ordering': ['marked_at'],
+                'unique_together': {('session', 'student')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendanceTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_totals', to='attendance.class')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'attendance_archive_totals',
+                'ordering': ['class_obj', 'student'],
+                'unique_together': {('class_obj', 'student')},
+            },
+        ),
+    ]
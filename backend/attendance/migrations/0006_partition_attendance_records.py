@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def partition(apps, schema_editor):
+    """Only on PostgreSQL with ATTENDANCE_RECORDS_PARTITIONED on; a no-op elsewhere"""
+    from attendance import partitioning
+
+    if settings.ATTENDANCE_RECORDS_PARTITIONED:
+        partitioning.convert_to_partitioned(conn=schema_editor.connection)
+
+
+def unpartition(apps, schema_editor):
+    from attendance import partitioning
+
+    partitioning.convert_to_plain(conn=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendance_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition, elidable=True),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_partition_attendance_records'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactSessionAttendance',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compact_attendance', serialize=False, to='attendance.attendancesession')),
+                ('student_ids', models.BinaryField()),
+                ('present', models.BinaryField()),
+                ('present_offsets', models.BinaryField()),
+                ('absent_marked_at', models.DateTimeField(null=True)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('compacted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'attendance_session_bitmaps',
+            },
+        ),
+    ]
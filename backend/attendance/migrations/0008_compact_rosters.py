@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Index the roster snapshots of sessions compacted before this table existed"""
+    from attendance.compact import decode_ids
+
+    CompactSessionAttendance = apps.get_model('attendance', 'CompactSessionAttendance')
+    CompactRosterStudent = apps.get_model('attendance', 'CompactRosterStudent')
+    pairs = set()
+    for class_id, student_ids in CompactSessionAttendance.objects.values_list(
+        'session__class_obj_id', 'student_ids'
+    ).iterator():
+        pairs.update((class_id, student_id) for student_id in decode_ids(student_ids))
+    CompactRosterStudent.objects.bulk_create(
+        [CompactRosterStudent(class_obj_id=class_id, student_id=student_id) for class_id, student_id in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_session_attendance_bitmaps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompactRosterStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compact_roster', to='attendance.class')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compact_classes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'attendance_compact_rosters',
+                'unique_together': {('class_obj', 'student')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:05
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def mark_recent_absences(apps, schema_editor):
+    """
+    Flag the absences end_session wrote for sessions whose offline scans are
+    still accepted (48 hours). end_session writes them just before setting
+    end_time; older sessions no longer take scans, so they are left alone.
+    """
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceRecord.objects.filter(
+        status='absent',
+        session__status='completed',
+        session__end_time__gte=timezone.now() - timedelta(hours=48),
+        marked_at__gte=F('session__end_time') - timedelta(seconds=5),
+        marked_at__lte=F('session__end_time'),
+    ).update(auto_marked=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_compact_rosters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='auto_marked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_recent_absences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:20
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def split_absent_marks(apps, schema_editor):
+    """Give every absentee of an existing compact row the one timestamp it kept"""
+    from attendance.compact import encode_offsets
+
+    CompactSessionAttendance = apps.get_model('attendance', 'CompactSessionAttendance')
+    rows = CompactSessionAttendance.objects.select_related('session').iterator()
+    for row in rows:
+        times = [row.absent_marked_at] * row.absent_count if row.absent_marked_at else []
+        row.absent_offsets = encode_offsets(row.session.start_time, times)
+        row.save(update_fields=['absent_offsets'])
+
+
+def merge_absent_marks(apps, schema_editor):
+    """Keep the latest absent mark, as the rows stored before"""
+    from attendance.compact import decode_offsets
+
+    CompactSessionAttendance = apps.get_model('attendance', 'CompactSessionAttendance')
+    rows = CompactSessionAttendance.objects.select_related('session').iterator()
+    for row in rows:
+        offsets = decode_offsets(row.absent_offsets)
+        row.absent_marked_at = row.session.start_time + timedelta(seconds=max(offsets)) if offsets else None
+        row.save(update_fields=['absent_marked_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_record_auto_marked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compactsessionattendance',
+            name='absent_offsets',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(split_absent_marks, merge_absent_marks),
+        migrations.RemoveField(
+            model_name='compactsessionattendance',
+            name='absent_marked_at',
+        ),
+    ]
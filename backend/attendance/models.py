@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.contrib.auth.models import AbstractUser
 import uuid
 
@@ -61,7 +61,50 @@ class Class(models.Model):
     
     @property
     def student_count(self):
+        # Use the annotated value when the queryset provides one (avoids N+1)
+        if hasattr(self, 'enrollment_count'):
+            return self.enrollment_count
         return self.enrollments.count()
+
+    def clone(self, class_code, semester, class_name=None, include_students=True):
+        """
+        Copy this class under a new code and semester.
+        The roster is copied with a single INSERT ... SELECT on enrollments.
+        """
+        new_class = Class.objects.create(
+            class_code=class_code,
+            class_name=class_name or self.class_name,
+            semester=semester,
+            teacher=self.teacher,
+        )
+        new_class.enrollment_count = self._copy_roster_to(new_class) if include_students else 0
+        return new_class
+
+    def _copy_roster_to(self, new_class):
+        quote = connection.ops.quote_name
+        table = quote(Enrollment._meta.db_table)
+        class_col, student_col, enrolled_col = (
+            quote(Enrollment._meta.get_field(name).column) for name in ('class_obj', 'student', 'enrolled_at')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({class_col}, {student_col}, {enrolled_col}) '
+                f'SELECT %s, {student_col}, %s FROM {table} WHERE {class_col} = %s',
+                [new_class.id, connection.ops.adapt_datetimefield_value(new_class.created_at), self.id]
+            )
+            return cursor.rowcount
+
+    @classmethod
+    def rollover(cls, plan, semester, include_students=True):
+        """
+        Clone many classes in one transaction.
+        plan: iterable of (source class, new class code, new class name or None)
+        """
+        with transaction.atomic():
+            return [
+                source.clone(code, semester, class_name=name, include_students=include_students)
+                for source, code, name in plan
+            ]
     
 class Enrollment(models.Model):
     """Table for student enrollments in classes"""
@@ -127,11 +170,127 @@ class AttendanceRecord(models.Model):
         choices=(('present', 'Present'), ('absent', 'Absent')),
         default='present'
     )
+    # Absent marks written by end_session; an offline scan may replace them,
+    # a teacher's own marks never
+    auto_marked = models.BooleanField(default=False)
     
     class Meta:
         db_table = 'attendance_records'
+        # When the table is partitioned (see partitioning.py) PostgreSQL's key
+        # is (id, marked_at) and this index exists per partition only. ids still
+        # come from one sequence; writes that relied on ON CONFLICT (session,
+        # student) check is_partitioned() and update-then-insert instead
+        unique_together = ('session', 'student')
+        ordering = ['marked_at']
+
+    def __str__(self):
+        return f"{self.student.username} - {self.session.class_obj.class_code} - {self.status}"
+
+class DailyClassAttendance(models.Model):
+    """Per-class attendance totals for one local (TIME_ZONE) day, refreshed when sessions end"""
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='daily_attendance')
+    date = models.DateField()
+    sessions = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'class_attendance_daily'
+        unique_together = ('class_obj', 'date')
+        ordering = ['class_obj', 'date']
+
+    def __str__(self):
+        return f"{self.class_obj_id} - {self.date}: {self.present}/{self.present + self.absent}"
+
+
+class ArchivedAttendanceSession(models.Model):
+    """Completed session moved out of attendance_sessions by the archive_attendance command"""
+    id = models.BigIntegerField(primary_key=True)  # Keeps the live table's id
+    session_id = models.UUIDField(unique=True)
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='archived_sessions')
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_sessions')
+    start_time = models.DateTimeField()
+    duration_minutes = models.IntegerField()
+    end_time = models.DateTimeField()
+    status = models.CharField(max_length=10, default='completed')
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'attendance_sessions_archive'
+        ordering = ['-start_time']
+
+    def __str__(self):
+        return f"{self.class_obj_id} - {self.start_time.strftime('%Y-%m-%d %H:%M')} (archived)"
+
+
+class ArchivedAttendanceRecord(models.Model):
+    """Attendance record of an archived session; field names match AttendanceRecord"""
+    id = models.BigIntegerField(primary_key=True)
+    session = models.ForeignKey(ArchivedAttendanceSession, on_delete=models.CASCADE, related_name='records')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    marked_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=(('present', 'Present'), ('absent', 'Absent')))
+
+    class Meta:
+        db_table = 'attendance_records_archive'
         unique_together = ('session', 'student')
         ordering = ['marked_at']
 
     def __str__(self):
-        return f"{self.student.username} - {self.session.class_obj.class_code} - {self.status}"
\ No newline at end of file
+        return f"{self.student_id} - {self.session_id} - {self.status} (archived)"
+
+
+class ArchivedAttendanceTotal(models.Model):
+    """Per-(class, student) totals of archived records, so they stay cheap to query"""
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='archived_totals')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_attendance_totals')
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'attendance_archive_totals'
+        unique_together = ('class_obj', 'student')
+        ordering = ['class_obj', 'student']
+
+    def __str__(self):
+        return f"{self.student_id} in {self.class_obj_id}: {self.present}/{self.present + self.absent}"
+
+
+class CompactSessionAttendance(models.Model):
+    """
+    Attendance of a finalized session packed into one row; replaces its
+    AttendanceRecord rows (see attendance/compact.py for the encoding)
+    """
+    session = models.OneToOneField(
+        AttendanceSession, on_delete=models.CASCADE, primary_key=True, related_name='compact_attendance'
+    )
+    student_ids = models.BinaryField()  # zlib'd deltas of the sorted roster snapshot
+    present = models.BinaryField()  # zlib'd bitmap over student_ids
+    present_offsets = models.BinaryField()  # zlib'd seconds after start_time each present mark was made
+    absent_offsets = models.BinaryField()  # the same for each absent mark
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    compacted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'attendance_session_bitmaps'
+
+    def __str__(self):
+        return f"{self.session_id}: {self.present_count}/{self.present_count + self.absent_count} (compact)"
+
+
+class CompactRosterStudent(models.Model):
+    """
+    (class, student) pairs on the roster snapshot of a compacted session, so a
+    student's compact rows are found even after they leave the class
+    """
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='compact_roster')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compact_classes')
+
+    class Meta:
+        db_table = 'attendance_compact_rosters'
+        unique_together = ('class_obj', 'student')
+
+    def __str__(self):
+        return f"{self.student_id} in {self.class_obj_id} (compact)"
@@ -0,0 +1,81 @@
+"""
+N+1 query detection.
+
+QueryFingerprinter is installed per request with connection.execute_wrapper.
+It normalizes each statement to a fingerprint (literals and IN lists
+collapsed) and, once a fingerprint repeats beyond the threshold, records
+the innermost app frame that issued it, e.g. a serializer method or view.
+"""
+import os
+import re
+import sys
+from collections import Counter
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Frames from these modules are instrumentation, never the culprit
+_SKIP_FILES = {
+    os.path.join(APP_DIR, name)
+    for name in ('nplusone.py', 'timing.py', 'middleware.py')
+}
+
+_IN_LIST = re.compile(r'\bIN\s*\([^()]*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SAVEPOINT = re.compile(r'^((?:RELEASE |ROLLBACK TO )?SAVEPOINT) .*', re.IGNORECASE)
+
+
+class NPlusOneError(Exception):
+    """Raised when a request repeats the same statement beyond the threshold"""
+
+
+def fingerprint(sql):
+    """Normalize a statement so per-row variants of one query compare equal"""
+    sql = _SAVEPOINT.sub(r'\1 ?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+def calling_frame(depth=2):
+    """Describe the innermost app frame on the stack, e.g. 'serializers.py:42 in Foo.bar'"""
+    frame = sys._getframe(depth)
+    fallback = None
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(APP_DIR) and path not in _SKIP_FILES:
+            return f'{os.path.relpath(path, APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_qualname}'
+        if fallback is None and f'{os.sep}django{os.sep}db{os.sep}' not in path:
+            fallback = f'{path}:{frame.f_lineno} in {frame.f_code.co_qualname}'
+        frame = frame.f_back
+    return fallback or 'unknown'
+
+
+class QueryFingerprinter:
+    """Count statements by fingerprint and remember who repeated one too often"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.callers = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        if self.counts[key] == self.threshold + 1:
+            self.callers[key] = calling_frame()
+        return execute(sql, params, many, context)
+
+    def violations(self):
+        """(count, caller, fingerprint) for every statement over the threshold"""
+        return sorted(
+            ((self.counts[key], caller, key) for key, caller in self.callers.items()),
+            reverse=True,
+        )
+
+    @staticmethod
+    def describe(view_name, violations):
+        lines = [f'Possible N+1 queries in {view_name}:']
+        for count, caller, key in violations:
+            lines.append(f'  {count}x from {caller}: {key[:200]}')
+        return '\n'.join(lines)
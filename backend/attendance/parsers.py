@@ -0,0 +1,30 @@
+"""
+JSON request parsing with orjson when it is installed, else DRF's JSONParser.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes with orjson when available"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                body = body.decode(encoding)
+            # orjson rejects NaN and Infinity, like JSONParser in strict mode
+            return orjson.loads(body)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
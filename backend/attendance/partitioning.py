@@ -0,0 +1,186 @@
+"""
+Monthly range partitioning of attendance_records on PostgreSQL.
+
+Optional: the 0006 migration converts the table only on PostgreSQL with
+ATTENDANCE_RECORDS_PARTITIONED on, and the create_attendance_partitions
+command can convert later and pre-creates the coming months' partitions.
+On any other backend every function here is a no-op.
+
+A partitioned table cannot have a unique index that leaves out the
+partition key, so the parent's primary key becomes (id, marked_at) and the
+(session_id, student_id) unique index exists per partition, the default
+one included. Sessions last
+minutes, so their records land in one partition except across a month
+boundary, and writes avoid ON CONFLICT (session_id, student_id).
+Records are never marked before their session started, which is what lets
+start-date filters add a marked_at bound that prunes partitions.
+"""
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedAttendanceRecord, AttendanceRecord
+
+TABLE = AttendanceRecord._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+# The old table's identity sequence keeps the name attendance_records_id_seq
+SEQUENCE = f'{TABLE}_partitioned_id_seq'
+
+
+def is_supported(conn=connection):
+    return conn.vendor == 'postgresql'
+
+
+def is_partitioned(conn=connection):
+    if not is_supported(conn):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_{month:%Y_%m}'
+
+
+def _create_unique_index(cursor, partition):
+    quote = connection.ops.quote_name
+    cursor.execute(
+        f'CREATE UNIQUE INDEX IF NOT EXISTS {quote(partition + "_session_student_uniq")} '
+        f'ON {quote(partition)} ("session_id", "student_id")'
+    )
+
+
+def _create_partition(cursor, month):
+    quote = connection.ops.quote_name
+    name = partition_name(month)
+    # Bounds are local midnights, so a partition holds one calendar month in TIME_ZONE
+    lower = timezone.make_aware(datetime.combine(month, time.min))
+    upper = timezone.make_aware(datetime.combine(_next_month(month), time.min))
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(TABLE)} '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [lower, upper]
+    )
+    _create_unique_index(cursor, name)
+    return name
+
+
+def ensure_partitions(months_ahead=3, start=None, conn=connection):
+    """
+    Create monthly partitions from start's month (default: this month) through
+    months_ahead months after it. Returns the partition names created or kept.
+    """
+    if not is_partitioned(conn):
+        return []
+    month = _month_start(start or timezone.localdate())
+    names = []
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            names.append(_create_partition(cursor, month))
+            month = _next_month(month)
+        # Tables converted before the default partition got its index
+        _create_unique_index(cursor, DEFAULT_PARTITION)
+    return names
+
+
+def convert_to_partitioned(months_ahead=3, conn=connection):
+    """
+    Rebuild attendance_records as a partitioned table and copy every row over.
+    Takes an exclusive lock for the duration of the copy; run it in a
+    maintenance window. Returns False when there is nothing to do.
+    """
+    if not is_supported(conn) or is_partitioned(conn):
+        return False
+    quote = conn.ops.quote_name
+    old = f'{TABLE}_unpartitioned'
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(old)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ("marked_at")'
+        )
+
+        # The identity sequence belongs to the old table; continue numbering
+        # past every id handed out so far, archived ones included
+        cursor.execute(
+            f'SELECT GREATEST((SELECT MAX("id") FROM {quote(old)}), '
+            f'(SELECT MAX("id") FROM {quote(ArchivedAttendanceRecord._meta.db_table)}))'
+        )
+        next_id = (cursor.fetchone()[0] or 0) + 1
+        cursor.execute(f'CREATE SEQUENCE {quote(SEQUENCE)} START WITH {int(next_id)}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ALTER COLUMN "id" SET DEFAULT nextval(%s)', [SEQUENCE])
+        cursor.execute(f'ALTER SEQUENCE {quote(SEQUENCE)} OWNED BY {quote(TABLE)}."id"')
+
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ("id", "marked_at")')
+        cursor.execute(f'CREATE INDEX {quote(TABLE + "_session_idx")} ON {quote(TABLE)} ("session_id")')
+        cursor.execute(f'CREATE INDEX {quote(TABLE + "_student_idx")} ON {quote(TABLE)} ("student_id")')
+        for column, target in (('session_id', 'attendance_sessions'), ('student_id', 'users')):
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f"{TABLE}_{column}_fk")} '
+                f'FOREIGN KEY ({quote(column)}) REFERENCES {quote(target)} ("id") DEFERRABLE INITIALLY DEFERRED'
+            )
+
+        # One partition per month that has rows, through months_ahead from now
+        cursor.execute(f'SELECT MIN("marked_at") FROM {quote(old)}')
+        oldest = cursor.fetchone()[0]
+        month = _month_start(timezone.localdate(oldest) if oldest else timezone.localdate())
+        last = _month_start(timezone.localdate())
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        while month <= last:
+            _create_partition(cursor, month)
+            month = _next_month(month)
+        # Catches rows outside every monthly range if the command falls behind
+        cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+        _create_unique_index(cursor, DEFAULT_PARTITION)
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old)}')
+        cursor.execute(f'DROP TABLE {quote(old)}')
+    return True
+
+
+def convert_to_plain(conn=connection):
+    """Undo convert_to_partitioned: copy the rows back into an ordinary table"""
+    if not is_partitioned(conn):
+        return False
+    quote = conn.ops.quote_name
+    partitioned = f'{TABLE}_partitioned'
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(partitioned)}')
+        cursor.execute(f'CREATE TABLE {quote(TABLE)} (LIKE {quote(partitioned)} INCLUDING DEFAULTS)')
+        cursor.execute(f'ALTER SEQUENCE {quote(SEQUENCE)} OWNED BY {quote(TABLE)}."id"')
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(partitioned)}')
+        cursor.execute(f'DROP TABLE {quote(partitioned)}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ("id")')
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_session_id_student_id_uniq")} '
+            f'UNIQUE ("session_id", "student_id")'
+        )
+        cursor.execute(f'CREATE INDEX {quote(TABLE + "_student_idx")} ON {quote(TABLE)} ("student_id")')
+        for column, target in (('session_id', 'attendance_sessions'), ('student_id', 'users')):
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(f"{TABLE}_{column}_fk")} '
+                f'FOREIGN KEY ({quote(column)}) REFERENCES {quote(target)} ("id") DEFERRABLE INITIALLY DEFERRED'
+            )
+    return True
+
+
+def marked_since(day):
+    """
+    marked_at lower bound for sessions starting on or after a local date.
+    Adding it to a start-date filter lets PostgreSQL skip older partitions.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,44 @@
+"""
+JSON rendering with orjson when it is installed.
+
+FastJSONRenderer produces the same compact output as DRF's JSONRenderer
+except for floats: datetimes, dates, times and UUIDs are encoded natively by
+orjson in the same ISO 8601 forms (UTC as 'Z'), and anything else orjson does
+not know (Decimal, lazy strings, querysets, NumPy values) goes through DRF's
+encoder. Floats can differ in form, not in value: exponents are written
+without a sign or padding (1e16 rather than 1e+16), and NaN and infinities
+render as null where JSONRenderer raises. Data orjson refuses (e.g. integers
+beyond 64 bits), indented output (e.g. the browsable API), ASCII-only output
+and a missing orjson all fall back to JSONRenderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used without it
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_drf_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when available"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping of U+2028 / U+2029 as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,160 @@
+"""
+Daily attendance rollups per class.
+
+One DailyClassAttendance row per (class, local day) holds the totals of that
+day's completed sessions. Rows are recomputed with grouped queries over
+attendance_records and the compact rows of compacted sessions whenever a
+session ends or a completed session's records change, and in bulk by the
+backfill_attendance_rollups command. Trend responses built from them are
+cached until the class's rollups change again.
+"""
+import uuid
+from datetime import datetime, time
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from .metrics import record_cache
+from .models import AttendanceRecord, CompactSessionAttendance, DailyClassAttendance
+
+TREND_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def session_day(session):
+    """The local (TIME_ZONE) day a session belongs to"""
+    return timezone.localdate(session.start_time)
+
+
+def refresh_daily_rollups(class_days=None):
+    """
+    Recompute rollup rows from completed sessions.
+    class_days: iterable of (class_id, date) pairs, or None to rebuild everything.
+    Returns the number of rows written.
+    """
+    records = AttendanceRecord.objects.filter(session__status='completed')
+    compact = CompactSessionAttendance.objects.filter(session__status='completed')
+    if class_days is not None:
+        class_days = set(class_days)
+        if not class_days:
+            return 0
+        days = reduce(or_, (
+            Q(session__class_obj_id=class_id, session__start_time__date=day)
+            for class_id, day in class_days
+        ))
+        records = records.filter(days)
+        compact = compact.filter(days)
+
+    rows = records.values(
+        class_id=F('session__class_obj_id'),
+        day=TruncDate('session__start_time'),
+    ).annotate(
+        session_count=Count('session', distinct=True),
+        present_count=Count('id', filter=Q(status='present')),
+        absent_count=Count('id', filter=Q(status='absent')),
+    )
+    rollups = {
+        (row['class_id'], row['day']): DailyClassAttendance(
+            class_obj_id=row['class_id'],
+            date=row['day'],
+            sessions=row['session_count'],
+            present=row['present_count'],
+            absent=row['absent_count'],
+        )
+        for row in rows
+    }
+    # Compacted sessions keep their totals on the compact row
+    for row in compact.values(
+        class_id=F('session__class_obj_id'),
+        day=TruncDate('session__start_time'),
+    ).annotate(
+        session_count=Count('session'),
+        present_count=Sum('present_count'),
+        absent_count=Sum('absent_count'),
+    ):
+        rollup = rollups.setdefault(
+            (row['class_id'], row['day']),
+            DailyClassAttendance(class_obj_id=row['class_id'], date=row['day'], sessions=0, present=0, absent=0),
+        )
+        rollup.sessions += row['session_count']
+        rollup.present += row['present_count']
+        rollup.absent += row['absent_count']
+    # Days whose records all went away still need their row zeroed
+    for class_id, day in class_days or ():
+        rollups.setdefault((class_id, day), DailyClassAttendance(class_obj_id=class_id, date=day))
+
+    if rollups:
+        DailyClassAttendance.objects.bulk_create(
+            rollups.values(),
+            update_conflicts=True,
+            unique_fields=['class_obj', 'date'],
+            update_fields=['sessions', 'present', 'absent', 'updated_at'],
+        )
+    invalidate_trends({class_id for class_id, _ in rollups})
+    return len(rollups)
+
+
+def refresh_for_sessions(sessions):
+    """Refresh the rollups of the days these sessions fall on, if they are completed"""
+    return refresh_daily_rollups({
+        (session.class_obj_id, session_day(session))
+        for session in sessions
+        if session.status == 'completed'
+    })
+
+
+def _version_key(class_id):
+    return f'attendance_trend_version:{class_id}'
+
+
+def invalidate_trends(class_ids):
+    """Give each class a new cache version so cached trends are bypassed"""
+    if class_ids:
+        cache.set_many({_version_key(class_id): uuid.uuid4().hex for class_id in class_ids}, None)
+
+
+def get_trend(class_id, period='day', date_from=None, date_to=None):
+    """
+    Attendance buckets for a class, from the rollup table.
+    period: 'day' or 'week' (weeks start on Monday); bucket starts are aware
+    datetimes at local midnight in TIME_ZONE.
+    """
+    version = cache.get_or_set(_version_key(class_id), lambda: uuid.uuid4().hex, None)
+    key = f'attendance_trend:{class_id}:{version}:{period}:{date_from}:{date_to}'
+    buckets = cache.get(key)
+    record_cache('attendance_trend', buckets is not None)
+    if buckets is not None:
+        return buckets
+
+    rollups = DailyClassAttendance.objects.filter(class_obj_id=class_id)
+    if date_from:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(date__lte=date_to)
+
+    bucket = F('date') if period == 'day' else TruncWeek('date')
+    rows = rollups.values(bucket_date=bucket).annotate(
+        session_count=Sum('sessions'),
+        present_count=Sum('present'),
+        absent_count=Sum('absent'),
+    ).order_by('bucket_date')
+
+    buckets = []
+    for row in rows:
+        day = row['bucket_date']
+        if isinstance(day, datetime):
+            day = day.date()
+        marked = row['present_count'] + row['absent_count']
+        buckets.append({
+            'start': timezone.make_aware(datetime.combine(day, time.min)),
+            'date': day,
+            'sessions': row['session_count'],
+            'present': row['present_count'],
+            'absent': row['absent_count'],
+            'attendance_rate': round(row['present_count'] / marked * 100, 2) if marked else 0,
+        })
+    cache.set(key, buckets, TREND_CACHE_TIMEOUT)
+    return buckets
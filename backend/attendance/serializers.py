@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models.functions import Lower
 from .models import StudentProfile, Class, Enrollment, AttendanceSession, AttendanceRecord
 import json
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -253,6 +254,48 @@ class CreateClassSerializer(serializers.Serializer):  # Changed from ModelSerial
             }
 
 
+class CloneClassSerializer(serializers.Serializer):
+    """Serializer for cloning a class into a new semester"""
+    code = serializers.CharField(max_length=20)
+    semester = serializers.CharField(max_length=50)
+    name = serializers.CharField(max_length=200, required=False)
+    include_students = serializers.BooleanField(default=True)
+
+    def validate_code(self, value):
+        """Check if class code already exists"""
+        if Class.objects.filter(class_code__iexact=value).exists():
+            raise serializers.ValidationError(f"Class code {value} already exists.")
+        return value
+
+
+class RolloverClassItemSerializer(serializers.Serializer):
+    """One source class and its new code in a semester rollover"""
+    class_id = serializers.IntegerField()
+    code = serializers.CharField(max_length=20)
+    name = serializers.CharField(max_length=200, required=False)
+
+
+class RolloverSerializer(serializers.Serializer):
+    """Serializer for cloning many classes into a new semester at once"""
+    semester = serializers.CharField(max_length=50)
+    include_students = serializers.BooleanField(default=True)
+    classes = RolloverClassItemSerializer(many=True, allow_empty=False, max_length=200)
+
+    def validate_classes(self, value):
+        """Check new codes are unique and not taken, in one query"""
+        codes = [item['code'].lower() for item in value]
+        if len(set(codes)) != len(codes):
+            raise serializers.ValidationError("Class codes must be unique.")
+        if len({item['class_id'] for item in value}) != len(value):
+            raise serializers.ValidationError("Each class can only be rolled over once.")
+        taken = Class.objects.annotate(code_lower=Lower('class_code')).filter(
+            code_lower__in=codes
+        ).values_list('class_code', flat=True)
+        if taken:
+            raise serializers.ValidationError(f"Class codes already exist: {', '.join(taken)}")
+        return value
+
+
 class CreateSessionSerializer(serializers.Serializer):
     """Serializer for creating attendance session"""
     class_id = serializers.IntegerField()
@@ -340,6 +383,17 @@ class UpdateAttendanceStatusSerializer(serializers.Serializer):
     """Serializer for updating attendance status"""
     status = serializers.ChoiceField(choices=['present', 'absent'])
 
+
+class AttendanceStatusUpdateItemSerializer(serializers.Serializer):
+    """One record/status pair in a batch update"""
+    record_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['present', 'absent'])
+
+
+class BulkUpdateAttendanceStatusSerializer(serializers.Serializer):
+    """Serializer for updating the status of many attendance records"""
+    updates = AttendanceStatusUpdateItemSerializer(many=True, allow_empty=False, max_length=2000)
+
 # Add this near MyTokenObtainPairSerializer if you want to customize JWT login
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -0,0 +1,195 @@
+"""
+Cached read paths of live sessions.
+
+A QR scan needs the session's state and the class's enrolled-student ids; the
+teacher's attendance screen polls the session payload (with its QR data) and
+the roster with roll numbers. All of them are read through the default cache
+and filled on a miss, but create_session warms them up front and gunicorn's
+post_worker_init warms every active session, so the first wave of scans after
+a session starts (or after a deploy mid-lecture) finds them in the cache.
+
+Entries live until the session ends plus SESSION_CACHE_TIMEOUT. Views that
+change enrollments or roll numbers call invalidate_rosters(), and views that
+end or delete sessions call forget_sessions(); both take effect when the
+transaction commits, so a concurrent miss cannot cache the old rows again.
+Edits made elsewhere (e.g. the admin) show up when the entries expire.
+
+Invalidation only reaches other workers through a shared cache (e.g. redis),
+which multi-worker deployments should configure. Scans check enrollment with
+is_enrolled(), which confirms a cached "not enrolled" in the database, and
+with a per-process LocMemCache and WEB_CONCURRENCY above one confirms every
+answer, so a stale copy in another worker can neither reject a new student
+nor admit a removed one.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .lean import SESSION
+from .metrics import record_cache
+from .models import AttendanceSession, Enrollment
+
+# SESSION plus the fields scans and polls check before using the payload
+SESSION_STATE = SESSION.select(SESSION.keys, keep=['class_obj_id', 'teacher_id'])
+ROSTER_PATHS = ('student_id', 'student__username', 'student__email', 'student__student_profile__roll_no')
+
+
+def _session_key(session_id):
+    return f'live_session:{session_id}'
+
+
+def _roster_key(class_id):
+    return f'class_roster:{class_id}'
+
+
+def _enrolled_key(class_id):
+    return f'class_enrolled_ids:{class_id}'
+
+
+def cache_is_shared():
+    """False when several workers would each keep their own local-memory cache"""
+    return settings.WEB_CONCURRENCY <= 1 or not settings.CACHES['default']['BACKEND'].endswith('.LocMemCache')
+
+
+def _timeout(end_time):
+    remaining = (end_time - timezone.now()).total_seconds()
+    return max(int(remaining), 0) + settings.SESSION_CACHE_TIMEOUT
+
+
+class CachedSession:
+    """The session fields a scan or a poll needs, from one SESSION_STATE row"""
+
+    def __init__(self, row):
+        self.row = row
+        self.id = row[SESSION_STATE.index('id')]
+        self.session_id = row[SESSION_STATE.index('session_id')]
+        self.class_obj_id = row[SESSION_STATE.index('class_obj_id')]
+        self.teacher_id = row[SESSION_STATE.index('teacher_id')]
+        self.class_code = row[SESSION_STATE.index('class_obj__class_code')]
+        self.class_name = row[SESSION_STATE.index('class_obj__class_name')]
+        self.status = row[SESSION_STATE.index('status')]
+        self.end_time = row[SESSION_STATE.index('end_time')]
+
+    @property
+    def is_active(self):
+        return self.status == 'active' and timezone.now() < self.end_time
+
+    def data(self):
+        """SessionSerializer output, QR data included"""
+        return SESSION_STATE.serialize([self.row])[0]
+
+
+def get_session(session_id):
+    """CachedSession for a session UUID, or None when there is no such session"""
+    row = cache.get(_session_key(session_id))
+    record_cache('live_session', row is not None)
+    if row is None:
+        row = SESSION_STATE.values(AttendanceSession.objects.filter(session_id=session_id).order_by()).first()
+        if row is None:
+            return None
+        session = CachedSession(row)
+        cache.set(_session_key(session_id), row, _timeout(session.end_time))
+        return session
+    return CachedSession(row)
+
+
+def forget_sessions(session_ids):
+    """Drop cached session rows after their status changes or they are deleted"""
+    keys = [_session_key(session_id) for session_id in session_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _load_rosters(class_ids):
+    """{class_id: [(student_id, username, email, roll_no), ...]} in roster order"""
+    rosters = {class_id: [] for class_id in class_ids}
+    for class_id, *row in Enrollment.objects.filter(class_obj_id__in=class_ids).order_by(
+        'class_obj_id', 'student_id'
+    ).values_list('class_obj_id', *ROSTER_PATHS):
+        rosters[class_id].append(tuple(row))
+    return rosters
+
+
+def _roster_entries(rosters, timeouts):
+    entries = {}
+    for class_id, roster in rosters.items():
+        timeout = timeouts.get(class_id, settings.SESSION_CACHE_TIMEOUT)
+        entries.setdefault(timeout, {})[_roster_key(class_id)] = roster
+        entries[timeout][_enrolled_key(class_id)] = frozenset(row[0] for row in roster)
+    return entries
+
+
+def _store_rosters(class_ids, timeouts=None):
+    rosters = _load_rosters(class_ids)
+    for timeout, entries in _roster_entries(rosters, timeouts or {}).items():
+        cache.set_many(entries, timeout)
+    return rosters
+
+
+def get_roster(class_id):
+    """Enrolled students as (student_id, username, email, roll_no), roll_no None without a profile"""
+    roster = cache.get(_roster_key(class_id))
+    record_cache('class_roster', roster is not None)
+    if roster is None:
+        roster = _store_rosters([class_id])[class_id]
+    return roster
+
+
+def get_enrolled_ids(class_id):
+    """frozenset of the ids of students enrolled in the class"""
+    enrolled = cache.get(_enrolled_key(class_id))
+    record_cache('class_enrolled_ids', enrolled is not None)
+    if enrolled is None:
+        enrolled = frozenset(row[0] for row in _store_rosters([class_id])[class_id])
+    return enrolled
+
+
+def is_enrolled(class_id, student_id):
+    """
+    Whether the student is enrolled in the class. A cached yes is trusted when
+    the cache is shared; anything else is confirmed with one query, and a
+    cached answer the database contradicts is dropped so it is read again.
+    """
+    cached = student_id in get_enrolled_ids(class_id)
+    if cached and cache_is_shared():
+        return True
+    enrolled = Enrollment.objects.filter(class_obj_id=class_id, student_id=student_id).exists()
+    if enrolled != cached:
+        cache.delete_many([_roster_key(class_id), _enrolled_key(class_id)])
+    return enrolled
+
+
+def invalidate_rosters(class_ids):
+    """Drop cached rosters after enrollments or roll numbers change"""
+    keys = [key for class_id in class_ids for key in (_roster_key(class_id), _enrolled_key(class_id))]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _warm(sessions):
+    """Cache session rows and their classes' rosters; sessions are CachedSession"""
+    timeouts = {}
+    for session in sessions:
+        timeout = _timeout(session.end_time)
+        cache.set(_session_key(session.session_id), session.row, timeout)
+        timeouts[session.class_obj_id] = max(timeout, timeouts.get(session.class_obj_id, 0))
+    if timeouts:
+        _store_rosters(list(timeouts), timeouts)
+
+
+def warm_session(session):
+    """Warm every cache a scan or poll of a new session reads (one roster query)"""
+    _warm([CachedSession(SESSION_STATE.from_objects([session])[0])])
+
+
+def warm_active_sessions():
+    """Warm all sessions that are still running; returns how many were warmed"""
+    sessions = [
+        CachedSession(row)
+        for row in SESSION_STATE.values(
+            AttendanceSession.objects.filter(status='active', end_time__gt=timezone.now()).order_by()
+        )
+    ]
+    _warm(sessions)
+    return len(sessions)
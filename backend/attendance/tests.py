@@ -1,3 +1,1948 @@
-from django.test import TestCase
+"""
+Query-count and latency budgets for every route in attend_backend/urls.py.
 
-# Create your tests here.
+Each route is exercised against a seeded department-sized dataset and then
+again after the dataset has grown. Both runs must hit the same fixed query
+budget, so a per-row lazy load (N+1) fails here instead of slipping in.
+
+Wall-clock ceilings and speed comparisons depend on the machine, so they
+are only asserted with BENCHMARKS=1 in the environment.
+
+Behaviour tests live in per-feature classes that seed the same layout at a
+small size (SmallDatasetMixin).
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from datetime import date, datetime, time as dt_time, timedelta
+from unittest import mock, skipIf, skipUnless
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .analytics import ABSENT, NO_RECORD, PRESENT, absence_streaks, analyze, at_risk, build_matrix
+from . import compression, throttling
+from .middleware import CompressionMiddleware, NPlusOneMiddleware
+from .nplusone import NPlusOneError, fingerprint
+from . import partitioning
+from .models import (
+    Class, Enrollment, StudentProfile, AttendanceSession, AttendanceRecord, DailyClassAttendance,
+    ArchivedAttendanceRecord, ArchivedAttendanceSession, ArchivedAttendanceTotal, CompactSessionAttendance,
+)
+from .compact import compact_sessions, expand
+from .rollups import refresh_daily_rollups
+from .session_cache import warm_active_sessions, warm_session
+from .lean import ATTENDANCE_RECORD, SESSION, TEACHER_HISTORY
+from .serializers import AttendanceRecordSerializer, SessionSerializer, TeacherAttendanceHistorySerializer
+from . import renderers, views
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+
+User = get_user_model()
+
+TEST_PASSWORD = 'budget-pass-123'
+
+ROSTER_SIZE = 300
+CLASSES_PER_TEACHER = 3
+SESSIONS_PER_CLASS = 70
+
+# Opt-in timing assertions (see the module docstring)
+BENCHMARKS = os.getenv('BENCHMARKS', '') not in ('', '0')
+
+# url name -> (exact query count, wall-clock ceiling in seconds with BENCHMARKS)
+ROUTE_BUDGETS = {
+    'token_obtain_pair': (1, 0.5),
+    'token_refresh': (1, 0.5),
+    'register': (4, 0.5),
+    'me': (0, 0.5),
+    'check-student': (1, 0.5),
+    'check-students': (1, 1.0),
+    'class_list_create': (1, 0.5),
+    'class_detail': (3, 1.0),
+    'clone_class': (6, 0.5),
+    'rollover_classes': (8, 1.0),
+    'class_students': (2, 1.0),
+    'class_attendance_matrix': (5, 1.0),
+    'class_attendance_trend': (2, 0.5),
+    'class_at_risk_students': (5, 1.0),
+    'add_student': (7, 0.5),
+    'remove_student': (4, 0.5),
+    'update_student': (7, 0.5),
+    'bulk_enroll_students': (4, 0.5),
+    'bulk_unenroll_students': (4, 0.5),
+    'student_enrolled_classes': (1, 0.5),
+    'student_attendance_history': (2, 1.0),
+    'student_dashboard': (5, 0.5),
+    'create_session': (4, 0.5),
+    'active_sessions': (1, 0.5),
+    'session_details': (6, 1.0),
+    'mark_attendance': (2, 0.5),
+    'sync_offline_scans': (10, 1.0),
+    'end_session': (14, 1.0),
+    'manual_mark_attendance': (8, 0.5),
+    'bulk_manual_mark_attendance': (6, 0.5),
+    'teacher_attendance_history': (3, 5.0),
+    'defaulter_report': (2, 1.0),
+    'update_attendance': (8, 0.5),
+    'bulk_update_attendance': (8, 1.0),
+    'session_attendance_details': (1, 1.0),
+    'ping': (0, 0.5),
+    'metrics': (1, 0.5),
+}
+
+# model label -> exact query count for the admin changelist
+ADMIN_CHANGELIST_BUDGETS = {
+    'auth.group': 5,
+    'attendance.user': 5,
+    'attendance.studentprofile': 5,
+    'attendance.class': 6,
+    'attendance.enrollment': 6,
+    'attendance.attendancesession': 6,
+    'attendance.attendancerecord': 5,
+}
+
+ADMIN_CHANGELIST_CEILING = 2.0
+
+
+def _route_names(resolver=None):
+    """Names of all API routes (admin URLs are covered separately)"""
+    resolver = resolver or get_resolver()
+    names = set()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name == 'admin':
+                continue
+            names |= _route_names(pattern)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+class BudgetDatasetMixin:
+    """Seeds teachers with several classes, 300-student rosters and hundreds of sessions"""
+
+    roster_size = ROSTER_SIZE
+    roster_step = 30  # offset between the rosters of neighbouring classes
+    classes_per_teacher = CLASSES_PER_TEACHER
+    sessions_per_class = SESSIONS_PER_CLASS
+
+    def setUp(self):
+        # Session and roster caches outlive the rolled-back rows of other tests
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.password_hash = make_password(TEST_PASSWORD)
+        cls.teacher = User.objects.create(
+            username='teacher', email='teacher@example.com', role='teacher', password=cls.password_hash
+        )
+        cls.other_teacher = User.objects.create(
+            username='other', email='other@example.com', role='teacher', password=cls.password_hash
+        )
+        cls.admin_user = User.objects.create(
+            username='admin', email='admin@example.com', role='admin',
+            is_staff=True, is_superuser=True, password=cls.password_hash
+        )
+
+        # Rosters overlap so some students attend every class
+        pool_size = cls.roster_size + cls.roster_step * (cls.classes_per_teacher - 1)
+        students = cls._create_students('seed', pool_size)
+        cls.classes = [
+            Class.objects.create(
+                class_code=f'CS{i:03d}', class_name=f'Course {i}', semester='Fall 2025', teacher=cls.teacher
+            )
+            for i in range(cls.classes_per_teacher)
+        ]
+        for i, class_obj in enumerate(cls.classes):
+            offset = i * cls.roster_step
+            cls._enroll(class_obj, students[offset:offset + cls.roster_size])
+            cls._create_completed_sessions(class_obj, cls.sessions_per_class)
+
+        # Enrolled in every seeded class but not in the other teacher's
+        student_index = cls.roster_step * (cls.classes_per_teacher - 1)
+        other_class = Class.objects.create(
+            class_code='EE001', class_name='Circuits', semester='Fall 2025', teacher=cls.other_teacher
+        )
+        cls._enroll(other_class, students[:min(20, student_index)])
+        cls._create_completed_sessions(other_class, 5)
+
+        cls.student = students[student_index]
+        cls.active_session = cls._create_active_session(cls.classes[0])
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(session=cls.active_session, student=s) for s in students[:cls.roster_size // 3]
+        )
+        cls.completed_session = AttendanceSession.objects.filter(
+            class_obj=cls.classes[0], status='completed'
+        ).first()
+
+    @classmethod
+    def _create_students(cls, prefix, count):
+        users = User.objects.bulk_create(
+            User(
+                username=f'{prefix}{n}', email=f'{prefix}{n}@example.com',
+                role='student', password=cls.password_hash
+            )
+            for n in range(count)
+        )
+        StudentProfile.objects.bulk_create(
+            StudentProfile(student=u, roll_no=f'{prefix.upper()}{n:05d}') for n, u in enumerate(users)
+        )
+        return users
+
+    @staticmethod
+    def _enroll(class_obj, students):
+        Enrollment.objects.bulk_create(Enrollment(class_obj=class_obj, student=s) for s in students)
+
+    @staticmethod
+    def _create_completed_sessions(class_obj, count):
+        now = timezone.now()
+        sessions = AttendanceSession.objects.bulk_create(
+            AttendanceSession(
+                class_obj=class_obj, teacher=class_obj.teacher, duration_minutes=50,
+                end_time=now, qr_code_data='{}', status='completed'
+            )
+            for _ in range(count)
+        )
+        student_ids = list(class_obj.enrollments.values_list('student_id', flat=True))
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(
+                session=session, student_id=student_id,
+                status='absent' if (n + student_id) % 5 == 0 else 'present'
+            )
+            for n, session in enumerate(sessions)
+            for student_id in student_ids
+        )
+        return sessions
+
+    @staticmethod
+    def _create_active_session(class_obj):
+        session_uuid = uuid.uuid4()
+        return AttendanceSession.objects.create(
+            session_id=session_uuid, class_obj=class_obj, teacher=class_obj.teacher,
+            duration_minutes=60, end_time=timezone.now() + timedelta(minutes=60),
+            qr_code_data=f'{{"session_id": "{session_uuid}"}}', status='active'
+        )
+
+    def grow_dataset(self):
+        """Add rows to everything an endpoint might return"""
+        prefix = f'grow{uuid.uuid4().hex[:6]}'
+        newcomers = self._create_students(prefix, 40)
+        for class_obj in self.classes:
+            self._enroll(class_obj, newcomers)
+            self._create_completed_sessions(class_obj, 5)
+        extra_class = Class.objects.create(
+            class_code=prefix, class_name='Extra', semester='Fall 2025', teacher=self.teacher
+        )
+        self._enroll(extra_class, [self.student, *newcomers])
+        self._create_completed_sessions(extra_class, 3)
+        self._create_active_session(extra_class)
+        AttendanceRecord.objects.bulk_create(
+            AttendanceRecord(session=self.active_session, student=s) for s in newcomers
+        )
+
+
+FAST_HASHER = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+
+class SmallDatasetMixin(BudgetDatasetMixin):
+    """The same layout at a size that keeps behaviour tests quick"""
+
+    roster_size = 10
+    roster_step = 1
+    sessions_per_class = 12
+
+
+@FAST_HASHER
+class EndpointBudgetTests(BudgetDatasetMixin, APITestCase):
+
+    def assertWithinBudget(self, name, user, method, make_request, **extra):
+        """
+        Run the request on the seeded and then the grown dataset.
+        make_request() is called outside the measured block and returns (url, data);
+        extra is passed to the client (e.g. headers).
+        """
+        queries, ceiling = ROUTE_BUDGETS[name]
+        for phase in ('seeded', 'grown'):
+            if phase == 'grown':
+                self.grow_dataset()
+            url, data = make_request()
+            self.client.force_authenticate(user)
+            started = time.perf_counter()
+            with self.assertNumQueries(queries):
+                if method == 'get':
+                    response = self.client.get(url, data, **extra)
+                else:
+                    response = getattr(self.client, method)(url, data, format='json', **extra)
+            elapsed = time.perf_counter() - started
+            self.assertLess(response.status_code, 400, f'{name} ({phase}): {response.content[:300]}')
+            if BENCHMARKS:
+                self.assertLessEqual(elapsed, ceiling, f'{name} took {elapsed:.2f}s on the {phase} dataset')
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(_route_names(), set(ROUTE_BUDGETS))
+
+    # Authentication
+
+    def test_token_obtain_pair(self):
+        self.assertWithinBudget('token_obtain_pair', None, 'post', lambda: (
+            reverse('token_obtain_pair'), {'email': self.student.email, 'password': TEST_PASSWORD}
+        ))
+
+    def test_token_refresh(self):
+        self.assertWithinBudget('token_refresh', None, 'post', lambda: (
+            reverse('token_refresh'), {'refresh': str(RefreshToken.for_user(self.student))}
+        ))
+
+    def test_register(self):
+        def make_request():
+            name = uuid.uuid4().hex[:10]
+            return reverse('register'), {
+                'username': name, 'email': f'{name}@example.com', 'role': 'student',
+                'password': 'Correct-Horse-42', 'password2': 'Correct-Horse-42',
+            }
+        self.assertWithinBudget('register', None, 'post', make_request)
+
+    def test_me(self):
+        self.assertWithinBudget('me', self.student, 'get', lambda: (reverse('me'), None))
+
+    def test_check_student(self):
+        self.assertWithinBudget('check-student', self.teacher, 'get', lambda: (
+            reverse('check-student'), {'email': self.student.email}
+        ))
+
+    def test_check_students(self):
+        def make_request():
+            emails = list(User.objects.filter(role='student').values_list('email', flat=True)[:2000])
+            return reverse('check-students'), {'emails': emails + ['missing@example.com', 'not-an-email']}
+        self.assertWithinBudget('check-students', self.teacher, 'post', make_request)
+
+    # Class management
+
+    def test_class_list(self):
+        self.assertWithinBudget('class_list_create', self.teacher, 'get', lambda: (
+            reverse('class_list_create'), None
+        ))
+
+    def test_class_detail(self):
+        self.assertWithinBudget('class_detail', self.teacher, 'get', lambda: (
+            reverse('class_detail', args=[self.classes[0].id]), None
+        ))
+
+    def test_clone_class(self):
+        self.assertWithinBudget('clone_class', self.teacher, 'post', lambda: (
+            reverse('clone_class', args=[self.classes[0].id]),
+            {'code': f'C{uuid.uuid4().hex[:8]}', 'semester': 'Spring 2026'}
+        ))
+
+    def test_rollover_classes(self):
+        self.assertWithinBudget('rollover_classes', self.teacher, 'post', lambda: (
+            reverse('rollover_classes'), {'semester': 'Spring 2026', 'classes': [
+                {'class_id': c.id, 'code': f'R{uuid.uuid4().hex[:8]}'} for c in self.classes[:2]
+            ]}
+        ))
+
+    def test_class_students(self):
+        self.assertWithinBudget('class_students', self.teacher, 'get', lambda: (
+            reverse('class_students', args=[self.classes[0].id]), None
+        ))
+
+    def test_class_attendance_matrix(self):
+        self.assertWithinBudget('class_attendance_matrix', self.teacher, 'get', lambda: (
+            reverse('class_attendance_matrix', args=[self.classes[0].id]), None
+        ))
+
+    def test_class_attendance_trend(self):
+        def make_request():
+            refresh_daily_rollups()
+            return reverse('class_attendance_trend', args=[self.classes[0].id]), {'period': 'week'}
+        self.assertWithinBudget('class_attendance_trend', self.teacher, 'get', make_request)
+
+    def test_add_student(self):
+        def make_request():
+            newcomer = self._create_students(f'add{uuid.uuid4().hex[:6]}', 1)[0]
+            return reverse('add_student', args=[self.classes[0].id]), {'email': newcomer.email}
+        self.assertWithinBudget('add_student', self.teacher, 'post', make_request)
+
+    def test_remove_student(self):
+        def make_request():
+            enrollment = Enrollment.objects.filter(class_obj=self.classes[0]).first()
+            return reverse('remove_student', args=[self.classes[0].id, enrollment.student_id]), None
+        self.assertWithinBudget('remove_student', self.teacher, 'delete', make_request)
+
+    def test_update_student(self):
+        self.assertWithinBudget('update_student', self.teacher, 'put', lambda: (
+            reverse('update_student', args=[self.classes[0].id, self.student.id]),
+            {'roll_no': f'R{uuid.uuid4().hex[:8]}'}
+        ))
+
+    def test_bulk_enroll_students(self):
+        def make_request():
+            newcomers = self._create_students(f'bulk{uuid.uuid4().hex[:6]}', 30)
+            return reverse('bulk_enroll_students', args=[self.classes[0].id]), {
+                'emails': [u.email for u in newcomers[:15]],
+                'roll_nos': [u.student_profile.roll_no for u in newcomers[15:]],
+            }
+        self.assertWithinBudget('bulk_enroll_students', self.teacher, 'post', make_request)
+
+    def test_bulk_unenroll_students(self):
+        def make_request():
+            enrolled = Enrollment.objects.filter(class_obj=self.classes[0]).select_related('student')[:30]
+            return reverse('bulk_unenroll_students', args=[self.classes[0].id]), {
+                'emails': [e.student.email for e in enrolled],
+            }
+        self.assertWithinBudget('bulk_unenroll_students', self.teacher, 'post', make_request)
+
+    # Student views
+
+    def test_student_enrolled_classes(self):
+        self.assertWithinBudget('student_enrolled_classes', self.student, 'get', lambda: (
+            reverse('student_enrolled_classes'), None
+        ))
+
+    def test_student_attendance_history(self):
+        self.assertWithinBudget('student_attendance_history', self.student, 'get', lambda: (
+            reverse('student_attendance_history'), None
+        ))
+
+    def test_student_dashboard(self):
+        self.assertWithinBudget('student_dashboard', self.student, 'get', lambda: (
+            reverse('student_dashboard'), {'recent': 20}
+        ))
+
+    # Sessions
+
+    def test_create_session(self):
+        self.assertWithinBudget('create_session', self.teacher, 'post', lambda: (
+            reverse('create_session'), {'class_id': self.classes[0].id, 'duration_minutes': 10}
+        ))
+
+    def test_active_sessions(self):
+        self.assertWithinBudget('active_sessions', self.teacher, 'get', lambda: (
+            reverse('active_sessions'), None
+        ))
+
+    def test_session_details(self):
+        self.assertWithinBudget('session_details', self.teacher, 'get', lambda: (
+            reverse('session_details', args=[self.active_session.session_id]), None
+        ))
+
+    def test_mark_attendance(self):
+        def make_request():
+            session = self._create_active_session(self.classes[0])
+            warm_session(session)  # as create_session does
+            return reverse('mark_attendance', args=[session.session_id]), None
+        self.assertWithinBudget('mark_attendance', self.student, 'post', make_request)
+
+    def test_sync_offline_scans(self):
+        def make_request():
+            scanned_at = timezone.now().isoformat()
+            scans = []
+            for class_obj in self.classes:
+                active = self._create_active_session(class_obj)
+                completed = self._create_completed_sessions(class_obj, 1)[0]
+                AttendanceRecord.objects.filter(session=completed, student=self.student).update(status='absent', auto_marked=True)
+                scans += [
+                    {'session_id': str(active.session_id), 'scanned_at': scanned_at},
+                    {'session_id': str(completed.session_id), 'scanned_at': scanned_at},
+                ]
+            return reverse('sync_offline_scans'), {'scans': scans}
+        self.assertWithinBudget('sync_offline_scans', self.student, 'post', make_request)
+
+    def test_end_session(self):
+        def make_request():
+            session = self._create_active_session(self.classes[0])
+            AttendanceRecord.objects.create(session=session, student=self.student)
+            return reverse('end_session', args=[session.session_id]), None
+        self.assertWithinBudget('end_session', self.teacher, 'post', make_request)
+
+    def test_manual_mark_attendance(self):
+        self.assertWithinBudget('manual_mark_attendance', self.teacher, 'post', lambda: (
+            reverse('manual_mark_attendance', args=[self.active_session.session_id]),
+            {'student_id': self.student.id, 'status': 'present'}
+        ))
+
+    def test_bulk_manual_mark_attendance(self):
+        def make_request():
+            enrolled = Enrollment.objects.filter(class_obj=self.classes[0]).select_related('student__student_profile')
+            records = [
+                {'roll_no': e.student.student_profile.roll_no, 'status': 'absent'} if n % 2
+                else {'student_id': e.student_id, 'status': 'present'}
+                for n, e in enumerate(enrolled[:40])
+            ]
+            return reverse('bulk_manual_mark_attendance', args=[self.active_session.session_id]), {'records': records}
+        self.assertWithinBudget('bulk_manual_mark_attendance', self.teacher, 'post', make_request)
+
+    # Teacher history
+
+    def test_teacher_attendance_history(self):
+        self.assertWithinBudget('teacher_attendance_history', self.teacher, 'get', lambda: (
+            reverse('teacher_attendance_history'), None
+        ))
+
+    def test_defaulter_report(self):
+        self.assertWithinBudget('defaulter_report', self.teacher, 'get', lambda: (
+            reverse('defaulter_report'), {'threshold': 90}
+        ))
+
+    def test_class_at_risk_students(self):
+        self.assertWithinBudget('class_at_risk_students', self.teacher, 'get', lambda: (
+            reverse('class_at_risk_students', args=[self.classes[0].id]), None
+        ))
+
+    def test_update_attendance(self):
+        def make_request():
+            record = AttendanceRecord.objects.filter(session=self.completed_session).first()
+            return reverse('update_attendance', args=[record.id]), {'status': 'absent'}
+        self.assertWithinBudget('update_attendance', self.teacher, 'put', make_request)
+
+    def test_bulk_update_attendance(self):
+        def make_request():
+            records = AttendanceRecord.objects.filter(session__class_obj=self.classes[1]).values_list('id', 'status')
+            return reverse('bulk_update_attendance'), {'updates': [
+                {'record_id': record_id, 'status': 'absent' if old == 'present' else 'present'}
+                for record_id, old in records[:600]
+            ]}
+        self.assertWithinBudget('bulk_update_attendance', self.teacher, 'put', make_request)
+
+    def test_session_attendance_details(self):
+        def make_request():
+            # grow_dataset enrolls students without going through the views
+            cache.clear()
+            warm_session(self.completed_session)
+            return reverse('session_attendance_details', args=[self.completed_session.session_id]), None
+        self.assertWithinBudget('session_attendance_details', self.teacher, 'get', make_request)
+
+    def test_ping(self):
+        self.assertWithinBudget('ping', None, 'get', lambda: (reverse('ping'), None))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics(self):
+        self.assertWithinBudget(
+            'metrics', None, 'get', lambda: (reverse('metrics'), None), HTTP_AUTHORIZATION='Bearer scrape-secret'
+        )
+
+
+@FAST_HASHER
+class StudentLookupTests(SmallDatasetMixin, APITestCase):
+
+    def test_check_students_maps_results_by_email(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(reverse('check-students'), {
+            'emails': [self.student.email, 'missing@example.com', self.teacher.email, 'bad'],
+        }, format='json')
+        results = response.data['results']
+        self.assertEqual(results[self.student.email]['student']['roll_no'], self.student.student_profile.roll_no)
+        self.assertEqual(results['missing@example.com'], {'exists': False})
+        self.assertEqual(results[self.teacher.email], {'exists': False})
+        self.assertEqual(response.data['invalid'], ['bad'])
+
+    def test_check_students_is_for_teachers_only(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('check-students'), {'emails': [self.student.email]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+@FAST_HASHER
+class RolloverTests(SmallDatasetMixin, APITestCase):
+
+    def test_rollover_copies_rosters(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(reverse('rollover_classes'), {'semester': 'Spring 2026', 'classes': [
+            {'class_id': c.id, 'code': f'{c.class_code}-S26'} for c in self.classes
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        for source in self.classes:
+            clone = Class.objects.get(class_code=f'{source.class_code}-S26')
+            self.assertEqual(clone.semester, 'Spring 2026')
+            self.assertEqual(
+                set(clone.enrollments.values_list('student_id', flat=True)),
+                set(source.enrollments.values_list('student_id', flat=True)),
+            )
+        self.assertEqual(response.data['classes'][0]['student_count'], self.roster_size)
+
+    def test_rollover_is_all_or_nothing(self):
+        self.client.force_authenticate(self.teacher)
+        other_class = Class.objects.get(class_code='EE001')
+        response = self.client.post(reverse('rollover_classes'), {'semester': 'Spring 2026', 'classes': [
+            {'class_id': self.classes[0].id, 'code': 'NEW1'},
+            {'class_id': other_class.id, 'code': 'NEW2'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Class.objects.filter(class_code__in=['NEW1', 'NEW2']).exists())
+
+    def test_rollover_semester_command(self):
+        out = StringIO()
+        call_command('rollover_semester', 'Fall 2025', 'Spring 2026', '--teacher', self.teacher.email, stdout=out)
+        self.assertIn(f'Created {self.classes_per_teacher} classes', out.getvalue())
+        clone = Class.objects.get(class_code='CS000-Spring2026')
+        self.assertEqual(clone.enrollments.count(), self.roster_size)
+
+
+@FAST_HASHER
+class RosterTests(SmallDatasetMixin, APITestCase):
+
+    def test_class_students_fields(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('class_students', args=[self.classes[0].id])
+        full = self.client.get(url).data['students']
+        with CaptureQueriesContext(connection) as queries:
+            sparse = self.client.get(url, {'fields': 'id,roll_no'}).data['students']
+        self.assertEqual(sparse, [{'id': s['id'], 'roll_no': s['roll_no']} for s in full])
+        self.assertNotIn('email', queries.captured_queries[-1]['sql'])
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+
+    def test_bulk_enroll_groups_results(self):
+        newcomer = self._create_students('solo', 1)[0]
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(reverse('bulk_enroll_students', args=[self.classes[0].id]), {
+            'emails': [newcomer.email, self.student.email, 'nobody@example.com', self.other_teacher.email],
+            'roll_nos': [newcomer.student_profile.roll_no],
+        }, format='json')
+        self.assertEqual([s['id'] for s in response.data['enrolled']], [newcomer.id])
+        self.assertEqual([s['id'] for s in response.data['already_enrolled']], [self.student.id])
+        self.assertEqual(response.data['not_found'], ['nobody@example.com'])
+        self.assertEqual(response.data['not_student'], [self.other_teacher.email])
+        self.assertTrue(Enrollment.objects.filter(class_obj=self.classes[0], student=newcomer).exists())
+
+
+@FAST_HASHER
+class AttendanceMatrixTests(BudgetDatasetMixin, APITestCase):
+
+    classes_per_teacher = 1
+
+    def test_class_attendance_matrix_rows(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('class_attendance_matrix', args=[self.classes[0].id])
+        chars = self.client.get(url, {'encoding': 'chars'})
+        self.assertEqual(len(chars.data['sessions']), self.sessions_per_class + 1)
+        self.assertEqual(len(chars.data['students']), self.roster_size)
+
+        row = next(s for s in chars.data['students'] if s['id'] == self.student.id)
+        statuses = dict(AttendanceRecord.objects.filter(student=self.student).values_list('session__session_id', 'status'))
+        for session, symbol in zip(chars.data['sessions'], row['attendance']):
+            self.assertEqual(symbol, {'present': 'P', 'absent': 'A'}.get(statuses.get(session['session_id']), '-'))
+
+        rle = self.client.get(url, {'encoding': 'rle'})
+        rle_row = next(s for s in rle.data['students'] if s['id'] == self.student.id)['attendance']
+        self.assertEqual(''.join(sym * int(n) for sym, n in re.findall(r'([PA-])(\d+)', rle_row)), row['attendance'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        packed = json.loads(gzip.decompress(response.content))
+        self.assertEqual(packed['encoding'], 'packed')
+        legend = {int(code): meaning for code, meaning in packed['legend'].items()}
+        for student, expected in zip(packed['students'], chars.data['students']):
+            cells = base64.b64decode(student['attendance'])
+            self.assertEqual(len(cells), (self.sessions_per_class + 4) // 4)
+            decoded = [legend[cells[i // 4] >> (i % 4 * 2) & 3] for i in range(len(packed['sessions']))]
+            self.assertEqual(decoded, [
+                {'P': 'present', 'A': 'absent', '-': 'no record'}[symbol] for symbol in expected['attendance']
+            ])
+        # 300 x 71 cells take about 7 KB of rows, and the whole response a few KB gzipped
+        self.assertLess(sum(len(student['attendance']) for student in packed['students']), 8 * 1024)
+        self.assertLess(len(response.content), 8 * 1024)
+
+
+@FAST_HASHER
+class AttendanceRollupTests(SmallDatasetMixin, APITestCase):
+
+    def test_class_attendance_trend_buckets_and_invalidation(self):
+        class_obj = self.classes[0]
+        completed = list(AttendanceSession.objects.filter(class_obj=class_obj, status='completed').order_by('id'))
+        # Move a week's worth of sessions to a known Monday-to-Sunday span
+        monday = timezone.make_aware(timezone.datetime(2025, 9, 1, 10, 0))
+        for offset, session in enumerate(completed[:7]):
+            AttendanceSession.objects.filter(pk=session.pk).update(start_time=monday + timedelta(days=offset))
+        refresh_daily_rollups()
+
+        url = reverse('class_attendance_trend', args=[class_obj.id])
+        self.client.force_authenticate(self.teacher)
+        days = self.client.get(url, {'date_from': '2025-09-01', 'date_to': '2025-09-07'}).data['buckets']
+        self.assertEqual([b['date'].isoformat() for b in days], [f'2025-09-0{d}' for d in range(1, 8)])
+        self.assertTrue(all(b['sessions'] == 1 and b['present'] + b['absent'] == self.roster_size for b in days))
+
+        weeks = self.client.get(url, {'period': 'week', 'date_from': '2025-09-01', 'date_to': '2025-09-07'}).data['buckets']
+        self.assertEqual(len(weeks), 1)
+        self.assertEqual(weeks[0]['sessions'], 7)
+        self.assertEqual(weeks[0]['present'], sum(b['present'] for b in days))
+
+        # Cached until the class's rollups change
+        before = self.client.get(url).data['buckets'][-1]['sessions']
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        self.client.post(reverse('end_session', args=[self.active_session.session_id]))
+        self.assertEqual(self.client.get(url).data['buckets'][-1]['sessions'], before + 1)
+
+    def test_backfill_attendance_rollups_command(self):
+        out = StringIO()
+        call_command('backfill_attendance_rollups', '--class-id', str(self.classes[1].id), stdout=out)
+        self.assertIn('Wrote 1 daily rollup rows', out.getvalue())
+        rollup = DailyClassAttendance.objects.get(class_obj=self.classes[1])
+        self.assertEqual(rollup.sessions, self.sessions_per_class)
+        self.assertEqual(rollup.present + rollup.absent, self.sessions_per_class * self.roster_size)
+
+
+@FAST_HASHER
+class StudentHistoryTests(SmallDatasetMixin, APITestCase):
+
+    def test_student_dashboard_matches_history(self):
+        self.client.force_authenticate(self.student)
+        history = self.client.get(reverse('student_attendance_history')).data['attendance']
+        dashboard = self.client.get(reverse('student_dashboard')).data
+
+        for class_data in dashboard['classes']:
+            rows = [r for r in history if r['class_code'] == class_data['class_code']]
+            present = sum(r['status'] == 'present' for r in rows)
+            self.assertEqual((class_data['present'], class_data['total']), (present, len(rows)))
+            self.assertEqual(class_data['percentage'], round(present / len(rows) * 100, 2))
+        self.assertEqual(dashboard['summary']['total'], len(history))
+
+        by_code = {c['class_code']: c for c in dashboard['classes']}
+        active = by_code[self.classes[0].class_code]['active_session']
+        self.assertEqual(active['session_id'], self.active_session.session_id)
+        self.assertTrue(active['already_marked'])
+        self.assertIsNone(by_code[self.classes[1].class_code]['active_session'])
+
+        self.assertEqual([r['id'] for r in dashboard['recent_attendance']], [r['id'] for r in history[:10]])
+        self.assertEqual(self.client.get(reverse('student_dashboard'), {'recent': 500}).status_code, 400)
+
+    def test_student_attendance_history_date_filter(self):
+        old_sessions = AttendanceSession.objects.filter(class_obj=self.classes[0], status='completed').order_by('id')[:10]
+        old_start = timezone.make_aware(timezone.datetime(2025, 1, 10, 9, 0))
+        AttendanceRecord.objects.filter(session__in=old_sessions).update(marked_at=old_start)
+        AttendanceSession.objects.filter(id__in=[s.id for s in old_sessions]).update(start_time=old_start)
+        self.client.force_authenticate(self.student)
+
+        everything = self.client.get(reverse('student_attendance_history')).data['total']
+        with self.assertNumQueries(2):
+            recent = self.client.get(reverse('student_attendance_history'), {'date_from': '2025-06-01'}).data['total']
+        self.assertEqual(recent, everything - 10)
+        older = self.client.get(reverse('student_attendance_history'), {'date_to': '2025-01-31'}).data['total']
+        self.assertEqual(older, 10)
+
+
+@FAST_HASHER
+class CompactionTests(SmallDatasetMixin, APITestCase):
+
+    def test_compacted_sessions_read_like_records(self):
+        compacted_class = self.classes[1]
+        refresh_daily_rollups()
+        rollup_before = DailyClassAttendance.objects.get(class_obj=compacted_class)
+        student_url = reverse('student_attendance_history')
+        teacher_url = reverse('teacher_attendance_history')
+
+        def student_rows():
+            self.client.force_authenticate(self.student)
+            return sorted(
+                (r['class_code'], r['date'], r['status'], r['marked_at'])
+                for r in self.client.get(student_url).data['attendance']
+            )
+
+        def teacher_view():
+            self.client.force_authenticate(self.teacher)
+            data = self.client.get(teacher_url, {'class_id': compacted_class.id}).data
+            return data['statistics'], sorted((r['student_email'], r['status']) for r in data['attendance'])
+
+        student_before, teacher_before = student_rows(), teacher_view()
+        records = AttendanceRecord.objects.filter(session__class_obj=compacted_class).count()
+
+        out = StringIO()
+        call_command('compact_attendance_sessions', '--older-than-days', '0', '--class-id', str(compacted_class.id), stdout=out)
+        self.assertIn(f'Compacted {self.sessions_per_class} sessions, replacing {records} attendance records', out.getvalue())
+        self.assertFalse(AttendanceRecord.objects.filter(session__class_obj=compacted_class).exists())
+        stored = sum(
+            len(row.student_ids) + len(row.present) + len(row.present_offsets) + len(row.absent_offsets)
+            for row in CompactSessionAttendance.objects.filter(session__class_obj=compacted_class)
+        )
+        self.assertLess(stored, records * 10)
+
+        student_after = student_rows()
+        self.assertEqual([row[:3] for row in student_after], [row[:3] for row in student_before])
+        # Present marks keep second precision
+        for after, before in zip(student_after, student_before):
+            self.assertLess(abs((after[3] - before[3]).total_seconds()), 1)
+        with self.assertNumQueries(4):
+            self.assertEqual(teacher_view(), teacher_before)
+
+        refresh_daily_rollups()
+        rollup_after = DailyClassAttendance.objects.get(class_obj=compacted_class)
+        self.assertEqual(
+            (rollup_after.sessions, rollup_after.present, rollup_after.absent),
+            (rollup_before.sessions, rollup_before.present, rollup_before.absent),
+        )
+
+    def test_compacted_sessions_keep_each_mark_time(self):
+        session = self.completed_session
+        records = AttendanceRecord.objects.filter(session=session).order_by('student_id')
+        for n, record in enumerate(records):
+            AttendanceRecord.objects.filter(pk=record.pk).update(
+                status='absent' if n % 3 else 'present', marked_at=session.start_time + timedelta(minutes=n)
+            )
+        expected = list(records.values_list('student_id', 'status', 'marked_at'))
+
+        compact_sessions(AttendanceSession.objects.filter(pk=session.pk))
+        compact = CompactSessionAttendance.objects.get(session=session)
+        self.assertEqual([(r.student_id, r.status, r.marked_at) for r in expand(compact)], expected)
+        last = expand(compact, student_id=expected[-1][0])[0]
+        self.assertEqual((last.status, last.marked_at), expected[-1][1:])
+
+    def test_compacted_sessions_reject_writes(self):
+        session = self.completed_session
+        legacy = AttendanceRecord.objects.filter(session=session).first()
+        compact_sessions(AttendanceSession.objects.filter(pk=session.pk))
+        # A live record left next to the bitmap by an earlier write
+        legacy = AttendanceRecord.objects.create(session=session, student_id=legacy.student_id, status='absent')
+
+        self.client.force_authenticate(self.teacher)
+        responses = [
+            self.client.post(reverse('manual_mark_attendance', args=[session.session_id]), {
+                'student_id': self.student.id, 'status': 'present',
+            }, format='json'),
+            self.client.post(reverse('bulk_manual_mark_attendance', args=[session.session_id]), {
+                'records': [{'student_id': self.student.id, 'status': 'present'}],
+            }, format='json'),
+            self.client.put(reverse('update_attendance', args=[legacy.id]), {'status': 'present'}, format='json'),
+        ]
+        self.assertEqual([r.status_code for r in responses], [409, 409, 409])
+        response = self.client.put(reverse('bulk_update_attendance'), {
+            'updates': [{'record_id': legacy.id, 'status': 'present'}],
+        }, format='json')
+        self.assertEqual((response.data['updated'], response.data['finalized']), (0, [legacy.id]))
+        self.assertEqual(list(AttendanceRecord.objects.filter(session=session).values_list('status', flat=True)), ['absent'])
+
+    def test_compacted_sessions_reach_every_reader(self):
+        compacted_class = self.classes[1]
+        session = AttendanceSession.objects.filter(class_obj=compacted_class, status='completed').first()
+        AttendanceRecord.objects.filter(session=session, student=self.student).update(status='absent')
+        self.client.force_authenticate(self.teacher)
+
+        def readers():
+            cache.clear()
+            details = self.client.get(reverse('session_details', args=[session.session_id])).data
+            roster = self.client.get(reverse('session_attendance_details', args=[session.session_id])).data
+            return {
+                'session_details': (
+                    sorted((r['student_email'], r['status']) for r in details['attendance']), details['total_present']
+                ),
+                'session_attendance_details': (
+                    [(s['id'], s['status'], s['has_record']) for s in roster['students']], roster['statistics']
+                ),
+                'matrix': self.client.get(reverse('class_attendance_matrix', args=[compacted_class.id])).data,
+                'defaulters': self.client.get(reverse('defaulter_report'), {
+                    'threshold': 100, 'class_id': compacted_class.id,
+                }).data,
+                'at_risk': self.client.get(reverse('class_at_risk_students', args=[compacted_class.id]), {
+                    'streak': 1,
+                }).data,
+            }
+
+        before = readers()
+        self.assertIn(self.student.id, [row['student_id'] for row in before['defaulters']['defaulters']])
+        self.assertIn(self.student.id, [row['id'] for row in before['at_risk']['students']])
+        compact_sessions(AttendanceSession.objects.filter(class_obj=compacted_class))
+        self.assertFalse(AttendanceRecord.objects.filter(session__class_obj=compacted_class).exists())
+        self.assertEqual(readers(), before)
+
+    def test_compacted_history_outlives_the_enrollment(self):
+        compacted_class = self.classes[1]
+        compact_sessions(AttendanceSession.objects.filter(class_obj=compacted_class))
+        self.client.force_authenticate(self.student)
+
+        def compacted_rows():
+            history = self.client.get(reverse('student_attendance_history')).data['attendance']
+            recent = self.client.get(reverse('student_dashboard'), {'recent': 100}).data['recent_attendance']
+            return (
+                sorted((r['date'], r['status']) for r in history if r['class_code'] == compacted_class.class_code),
+                sum(r['class_code'] == compacted_class.class_code for r in recent),
+            )
+
+        before = compacted_rows()
+        self.assertEqual(len(before[0]), self.sessions_per_class)
+        Enrollment.objects.filter(class_obj=compacted_class, student=self.student).delete()
+        self.assertEqual(compacted_rows(), before)
+
+
+@FAST_HASHER
+class OfflineSyncTests(SmallDatasetMixin, APITestCase):
+
+    def test_sync_offline_scans_reports_per_scan_outcomes(self):
+        active = self._create_active_session(self.classes[0])
+        completed = self._create_completed_sessions(self.classes[1], 1)[0]
+        AttendanceRecord.objects.filter(session=completed, student=self.student).update(status='absent', auto_marked=True)
+        excused = self._create_completed_sessions(self.classes[1], 1)[0]
+        AttendanceRecord.objects.filter(session=excused, student=self.student).update(status='absent')
+        present = self._create_completed_sessions(self.classes[2], 1)[0]
+        AttendanceRecord.objects.filter(session=present, student=self.student).update(status='present')
+        stale = self._create_completed_sessions(self.classes[2], 1)[0]
+        AttendanceSession.objects.filter(pk=stale.pk).update(end_time=timezone.now() - timedelta(days=3))
+        early = self._create_active_session(self.classes[1])
+        not_enrolled = self._create_active_session(
+            Class.objects.create(class_code='ME001', class_name='Mechanics', semester='Fall 2025', teacher=self.teacher)
+        )
+        scanned_at = timezone.now() - timedelta(seconds=30)
+        at = scanned_at.isoformat()
+
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('sync_offline_scans'), {'scans': [
+            {'session_id': str(active.session_id), 'scanned_at': at},
+            {'session_id': str(completed.session_id), 'scanned_at': at},
+            {'session_id': str(active.session_id), 'scanned_at': at},
+            {'session_id': str(present.session_id), 'scanned_at': at},
+            {'session_id': str(not_enrolled.session_id), 'scanned_at': at},
+            {'session_id': str(uuid.uuid4()), 'scanned_at': at},
+            {'session_id': str(early.session_id), 'scanned_at': (scanned_at - timedelta(hours=2)).isoformat()},
+            {'session_id': str(stale.session_id), 'scanned_at': at},
+            {'session_id': 'not-a-uuid', 'scanned_at': at},
+            {'session_id': str(active.session_id), 'scanned_at': '2025-01-01T09:00:00'},
+            {'session_id': str(active.session_id), 'scanned_at': (scanned_at + timedelta(hours=1)).isoformat()},
+            {'session_id': str(excused.session_id), 'scanned_at': at},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        outcomes = [r['outcome'] for r in response.data['results']]
+        self.assertEqual(outcomes, [
+            'accepted', 'accepted', 'duplicate', 'already_marked', 'not_enrolled', 'session_not_found',
+            'outside_window', 'outside_window', 'invalid', 'invalid', 'invalid', 'marked_by_teacher',
+        ])
+        self.assertEqual(response.data['summary']['accepted'], 2)
+
+        # Both keep the scan time: the new record and the absent mark end_session left
+        for session in (active, completed):
+            record = AttendanceRecord.objects.get(session=session, student=self.student)
+            self.assertEqual(record.status, 'present')
+            self.assertEqual(record.marked_at, max(scanned_at, session.start_time))
+        # A teacher's absent mark stands
+        self.assertEqual(AttendanceRecord.objects.get(session=excused, student=self.student).status, 'absent')
+
+    def test_sync_offline_scans_replace_absences_left_by_end_session(self):
+        session = self._create_active_session(self.classes[0])
+        AttendanceRecord.objects.filter(session=session, student=self.student).delete()
+        scanned_at = timezone.now()
+        self.client.force_authenticate(self.teacher)
+        self.client.post(reverse('end_session', args=[session.session_id]))
+        record = AttendanceRecord.objects.get(session=session, student=self.student)
+        self.assertEqual((record.status, record.auto_marked), ('absent', True))
+
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('sync_offline_scans'), {
+            'scans': [{'session_id': str(session.session_id), 'scanned_at': scanned_at.isoformat()}],
+        }, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'accepted')
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.auto_marked), ('present', False))
+
+    def test_sync_offline_scans_loses_races_to_online_scans(self):
+        session = self._create_active_session(self.classes[0])
+        AttendanceRecord.objects.filter(session=session, student=self.student).delete()
+        scans = {'scans': [{'session_id': str(session.session_id), 'scanned_at': timezone.now().isoformat()}]}
+
+        def scan_online_first(*args):
+            # The online scan lands after the sync read the student's records
+            AttendanceRecord.objects.create(session=session, student=self.student, status='present')
+            return apply(*args)
+
+        apply = views._apply_offline_scans
+        self.client.force_authenticate(self.student)
+        with mock.patch('attendance.views._apply_offline_scans', side_effect=scan_online_first):
+            response = self.client.post(reverse('sync_offline_scans'), scans, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['outcome'], 'already_marked')
+        self.assertNotIn('marked_at', response.data['results'][0])
+        self.assertEqual(AttendanceRecord.objects.filter(session=session, student=self.student).count(), 1)
+
+    def test_sync_offline_scans_rejects_late_uploads_and_compacted_sessions(self):
+        self.client.force_authenticate(self.student)
+        session = self._create_completed_sessions(self.classes[0], 1)[0]
+        AttendanceRecord.objects.filter(session=session, student=self.student).delete()
+        scanned_at = session.start_time
+        AttendanceSession.objects.filter(pk=session.pk).update(end_time=scanned_at)
+        scans = {'scans': [{'session_id': str(session.session_id), 'scanned_at': scanned_at.isoformat()}]}
+        with mock.patch('attendance.views.timezone.now', return_value=scanned_at + timedelta(days=3)):
+            response = self.client.post(reverse('sync_offline_scans'), scans, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'sync_window_closed')
+
+        compact_sessions(AttendanceSession.objects.filter(pk=session.pk))
+        response = self.client.post(reverse('sync_offline_scans'), scans, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'session_finalized')
+
+        response = self.client.post(reverse('sync_offline_scans'), {'scans': [{}]}, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'invalid')
+        self.assertFalse(AttendanceRecord.objects.filter(session=session, student=self.student).exists())
+
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(reverse('sync_offline_scans'), {'scans': [{}]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_sync_offline_scans_close_for_sessions_left_active(self):
+        session = self._create_active_session(self.classes[0])
+        scanned_at = session.start_time
+        AttendanceSession.objects.filter(pk=session.pk).update(end_time=scanned_at + timedelta(minutes=50))
+        scans = {'scans': [{'session_id': str(session.session_id), 'scanned_at': scanned_at.isoformat()}]}
+        self.client.force_authenticate(self.student)
+        with mock.patch('attendance.views.timezone.now', return_value=scanned_at + timedelta(days=3)):
+            response = self.client.post(reverse('sync_offline_scans'), scans, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'sync_window_closed')
+        self.assertFalse(AttendanceRecord.objects.filter(session=session, student=self.student).exists())
+
+
+@FAST_HASHER
+class ManualMarkTests(SmallDatasetMixin, APITestCase):
+
+    def test_bulk_manual_mark_reports_per_item_outcomes(self):
+        other_class_student = Enrollment.objects.exclude(class_obj=self.classes[0]).exclude(
+            student__enrolled_classes__class_obj=self.classes[0]
+        ).first().student
+        marked = AttendanceRecord.objects.filter(session=self.active_session).first()
+        unmarked = Enrollment.objects.filter(class_obj=self.classes[0]).exclude(
+            student__attendance_records__session=self.active_session
+        ).select_related('student__student_profile').first().student
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(
+            reverse('bulk_manual_mark_attendance', args=[self.active_session.session_id]),
+            {'records': [
+                {'student_id': marked.student_id, 'status': 'absent'},
+                {'roll_no': unmarked.student_profile.roll_no, 'status': 'present'},
+                {'student_id': other_class_student.id, 'status': 'present'},
+                {'student_id': marked.student_id, 'status': 'present'},
+                {'student_id': marked.student_id},
+            ]},
+            format='json'
+        )
+        outcomes = [r['outcome'] for r in response.data['results']]
+        self.assertEqual(outcomes, ['updated', 'marked', 'not_enrolled', 'duplicate', 'invalid'])
+        self.assertEqual(AttendanceRecord.objects.get(id=marked.id).status, 'absent')
+        created = AttendanceRecord.objects.get(session=self.active_session, student=unmarked)
+        self.assertEqual(response.data['results'][1]['record_id'], created.id)
+        self.assertEqual(response.data['results'][0]['record_id'], marked.id)
+
+    def test_bulk_manual_mark_survives_a_concurrent_scan(self):
+        student = Enrollment.objects.filter(class_obj=self.classes[0]).exclude(
+            student__attendance_records__session=self.active_session
+        ).first().student
+        set_statuses = views._set_statuses
+
+        def scan_first(session, statuses):
+            # The student scans between the view's read and its write
+            AttendanceRecord.objects.create(session=session, student=student)
+            return set_statuses(session, statuses)
+
+        self.client.force_authenticate(self.teacher)
+        with mock.patch('attendance.views._set_statuses', scan_first):
+            response = self.client.post(
+                reverse('bulk_manual_mark_attendance', args=[self.active_session.session_id]),
+                {'records': [{'student_id': student.id, 'status': 'absent'}]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        record = AttendanceRecord.objects.get(session=self.active_session, student=student)
+        self.assertEqual((record.status, record.id), ('absent', response.data['results'][0]['record_id']))
+
+    def test_bulk_update_attendance_checks_ownership(self):
+        own = AttendanceRecord.objects.filter(session__teacher=self.teacher, status='present')[:3]
+        foreign = AttendanceRecord.objects.filter(session__teacher=self.other_teacher).first()
+        self.client.force_authenticate(self.teacher)
+        response = self.client.put(reverse('bulk_update_attendance'), {'updates': [
+            {'record_id': own[0].id, 'status': 'absent'},
+            {'record_id': own[1].id, 'status': 'absent'},
+            {'record_id': own[2].id, 'status': 'present'},
+            {'record_id': foreign.id, 'status': 'absent'},
+        ]}, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertEqual(response.data['not_found'], [foreign.id])
+        self.assertEqual(response.data['before'], {'present': 3, 'absent': 0})
+        self.assertEqual(response.data['after'], {'present': 1, 'absent': 2})
+        self.assertEqual(AttendanceRecord.objects.get(id=foreign.id).status, foreign.status)
+
+
+@FAST_HASHER
+class TeacherHistoryTests(SmallDatasetMixin, APITestCase):
+
+    def test_history_fields_narrow_output_and_projection(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('teacher_attendance_history')
+        full = self.client.get(url, {'class_id': self.classes[0].id}).data
+        with CaptureQueriesContext(connection) as queries:
+            sparse = self.client.get(url, {'class_id': self.classes[0].id, 'fields': 'status,id'}).data
+        self.assertEqual(set(sparse['attendance'][0]), {'id', 'status'})
+        self.assertEqual(
+            [(r['id'], r['status']) for r in sparse['attendance']],
+            [(r['id'], r['status']) for r in full['attendance']]
+        )
+        self.assertEqual(sparse['statistics'], full['statistics'])
+        records_sql = next(
+            q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT "attendance_records"."id"')
+        )
+        self.assertNotIn('email', records_sql)
+        self.assertNotIn('class_name', records_sql)
+
+        with self.assertNumQueries(3):
+            students = self.client.get(url, {'class_id': self.classes[0].id, 'fields': 'roll_no,student_name'}).data
+        self.assertEqual(
+            students['attendance'][:50], [{'student_name': r['student_name'], 'roll_no': r['roll_no']} for r in full['attendance'][:50]]
+        )
+
+        response = self.client.get(url, {'fields': 'id,nickname'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nickname', response.data['error'])
+
+        self.client.force_authenticate(self.student)
+        with self.assertNumQueries(2):
+            rows = self.client.get(reverse('student_attendance_history'), {'fields': 'class_code,date'}).data['attendance']
+        self.assertEqual(set(rows[0]), {'class_code', 'date'})
+
+    def test_history_normalized_layout(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('teacher_attendance_history')
+        full = self.client.get(url, {'class_id': self.classes[1].id}).data
+        with self.assertNumQueries(5):
+            normalized = self.client.get(url, {'class_id': self.classes[1].id, 'layout': 'normalized'}).data
+        self.assertEqual([c['class_code'] for c in normalized['classes']], [self.classes[1].class_code])
+        self.assertEqual(len(normalized['students']), self.roster_size)
+        classes = {c['id']: c for c in normalized['classes']}
+        students = {s['id']: s for s in normalized['students']}
+        self.assertEqual(len(normalized['attendance']), len(full['attendance']))
+        for row, record in zip(normalized['attendance'], full['attendance']):
+            self.assertEqual(row['id'], record['id'])
+            self.assertEqual(students[row['student_id']]['roll_no'], record['roll_no'])
+            self.assertEqual(classes[row['class_id']]['semester'], record['semester'])
+        self.assertEqual(normalized['statistics'], full['statistics'])
+        response = self.client.get(url, {'layout': 'normalized', 'fields': 'id'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('student_attendance_history'), {'layout': 'normalized'}).data
+        self.assertEqual(len(response['classes']), self.classes_per_teacher)
+        self.assertEqual(response['total'], self.classes_per_teacher * self.sessions_per_class + 1)
+        self.assertNotIn('student_id', response['attendance'][0])
+
+    def test_fast_json_renderer_on_history_payload(self):
+        self.client.force_authenticate(self.teacher)
+        history = self.client.get(reverse('teacher_attendance_history')).data
+        self.client.force_authenticate(self.student)
+        student_history = self.client.get(reverse('student_attendance_history'), {'layout': 'normalized'}).data
+
+        for payload in (history, student_history):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        if BENCHMARKS:
+            timings = {}
+            for renderer in (JSONRenderer(), FastJSONRenderer()):
+                started = time.perf_counter()
+                for _ in range(3):
+                    renderer.render(history)
+                timings[type(renderer).__name__] = (time.perf_counter() - started) / 3
+            self.assertLess(timings['FastJSONRenderer'], timings['JSONRenderer'], timings)
+
+    def test_archived_semester_stays_readable(self):
+        archived_class = self.classes[2]
+        Class.objects.filter(id=archived_class.id).update(semester='Spring 2025')
+        expected = {
+            status_name: AttendanceRecord.objects.filter(
+                student=self.student, session__class_obj=archived_class, status=status_name
+            ).count()
+            for status_name in ('present', 'absent')
+        }
+
+        out = StringIO()
+        call_command('archive_attendance', '--semester', 'Spring 2025', '--chunk-size', '30', stdout=out)
+        self.assertIn(f'Archived {self.sessions_per_class} sessions with {self.sessions_per_class * self.roster_size} records', out.getvalue())
+        self.assertFalse(AttendanceSession.objects.filter(class_obj=archived_class).exists())
+        self.assertEqual(ArchivedAttendanceSession.objects.filter(class_obj=archived_class).count(), self.sessions_per_class)
+        total = ArchivedAttendanceTotal.objects.get(class_obj=archived_class, student=self.student)
+        self.assertEqual((total.present, total.absent), (expected['present'], expected['absent']))
+
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('student_attendance_history'))
+        self.assertNotIn('archived_attendance', response.data)
+        response = self.client.get(reverse('student_attendance_history'), {'include_archived': 'true'})
+        self.assertEqual(response.data['archived_total'], self.sessions_per_class)
+        self.assertEqual({r['semester'] for r in response.data['archived_attendance']}, {'Spring 2025'})
+
+        self.client.force_authenticate(self.teacher)
+        url = reverse('teacher_attendance_history')
+        self.assertEqual(self.client.get(url, {'class_id': archived_class.id}).data['statistics']['total'], 0)
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'class_id': archived_class.id, 'include_archived': 'true'})
+        self.assertEqual(response.data['statistics']['total'], self.sessions_per_class * self.roster_size)
+        self.assertEqual(len(response.data['archived_attendance']), self.sessions_per_class * self.roster_size)
+        self.assertEqual(ArchivedAttendanceRecord.objects.filter(student=self.student).count(), self.sessions_per_class)
+
+
+@FAST_HASHER
+class AttendanceReportTests(SmallDatasetMixin, APITestCase):
+
+    def test_defaulter_report_sorts_students_below_threshold(self):
+        AttendanceRecord.objects.filter(student=self.student, session__class_obj=self.classes[1]).update(status='absent')
+        AttendanceRecord.objects.filter(student=self.student, session__class_obj=self.classes[2]).update(status='present')
+        AttendanceRecord.objects.filter(
+            student=self.student, session__class_obj=self.classes[2], session__in=AttendanceSession.objects.filter(
+                class_obj=self.classes[2]
+            ).order_by('id')[:self.sessions_per_class // 2]
+        ).update(status='absent')
+        self.client.force_authenticate(self.teacher)
+
+        response = self.client.get(reverse('defaulter_report'), {'threshold': 75})
+        rows = [(r['class_id'], r['student_id'], r['percentage']) for r in response.data['defaulters']]
+        self.assertEqual(rows, [(self.classes[1].id, self.student.id, 0.0), (self.classes[2].id, self.student.id, 50.0)])
+        self.assertEqual(response.data['defaulters'][0]['total_sessions'], self.sessions_per_class)
+
+        response = self.client.get(reverse('defaulter_report'), {'threshold': 75, 'class_id': self.classes[2].id})
+        self.assertEqual(response.data['total'], 1)
+
+    def test_class_at_risk_flags_streaks_and_declines(self):
+        class_obj = self.classes[0]
+        records = AttendanceRecord.objects.filter(student=self.student, session__class_obj=class_obj)
+        records.update(status='present')
+        latest = AttendanceSession.objects.filter(
+            class_obj=class_obj, status='completed'
+        ).order_by('-start_time', '-id')[:3]
+        records.filter(session__in=latest).update(status='absent')
+        self.client.force_authenticate(self.teacher)
+
+        response = self.client.get(reverse('class_at_risk_students', args=[class_obj.id]))
+        self.assertEqual(response.data['sessions_analyzed'], self.sessions_per_class)
+        self.assertEqual([s['id'] for s in response.data['students']], [self.student.id])
+        flagged = response.data['students'][0]
+        self.assertEqual(flagged['current_absence_streak'], 3)
+        self.assertEqual(flagged['recent_rate'], 40.0)
+        self.assertEqual(flagged['delta'], -60.0)
+        self.assertEqual(flagged['reasons'], ['absence_streak', 'declining'])
+
+        response = self.client.get(reverse('class_at_risk_students', args=[class_obj.id]), {'streak': 4, 'drop': 70})
+        self.assertEqual(response.data['total'], 0)
+
+        out = StringIO()
+        call_command('report_at_risk_students', '--class-id', str(class_obj.id), stdout=out)
+        self.assertIn(f'Flagged 1 of {self.roster_size} enrolled students', out.getvalue())
+
+
+@FAST_HASHER
+class AdminChangelistBudgetTests(BudgetDatasetMixin, APITestCase):
+
+    def test_every_registered_model_has_a_budget(self):
+        self.assertEqual({m._meta.label_lower for m in admin.site._registry}, set(ADMIN_CHANGELIST_BUDGETS))
+
+    def test_changelists(self):
+        self.client.force_login(self.admin_user)
+        for phase in ('seeded', 'grown'):
+            if phase == 'grown':
+                self.grow_dataset()
+            for model in admin.site._registry:
+                label = model._meta.label_lower
+                url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+                with self.subTest(model=label, phase=phase):
+                    started = time.perf_counter()
+                    with self.assertNumQueries(ADMIN_CHANGELIST_BUDGETS[label]):
+                        response = self.client.get(url)
+                    elapsed = time.perf_counter() - started
+                    self.assertEqual(response.status_code, 200)
+                    if BENCHMARKS:
+                        self.assertLessEqual(elapsed, ADMIN_CHANGELIST_CEILING)
+
+
+class RequestTimingMiddlewareTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='timed', email='timed@example.com', role='teacher', password=TEST_PASSWORD
+        )
+        Class.objects.create(class_code='T100', class_name='Timing', semester='Fall 2025', teacher=cls.teacher)
+
+    def authenticate(self):
+        token = RefreshToken.for_user(self.teacher).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_SAMPLE_RATE=1.0, REQUEST_TIMING_SLOW_MS=60000)
+    def test_emits_server_timing_and_log_line(self):
+        self.authenticate()
+        with self.assertLogs('attendance.timing', level='INFO') as logs:
+            response = self.client.get(reverse('class_list_create'))
+
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'auth;dur=', 'view;dur=', 'render;dur='):
+            self.assertIn(metric, header)
+        self.assertIn('desc="2 queries"', header)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['url_name'], 'class_list_create')
+        self.assertEqual(entry['db_queries'], 2)
+        self.assertEqual(entry['status'], 200)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_untouched(self):
+        self.authenticate()
+        response = self.client.get(reverse('class_list_create'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('ping'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class CompressionMiddlewareTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='zipped', email='zipped@example.com', role='teacher', password=TEST_PASSWORD
+        )
+        cls.class_obj = Class.objects.create(
+            class_code='Z100', class_name='Compression', semester='Fall 2025', teacher=cls.teacher
+        )
+        Enrollment.objects.bulk_create(
+            Enrollment(class_obj=cls.class_obj, student=student)
+            for student in User.objects.bulk_create(
+                User(username=f'zip{n}', email=f'zip{n}@example.com', role='student') for n in range(50)
+            )
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.teacher)
+        self.url = reverse('class_students', args=[self.class_obj.id])
+
+    def test_gzips_large_json_for_clients_that_accept_it(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0.9, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', refused)
+        small = self.client.get(reverse('class_list_create'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', small)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True, REQUEST_TIMING_SAMPLE_RATE=1.0, REQUEST_TIMING_SLOW_MS=60000)
+    def test_cost_is_recorded_in_timing(self):
+        with self.assertLogs('attendance.timing', level='INFO') as logs:
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn('compress;dur=', response['Server-Timing'])
+        self.assertIn('compress_ms', json.loads(logs.records[0].getMessage()))
+
+    @override_settings(RESPONSE_COMPRESSION_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_responses(self):
+        chunks = [b'[', *(b'{"n": %d},' % n for n in range(200)), b'{}]']
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks), content_type='application/json')
+        )
+        response = middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+    def test_negotiation(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'gzip')
+        self.assertIsNone(compression.choose_encoding(''))
+        self.assertEqual(compression.choose_encoding('*'), 'gzip')
+        with mock.patch.object(compression, 'brotli', object()):
+            self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'br')
+            self.assertEqual(compression.choose_encoding('br;q=0.5, gzip'), 'gzip')
+
+
+class IdempotencyKeyTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='retrier', email='retrier@example.com', role='teacher', password=TEST_PASSWORD
+        )
+        cls.student = User.objects.create_user(
+            username='flaky', email='flaky@example.com', role='student', password=TEST_PASSWORD
+        )
+        cls.class_obj = Class.objects.create(
+            class_code='I100', class_name='Idempotency', semester='Fall 2025', teacher=cls.teacher
+        )
+        Enrollment.objects.create(class_obj=cls.class_obj, student=cls.student)
+        cls.session = BudgetDatasetMixin._create_active_session(cls.class_obj)
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_replays_first_response_without_queries(self):
+        self.authenticate(self.student)
+        url = reverse('mark_attendance', args=[self.session.session_id])
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='scan-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(0):
+            replay = self.client.post(url, HTTP_IDEMPOTENCY_KEY='scan-1')
+        self.assertEqual((replay.status_code, replay.content), (201, first.content))
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 1)
+
+        # Without a key a retry runs again
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+    def test_double_submitted_session_is_created_once(self):
+        self.authenticate(self.teacher)
+        data = {'class_id': self.class_obj.id, 'duration_minutes': 15}
+        sessions_before = AttendanceSession.objects.filter(class_obj=self.class_obj).count()
+        responses = [
+            self.client.post(reverse('create_session'), data, format='json', HTTP_IDEMPOTENCY_KEY='create-1')
+            for _ in range(2)
+        ]
+        self.assertEqual([r.status_code for r in responses], [201, 201])
+        self.assertEqual(responses[0].content, responses[1].content)
+        self.assertEqual(AttendanceSession.objects.filter(class_obj=self.class_obj).count(), sessions_before + 1)
+
+        other = dict(data, duration_minutes=20)
+        response = self.client.post(reverse('create_session'), other, format='json', HTTP_IDEMPOTENCY_KEY='create-1')
+        self.assertEqual(response.status_code, 422)
+
+    def test_keys_are_scoped_per_user_and_locked_while_running(self):
+        self.authenticate(self.student)
+        url = reverse('mark_attendance', args=[self.session.session_id])
+        self.client.post(url, HTTP_IDEMPOTENCY_KEY='shared')
+
+        self.authenticate(self.teacher)
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='shared')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+        digest = hashlib.sha256(b'busy').hexdigest()
+        cache.add(f'idempotency:{self.teacher.id}:{digest}:lock', 'x')
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='busy').status_code, 409)
+
+    @override_settings(WEB_CONCURRENCY=2)
+    def test_keys_are_ignored_when_workers_do_not_share_the_cache(self):
+        self.authenticate(self.student)
+        url = reverse('mark_attendance', args=[self.session.session_id])
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='scan-1').status_code, 201)
+        replay = self.client.post(url, HTTP_IDEMPOTENCY_KEY='scan-1')
+        self.assertNotEqual(replay.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', replay)
+        digest = hashlib.sha256(b'scan-1').hexdigest()
+        self.assertIsNone(cache.get(f'idempotency:{self.student.id}:{digest}'))
+
+
+class SessionCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='lecturer', email='lecturer@example.com', role='teacher', password=TEST_PASSWORD
+        )
+        cls.students = []
+        for n in range(3):
+            student = User.objects.create(username=f'warm{n}', email=f'warm{n}@example.com', role='student')
+            StudentProfile.objects.create(student=student, roll_no=f'WARM{n:03d}')
+            cls.students.append(student)
+        cls.class_obj = Class.objects.create(
+            class_code='W100', class_name='Warm Caches', semester='Fall 2025', teacher=cls.teacher
+        )
+        BudgetDatasetMixin._enroll(cls.class_obj, cls.students[:2])
+
+    def setUp(self):
+        cache.clear()
+
+    def create_session(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(
+            reverse('create_session'), {'class_id': self.class_obj.id, 'duration_minutes': 30}, format='json'
+        )
+        return AttendanceSession.objects.get(session_id=response.data['session']['session_id'])
+
+    def poll(self, session):
+        self.client.force_authenticate(self.teacher)
+        return self.client.get(reverse('session_attendance_details', args=[session.session_id])).data
+
+    def scan(self, session, student):
+        self.client.force_authenticate(student)
+        return self.client.post(reverse('mark_attendance', args=[session.session_id]))
+
+    def test_created_session_is_served_from_warm_caches(self):
+        session = self.create_session()
+        with self.assertNumQueries(2):  # already-marked check and insert
+            self.assertEqual(self.scan(session, self.students[0]).status_code, 201)
+        with self.assertNumQueries(1):  # a cached "not enrolled" is confirmed
+            self.assertEqual(self.scan(session, self.students[2]).status_code, 403)
+        with self.assertNumQueries(1):
+            warm = self.poll(session)
+
+        cache.clear()
+        cold = self.poll(session)
+        self.assertEqual(warm, cold)
+        self.assertEqual(cold['session'], SessionSerializer(session).data)
+        self.assertEqual(cold['session']['qr_data']['session_id'], str(session.session_id))
+        self.assertEqual(
+            [(s['id'], s['roll_no'], s['status']) for s in cold['students']],
+            [(s.id, s.student_profile.roll_no, status)
+             for s, status in zip(self.students[:2], ['present', 'absent'])]
+        )
+
+    def test_writes_invalidate_cached_rows(self):
+        session = self.create_session()
+        self.client.force_authenticate(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bulk_enroll_students', args=[self.class_obj.id]), {
+                'emails': [self.students[2].email],
+            }, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(reverse('update_student', args=[self.class_obj.id, self.students[0].id]), {
+                'roll_no': 'WARM-NEW',
+            }, format='json')
+        roster = {s['id']: s['roll_no'] for s in self.poll(session)['students']}
+        self.assertEqual(roster[self.students[0].id], 'WARM-NEW')
+        self.assertIn(self.students[2].id, roster)
+        self.assertEqual(self.scan(session, self.students[2]).status_code, 201)
+
+        self.client.force_authenticate(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('end_session', args=[session.session_id]))
+        response = self.scan(session, self.students[1])
+        self.assertEqual(response.data['error'], 'This session has ended')
+
+    def test_stale_enrollment_caches_are_checked_against_the_database(self):
+        session = self.create_session()
+        # Another worker changed the enrollments; its invalidation did not reach this cache
+        Enrollment.objects.create(class_obj=self.class_obj, student=self.students[2])
+        Enrollment.objects.filter(class_obj=self.class_obj, student=self.students[1]).delete()
+
+        self.assertEqual(self.scan(session, self.students[2]).status_code, 201)
+        with self.assertNumQueries(2):  # the dropped roster is read again, then the already-marked check
+            self.assertEqual(self.scan(session, self.students[2]).status_code, 400)
+        with override_settings(WEB_CONCURRENCY=2):
+            self.assertEqual(self.scan(session, self.students[1]).status_code, 403)
+
+    def test_warm_active_sessions_covers_running_sessions_only(self):
+        running = BudgetDatasetMixin._create_active_session(self.class_obj)
+        expired = BudgetDatasetMixin._create_active_session(self.class_obj)
+        AttendanceSession.objects.filter(pk=expired.pk).update(end_time=timezone.now() - timedelta(minutes=1))
+
+        with self.assertNumQueries(2):  # sessions, then rosters
+            self.assertEqual(warm_active_sessions(), 1)
+        with self.assertNumQueries(1):  # a cached "not enrolled" is confirmed
+            self.assertEqual(self.scan(running, self.students[2]).status_code, 403)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.scan(expired, self.students[0]).status_code, 400)
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='cache',
+    RATE_LIMITS={
+        'scan': '3/min', 'login': '2/min', 'login_account': '4/min', 'login_address': '5/min', 'history': '30/min',
+    },
+)
+class RateLimitTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [
+            User.objects.create_user(
+                username=f'hammer{n}', email=f'hammer{n}@example.com', role='student', password=TEST_PASSWORD
+            )
+            for n in range(2)
+        ]
+        cls.url = reverse('mark_attendance', args=[uuid.uuid4()])
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_scans_are_limited_per_user_before_authentication(self):
+        self.authenticate(self.students[0])
+        statuses = [self.client.post(self.url).status_code for _ in range(3)]
+        self.assertNotIn(429, statuses)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+        self.authenticate(self.students[1])
+        self.assertNotEqual(self.client.post(self.url).status_code, 429)
+
+    def test_logins_are_limited_per_account_and_address(self):
+        url = reverse('token_obtain_pair')
+        data = {'email': self.students[0].email, 'password': 'wrong'}
+        self.assertEqual([self.client.post(url, data).status_code for _ in range(2)], [401, 401])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(url, data).status_code, 429)
+        self.assertEqual(self.client.post(url, {**data, 'email': data['email'].upper()}).status_code, 429)
+        self.assertEqual(self.client.post(url, data, REMOTE_ADDR='10.0.0.9').status_code, 401)
+
+    def test_users_sharing_an_address_log_in_independently(self):
+        url = reverse('token_obtain_pair')
+        # A student who cannot remember their password does not lock out the others
+        wrong = {'email': self.students[0].email, 'password': 'wrong'}
+        self.assertEqual([self.client.post(url, wrong).status_code for _ in range(3)], [401, 401, 429])
+        response = self.client.post(url, {'email': self.students[1].email, 'password': TEST_PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Spraying many accounts from one address still hits the address limit
+        sprayed = [self.client.post(url, {'email': f'spray{n}@example.com', 'password': 'x'}).status_code for n in range(3)]
+        self.assertEqual(sprayed, [401, 401, 429])
+
+    def test_rotating_addresses_still_hits_the_account_limit(self):
+        url = reverse('token_obtain_pair')
+        data = {'email': self.students[0].email, 'password': 'wrong'}
+        statuses = [self.client.post(url, data, REMOTE_ADDR=f'10.0.1.{n}').status_code for n in range(5)]
+        self.assertEqual(statuses, [401, 401, 401, 401, 429])
+        other = {'email': self.students[1].email, 'password': 'wrong'}
+        self.assertEqual(self.client.post(url, other, REMOTE_ADDR='10.0.1.9').status_code, 401)
+
+    @override_settings(RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_clients_behind_a_proxy_are_told_apart(self):
+        url = reverse('token_obtain_pair')
+        data = {'email': self.students[0].email, 'password': 'wrong'}
+        for client_address in ('198.51.100.1', '198.51.100.2'):
+            statuses = [
+                self.client.post(url, data, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=client_address).status_code
+                for _ in range(2)
+            ]
+            self.assertEqual(statuses, [401, 401])
+        # Entries left of the proxy's own hop are client-supplied and ignored
+        spoofed = self.client.post(url, data, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7, 198.51.100.1')
+        self.assertEqual(spoofed.status_code, 429)
+
+    def test_buckets_refill_and_shared_rejections_are_remembered(self):
+        for backend in ('local', 'cache'):
+            limiter = throttling.RateLimiter({'scan': '2/min'}, backend)
+            with mock.patch.object(throttling.time, 'time', return_value=1000.0):
+                self.assertEqual([limiter.check('scan', backend), limiter.check('scan', backend)], [None, None])
+                self.assertAlmostEqual(limiter.check('scan', backend), 30.0)
+            with mock.patch.object(throttling.time, 'time', return_value=1030.0):
+                self.assertIsNone(limiter.check('scan', backend))
+
+        with mock.patch.object(throttling.time, 'time', return_value=1030.0):
+            self.assertIsNotNone(limiter.check('scan', 'cache'))
+            with mock.patch.object(throttling.cache, 'get') as cache_get:
+                self.assertIsNotNone(limiter.check('scan', 'cache'))
+        cache_get.assert_not_called()
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsEndpointTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='metrics', email='metrics@example.com', role='teacher', password=TEST_PASSWORD
+        )
+
+    def test_exposes_route_histograms_and_scan_outcomes(self):
+        self.client.force_authenticate(self.teacher)
+        self.client.get(reverse('class_list_create'))
+        self.client.post(reverse('mark_attendance', args=[uuid.uuid4()]))
+
+        body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+        self.assertIn('attendance_http_request_duration_seconds_bucket{le="0.005",url_name="class_list_create"}', body)
+        self.assertIn('attendance_db_queries_per_request_count{url_name="class_list_create"}', body)
+        self.assertIn('attendance_scans_total{reason="not_student",result="rejected"}', body)
+        self.assertIn('attendance_active_sessions 0.0', body)
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_not_served_without_a_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 404)
+
+
+class GunicornConfigTests(SimpleTestCase):
+
+    def test_workers_write_metrics_to_the_multiprocess_directory(self):
+        # gunicorn loads its config before the app imports prometheus_client
+        script = (
+            'import os, runpy, types\n'
+            "config = runpy.run_path('gunicorn.conf.py')\n"
+            "config['on_starting'](types.SimpleNamespace(cfg=types.SimpleNamespace(workers=2)))\n"
+            'from prometheus_client import Counter\n'
+            "Counter('probe', 'Probe').inc()\n"
+            "print(' '.join(sorted(os.listdir(config['multiproc_dir']))))\n"
+        )
+        env = {k: v for k, v in os.environ.items() if k != 'PROMETHEUS_MULTIPROC_DIR'}
+        with tempfile.TemporaryDirectory() as tmp:
+            env['TMPDIR'] = tmp  # where the config puts its default directory
+            result = subprocess.run(
+                [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                capture_output=True, text=True, check=True,
+            )
+        self.assertRegex(result.stdout, r'\bcounter_\d+\.db\b')
+
+
+class NPlusOneDetectorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create(username='n1', email='n1@example.com', role='teacher')
+        cls.class_obj = Class.objects.create(class_code='N1', class_name='N+1', semester='Fall 2025', teacher=teacher)
+        for n in range(8):
+            student = User.objects.create(username=f'n1s{n}', email=f'n1s{n}@example.com')
+            Enrollment.objects.create(class_obj=cls.class_obj, student=student)
+
+    def lazy_usernames(self, request):
+        names = [str(enrollment) for enrollment in Enrollment.objects.filter(class_obj=self.class_obj)]
+        return HttpResponse(', '.join(names))
+
+    def joined_usernames(self, request):
+        enrollments = Enrollment.objects.filter(class_obj=self.class_obj).select_related('student', 'class_obj')
+        return HttpResponse(', '.join(str(enrollment) for enrollment in enrollments))
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM users WHERE id IN (1, 2, 3) AND email = 'a@b.c' LIMIT 21"),
+            fingerprint("SELECT * FROM users WHERE id IN (4) AND email = 'x@y.z' LIMIT 21"),
+        )
+
+    @override_settings(NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=5)
+    def test_raises_and_names_the_calling_frame(self):
+        middleware = NPlusOneMiddleware(self.lazy_usernames)
+        with self.assertRaises(NPlusOneError) as raised:
+            middleware(RequestFactory().get('/'))
+        self.assertIn('8x from models.py', str(raised.exception))
+        self.assertIn('Enrollment.__str__', str(raised.exception))
+
+    @override_settings(NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=5)
+    def test_joined_queries_pass(self):
+        response = NPlusOneMiddleware(self.joined_usernames)(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NPLUSONE_RAISE=False, NPLUSONE_SAMPLE_RATE=1.0, NPLUSONE_THRESHOLD=5)
+    def test_logs_when_not_raising(self):
+        with self.assertLogs('attendance.nplusone', level='WARNING') as logs:
+            NPlusOneMiddleware(self.lazy_usernames)(RequestFactory().get('/'))
+        self.assertIn('Possible N+1 queries', logs.output[0])
+
+
+class AttendanceAnalyticsTests(SimpleTestCase):
+
+    def test_streaks_and_windows(self):
+        values = np.array([
+            [PRESENT, ABSENT, ABSENT, PRESENT, ABSENT, ABSENT, ABSENT],
+            [NO_RECORD, NO_RECORD, ABSENT, ABSENT, PRESENT, PRESENT, PRESENT],
+            [ABSENT, ABSENT, NO_RECORD, ABSENT, PRESENT, PRESENT, ABSENT],
+        ], dtype=np.int8)
+        longest, current = absence_streaks(values)
+        self.assertEqual(longest.tolist(), [3, 2, 2])
+        self.assertEqual(current.tolist(), [3, 0, 1])
+
+        stats = analyze(values, window=3)
+        self.assertEqual(np.round(stats['recent_rate'], 2).tolist(), [0.0, 100.0, 66.67])
+        self.assertEqual(np.round(stats['previous_rate'], 2).tolist(), [33.33, 0.0, 0.0])
+        self.assertEqual(np.round(stats['attendance_rate'], 2).tolist(), [28.57, 60.0, 33.33])
+
+    def test_build_matrix_ignores_unknown_rows(self):
+        values = build_matrix([5, 3], [20, 10], [(3, 10, 'present'), (5, 20, 'absent'), (7, 10, 'present'), (5, 99, 'absent')])
+        self.assertEqual(values.tolist(), [[ABSENT, NO_RECORD], [NO_RECORD, PRESENT]])
+
+    def test_department_benchmark(self):
+        """A 5,000-student department over 80 sessions: load, analyze and rank well under a second"""
+        students, sessions = 5000, 80
+        rng = np.random.default_rng(0)
+        absent = rng.random((students, sessions)) < 0.2
+        records = [
+            (student_id, session_id, 'absent' if absent[student_id, session_id] else 'present')
+            for student_id in range(students)
+            for session_id in range(sessions)
+        ]
+
+        started = time.perf_counter()
+        values = build_matrix(range(students), range(sessions), records)
+        flagged, stats, _ = at_risk(values)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(values.shape, (students, sessions))
+        self.assertTrue(len(flagged))
+        self.assertLess(elapsed, 0.5, f'analytics took {elapsed:.2f}s for {students * sessions} records')
+
+
+class FastJSONTests(SimpleTestCase):
+
+    payload = {
+        'utc': datetime(2025, 3, 1, 9, 30, 5, 123456, tzinfo=ZoneInfo('UTC')),
+        'offset': datetime(2025, 3, 1, 9, 30, tzinfo=ZoneInfo('Asia/Kolkata')),
+        'naive': datetime(2025, 3, 1, 9, 30),
+        'date': date(2025, 3, 1),
+        'time': dt_time(9, 30, 0, 500),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'decimal': Decimal('87.5'),
+        'lazy': gettext_lazy('Class not found'),
+        'numpy': np.float64(0.25),
+        'text': 'Ünïcode \u2028 line',
+        7: [None, True, 1.5],
+    }
+
+    def test_matches_json_renderer(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, 'application/json; indent=2'),
+            JSONRenderer().render(self.payload, 'application/json; indent=2'),
+        )
+
+    def test_falls_back_on_unencodable_data(self):
+        payload = {'big': 2 ** 70, 'small': -2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        # Floats match in value, not always in form
+        payload = {'large': 1e16, 'rate': 87.5, 'tiny': 1.5e-7}
+        self.assertEqual(json.loads(FastJSONRenderer().render(payload)), json.loads(JSONRenderer().render(payload)))
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"a": [1, "é"]}'.encode())), {'a': [1, 'é']})
+        for body in (b'{"a": NaN}', b'{"a": '):
+            with self.assertRaises(ParseError):
+                parser.parse(BytesIO(body))
+
+
+class LeanSerializationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(
+            username='lean', email='lean@example.com', role='teacher', password=TEST_PASSWORD
+        )
+        class_obj = Class.objects.create(class_code='L100', class_name='Lean', semester='Fall 2025', teacher=cls.teacher)
+        session = BudgetDatasetMixin._create_active_session(class_obj)
+        AttendanceSession.objects.create(
+            class_obj=class_obj, teacher=cls.teacher, duration_minutes=30,
+            end_time=timezone.now(), qr_code_data='not json', status='completed'
+        )
+        students = [
+            User.objects.create(username=f'lean{n}', email=f'lean{n}@example.com', role='student') for n in range(3)
+        ]
+        StudentProfile.objects.create(student=students[0], roll_no='L0001')  # the others have no profile
+        for n, student in enumerate(students):
+            AttendanceRecord.objects.create(session=session, student=student, status='absent' if n else 'present')
+
+    def assertSameOutput(self, layout, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        lean = layout.serialize(layout.values(queryset))
+        self.assertEqual(lean, expected)
+        self.assertEqual(FastJSONRenderer().render(lean), JSONRenderer().render(expected))
+
+    def test_matches_model_serializers(self):
+        records = AttendanceRecord.objects.order_by('id')
+        self.assertSameOutput(TEACHER_HISTORY, TeacherAttendanceHistorySerializer, records)
+        self.assertSameOutput(ATTENDANCE_RECORD, AttendanceRecordSerializer, records)
+        self.assertSameOutput(SESSION, SessionSerializer, AttendanceSession.objects.order_by('id'))
+
+        narrowed = TEACHER_HISTORY.select(['status', 'id'], keep=['marked_at'])
+        self.assertEqual(narrowed.paths, ['id', 'status', 'marked_at'])
+        self.assertEqual(narrowed.serialize(narrowed.values(records))[0], {'id': records[0].id, 'status': 'present'})
+
+    def test_benchmark_against_serializers(self):
+        """Teacher history rows at 1k records; 10k and 100k too, and timed, with BENCHMARKS"""
+        now = timezone.now()
+        class_obj = Class(id=1, class_code='B100', class_name='Bench', semester='Fall 2025', teacher=self.teacher)
+        sessions = [
+            AttendanceSession(id=n, class_obj=class_obj, teacher=self.teacher, start_time=now, end_time=now)
+            for n in range(100)
+        ]
+        students = [User(id=n, username=f'bench{n}', email=f'bench{n}@example.com') for n in range(300)]
+        for n, student in enumerate(students):
+            StudentProfile(student=student, roll_no=f'B{n:05d}')
+
+        for size in (1_000, 10_000, 100_000) if BENCHMARKS else (1_000,):
+            records = [
+                AttendanceRecord(
+                    id=n, session=sessions[n % 100], student=students[n % 300],
+                    status='absent' if n % 5 == 0 else 'present', marked_at=now + timedelta(seconds=n)
+                )
+                for n in range(size)
+            ]
+            rows = TEACHER_HISTORY.from_objects(records)
+
+            started = time.perf_counter()
+            expected = TeacherAttendanceHistorySerializer(records, many=True).data
+            serializer_time = time.perf_counter() - started
+            started = time.perf_counter()
+            lean = TEACHER_HISTORY.serialize(rows)
+            lean_time = time.perf_counter() - started
+
+            self.assertEqual(lean, expected)
+            if BENCHMARKS:
+                self.assertLess(
+                    lean_time * 2, serializer_time,
+                    f'{size} rows: lean {lean_time * 1000:.0f} ms, serializer {serializer_time * 1000:.0f} ms'
+                )
+
+
+class PartitioningTests(TestCase):
+
+    @skipIf(connection.vendor == 'postgresql', 'exercises the fallback on other databases')
+    def test_noop_without_postgresql(self):
+        out = StringIO()
+        call_command('create_attendance_partitions', '--convert', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+        self.assertFalse(partitioning.convert_to_partitioned())
+        self.assertEqual(partitioning.ensure_partitions(), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'partitioning needs PostgreSQL')
+    def test_convert_keeps_rows_and_prunes_by_marked_at(self):
+        teacher = User.objects.create(username='pt', email='pt@example.com', role='teacher')
+        student = User.objects.create(username='ps', email='ps@example.com', role='student')
+        class_obj = Class.objects.create(class_code='PT1', class_name='Part', semester='Fall 2025', teacher=teacher)
+        old = AttendanceSession.objects.create(
+            class_obj=class_obj, teacher=teacher, duration_minutes=50, end_time=timezone.now(), qr_code_data='{}'
+        )
+        record = AttendanceRecord.objects.create(session=old, student=student)
+        AttendanceRecord.objects.filter(id=record.id).update(marked_at=timezone.now() - timedelta(days=120))
+
+        self.assertTrue(partitioning.convert_to_partitioned(months_ahead=1))
+        self.assertTrue(partitioning.is_partitioned())
+        self.assertEqual(AttendanceRecord.objects.get(id=record.id).student_id, student.id)
+        self.assertIn(partitioning.partition_name(timezone.localdate().replace(day=1)), partitioning.ensure_partitions(1))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexdef FROM pg_indexes WHERE tablename = %s', [partitioning.DEFAULT_PARTITION])
+            self.assertIn('UNIQUE INDEX', ' '.join(row[0] for row in cursor.fetchall()))
+
+        # New rows keep numbering after the copied ones
+        new_session = AttendanceSession.objects.create(
+            class_obj=class_obj, teacher=teacher, duration_minutes=50, end_time=timezone.now(), qr_code_data='{}'
+        )
+        self.assertGreater(AttendanceRecord.objects.create(session=new_session, student=student).id, record.id)
+
+        # Without ON CONFLICT, marking updates existing records and inserts the rest
+        other = User.objects.create(username='ps2', email='ps2@example.com', role='student')
+        record_ids = views._set_statuses(new_session, {student.id: 'absent', other.id: 'present'})
+        self.assertEqual(AttendanceRecord.objects.filter(session=new_session).count(), 2)
+        self.assertEqual(AttendanceRecord.objects.get(id=record_ids[student.id]).status, 'absent')
+
+        since = partitioning.marked_since(timezone.localdate() - timedelta(days=7))
+        plan = AttendanceRecord.objects.filter(marked_at__gte=since).explain()
+        old_month = timezone.localdate(timezone.now() - timedelta(days=120)).replace(day=1)
+        self.assertNotIn(partitioning.partition_name(old_month), plan)
@@ -0,0 +1,89 @@
+"""
+Token-bucket rate limiting.
+
+Each (scope, client) pair has a bucket of `count` tokens refilled at
+count/period. It is tracked as a single "theoretical arrival time" (the
+GCRA form of a token bucket), so a check is one read and one write:
+
+- local: a per-process dict. Cheap, but each worker counts on its own.
+- cache: the shared Django cache, so limits hold across workers. Checks
+  are a get and a set, not atomic; concurrent requests can overshoot a
+  limit slightly. A process that has been told to back off remembers it
+  locally and rejects the rest of that window without touching the cache.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600}
+LOCAL_PRUNE_SIZE = 10000
+
+
+def parse_rate(rate):
+    """'20/min' -> (20, 60.0)"""
+    count, _, period = rate.partition('/')
+    return int(count), float(PERIODS[period.strip().lower()])
+
+
+class LocalBuckets:
+    """Arrival times per key in process memory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._arrivals = {}
+
+    def acquire(self, key, count, period, now):
+        """Take a token; returns seconds to wait when the bucket is empty, else None"""
+        interval = period / count
+        with self._lock:
+            arrival = max(self._arrivals.get(key, now), now) + interval
+            if arrival - now > period:
+                return arrival - now - period
+            self._store(key, arrival, now)
+            return None
+
+    def block(self, key, until, now):
+        """Record a shared rejection: blocked_for() reports the wait until `until`"""
+        with self._lock:
+            self._store(key, max(self._arrivals.get(key, 0), until), now)
+
+    def _store(self, key, arrival, now):
+        if len(self._arrivals) >= LOCAL_PRUNE_SIZE:
+            self._arrivals = {k: v for k, v in self._arrivals.items() if v > now}
+        self._arrivals[key] = arrival
+
+    def blocked_for(self, key, period, now):
+        arrival = self._arrivals.get(key)
+        if arrival is not None and arrival - now > period:
+            return arrival - now - period
+        return None
+
+
+class RateLimiter:
+    """Checks requests against RATE_LIMITS scopes using the configured backend"""
+
+    def __init__(self, rates, backend='cache'):
+        self.rates = {scope: parse_rate(rate) for scope, rate in rates.items()}
+        self.shared = backend == 'cache'
+        self.local = LocalBuckets()
+
+    def check(self, scope, ident):
+        """Seconds the client must wait, or None when the request may proceed"""
+        count, period = self.rates[scope]
+        key = f'ratelimit:{scope}:{ident}'
+        now = time.time()
+        if not self.shared:
+            return self.local.acquire(key, count, period, now)
+
+        wait = self.local.blocked_for(key, period, now)
+        if wait is not None:
+            return wait
+        interval = period / count
+        arrival = max(cache.get(key, now), now) + interval
+        if arrival - now > period:
+            wait = arrival - now - period
+            self.local.block(key, arrival, now)
+            return wait
+        cache.set(key, arrival, int(period) + 1)
+        return None
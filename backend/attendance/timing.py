@@ -0,0 +1,96 @@
+"""
+Per-request timing collection.
+
+RequestTimingMiddleware attaches a RequestTimer to sampled requests as
+`request.timer`; other code records phases on it through `timed()`.
+DRF's Request proxies attribute access to the Django request, so the
+same helpers work with either.
+"""
+import time
+from contextlib import contextmanager
+
+
+class RequestTimer:
+    """Accumulates phase durations and database statistics for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.view_started = None
+        self.view_finished = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Install with connection.execute_wrapper() to count and time queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+
+    def finish_view(self):
+        """Close the view phase; safe to call more than once"""
+        if self.view_started is not None and self.view_finished is None:
+            self.view_finished = time.perf_counter()
+            self.add('view', self.view_finished - self.view_started)
+
+    def finish_render(self):
+        if self.view_finished is not None:
+            self.add('render', time.perf_counter() - self.view_finished)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self, total):
+        """Durations in milliseconds, rounded for logging"""
+        data = {
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'db_queries': self.db_queries,
+        }
+        for name, seconds in self.phases.items():
+            data[f'{name}_ms'] = round(seconds * 1000, 2)
+        return data
+
+    def server_timing(self, total):
+        """Value for the Server-Timing response header"""
+        metrics = [
+            f'total;dur={total * 1000:.2f}',
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.db_queries} queries"',
+        ]
+        for name, seconds in self.phases.items():
+            metrics.append(f'{name};dur={seconds * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+def get_timer(request):
+    """Return the request's RequestTimer, or None when it is not being timed"""
+    return getattr(request, 'timer', None)
+
+
+@contextmanager
+def timed(request, name):
+    """Record the enclosed block as phase `name` if the request is being timed"""
+    timer = get_timer(request)
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
@@ -1,13 +1,26 @@
+import base64
+import heapq
+import hmac
 import json
 import uuid
 import re
+from itertools import chain, groupby, islice
+from operator import attrgetter, itemgetter
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Value
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
 from datetime import timedelta
+from prometheus_client import CONTENT_TYPE_LATEST
 
 
 from .serializers import (
@@ -17,14 +30,29 @@ from .serializers import (
     ClassSerializer,
     ClassListSerializer,
     CreateClassSerializer,
+    CloneClassSerializer,
+    RolloverSerializer,
     StudentDetailSerializer,
     CreateSessionSerializer,  
     SessionSerializer,
-    AttendanceRecordSerializer,
     TeacherAttendanceHistorySerializer,
     UpdateAttendanceStatusSerializer,
+    BulkUpdateAttendanceStatusSerializer,
+)
+from .models import (
+    Class, Enrollment, StudentProfile, AttendanceSession, AttendanceRecord, ArchivedAttendanceRecord,
+    CompactRosterStudent, CompactSessionAttendance,
+)
+from .compact import expand, statuses, with_students
+from .idempotency import idempotent
+from .lean import ATTENDANCE_RECORD, SESSION, TEACHER_HISTORY
+from .analytics import at_risk, load_class_matrix, percentage
+from .metrics import record_scan, render_metrics
+from .partitioning import is_partitioned, marked_since
+from .rollups import get_trend, refresh_daily_rollups, refresh_for_sessions
+from .session_cache import (
+    forget_sessions, get_roster, get_session, invalidate_rosters, is_enrolled, warm_session,
 )
-from .models import Class, Enrollment, StudentProfile, AttendanceSession, AttendanceRecord
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -75,6 +103,21 @@ def ping(request):
     return Response({"status": "ok", "message": "Server is running!"})
 
 
+@require_GET
+def metrics(request):
+    """
+    Prometheus text exposition for all workers
+    GET /api/v1/metrics/  (Authorization: Bearer <METRICS_TOKEN>)
+    Not served until METRICS_TOKEN is set: a scrape also counts active sessions
+    """
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
 # ============================================
 # CLASS MANAGEMENT VIEWS
 # ============================================
@@ -97,7 +140,9 @@ def class_list_create(request):
     
     if request.method == 'GET':
         # Get all classes taught by this teacher
-        classes = Class.objects.filter(teacher=user).prefetch_related('enrollments')
+        classes = Class.objects.filter(teacher=user).select_related('teacher').annotate(
+            enrollment_count=Count('enrollments')
+        )
         serializer = ClassListSerializer(classes, many=True)
         return Response({'classes': serializer.data})
     
@@ -139,7 +184,7 @@ def class_detail(request, class_id):
     user = request.user
     
     try:
-        class_obj = Class.objects.get(id=class_id, teacher=user)
+        class_obj = Class.objects.select_related('teacher').get(id=class_id, teacher=user)
     except Class.DoesNotExist:
         return Response(
             {'error': 'Class not found or you do not have permission'},
@@ -179,16 +224,32 @@ def class_detail(request, class_id):
     
     elif request.method == 'DELETE':
         class_name = class_obj.class_name
+        forget_sessions(class_obj.sessions.filter(status='active').values_list('session_id', flat=True))
         class_obj.delete()
+        invalidate_rosters([class_obj.id])
         return Response({
             'message': f'Class "{class_name}" deleted successfully'
         }, status=status.HTTP_204_NO_CONTENT)
 
 
+# Roster fields and the Enrollment paths they are read from
+ROSTER_FIELDS = {
+    'id': 'student_id',
+    'username': 'student__username',
+    'email': 'student__email',
+    'roll_no': 'student__student_profile__roll_no',
+    'enrolled_at': 'enrolled_at',
+}
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_class_students(request, class_id):
-    """Get all students enrolled in a class"""
+    """
+    Get all students enrolled in a class
+    Query params:
+    - fields: comma-separated student fields to return, e.g. id,roll_no (optional)
+    """
     user = request.user
     
     try:
@@ -198,32 +259,23 @@ def get_class_students(request, class_id):
             {'error': 'Class not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+    try:
+        fields = _requested_fields(request, list(ROSTER_FIELDS)) or list(ROSTER_FIELDS)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get all enrollments with student profiles
-    enrollments = Enrollment.objects.filter(
+    # Only the requested columns are selected
+    rows = Enrollment.objects.filter(
         class_obj=class_obj
-    ).select_related('student__student_profile')
+    ).values_list(*(ROSTER_FIELDS[name] for name in fields))
     
     students_data = []
-    for enrollment in enrollments:
-        student = enrollment.student
-        try:
-            profile = student.student_profile
-            students_data.append({
-                'id': student.id,
-                'username': student.username,
-                'email': student.email,
-                'roll_no': profile.roll_no,
-                'enrolled_at': enrollment.enrolled_at
-            })
-        except StudentProfile.DoesNotExist:
-            students_data.append({
-                'id': student.id,
-                'username': student.username,
-                'email': student.email,
-                'roll_no': 'N/A',
-                'enrolled_at': enrollment.enrolled_at
-            })
+    for row in rows:
+        student = dict(zip(fields, row))
+        if 'roll_no' in student and student['roll_no'] is None:
+            student['roll_no'] = 'N/A'  # No student profile
+        students_data.append(student)
     
     return Response({
         'class_code': class_obj.class_code,
@@ -290,6 +342,7 @@ def add_student_to_class(request, class_id):
                     class_obj=class_obj,
                     student=existing_user
                 )
+                invalidate_rosters([class_obj.id])
                 
                 try:
                     roll_no = existing_user.student_profile.roll_no
@@ -351,6 +404,7 @@ def add_student_to_class(request, class_id):
                     class_obj=class_obj,
                     student=student
                 )
+                invalidate_rosters([class_obj.id])
                 
                 return Response({
                     'message': f"New student {student_data['name']} created and enrolled",
@@ -390,6 +444,7 @@ def remove_student_from_class(request, class_id, student_id):
         )
         student_username = enrollment.student.username
         enrollment.delete()
+        invalidate_rosters([class_obj.id])
         
         return Response({
             'message': f'Student {student_username} removed from class'
@@ -402,10 +457,238 @@ def remove_student_from_class(request, class_id, student_id):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def clone_class(request, class_id):
+    """
+    Clone a class with its roster into a new semester
+    POST /api/v1/classes/{class_id}/clone/
+    Body: {"code": "CS101-S26", "semester": "Spring 2026", "name": optional, "include_students": true}
+    """
+    user = request.user
+
+    try:
+        class_obj = Class.objects.select_related('teacher').get(id=class_id, teacher=user)
+    except Class.DoesNotExist:
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    serializer = CloneClassSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    with transaction.atomic():
+        new_class = class_obj.clone(
+            data['code'],
+            data['semester'],
+            class_name=data.get('name'),
+            include_students=data['include_students'],
+        )
+
+    return Response({
+        'message': f'Class {class_obj.class_code} cloned as {new_class.class_code}',
+        'class': ClassListSerializer(new_class).data
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def rollover_classes(request):
+    """
+    Clone many classes with their rosters into a new semester in one transaction
+    POST /api/v1/classes/rollover/
+    Body: {
+        "semester": "Spring 2026",
+        "include_students": true,
+        "classes": [{"class_id": 1, "code": "CS101-S26", "name": optional}]
+    }
+    """
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response(
+            {'error': 'Only teachers can manage classes'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    serializer = RolloverSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    items = data['classes']
+    sources = Class.objects.select_related('teacher').in_bulk(
+        [item['class_id'] for item in items]
+    )
+    missing = [item['class_id'] for item in items
+               if item['class_id'] not in sources or sources[item['class_id']].teacher_id != user.id]
+    if missing:
+        return Response(
+            {'error': f'Classes not found: {missing}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    new_classes = Class.rollover(
+        [(sources[item['class_id']], item['code'], item.get('name')) for item in items],
+        data['semester'],
+        include_students=data['include_students'],
+    )
+
+    return Response({
+        'message': f'{len(new_classes)} classes rolled over to {data["semester"]}',
+        'classes': ClassListSerializer(new_classes, many=True).data
+    }, status=status.HTTP_201_CREATED)
+
+
+BULK_ENROLL_LIMIT = 2000
+
+
+def _parse_student_identifiers(data):
+    """Read the emails / roll_nos lists of a bulk enrollment request"""
+    emails = data.get('emails') or []
+    roll_nos = data.get('roll_nos') or []
+    if not isinstance(emails, list) or not isinstance(roll_nos, list):
+        return None, None, 'emails and roll_nos must be lists'
+    if not emails and not roll_nos:
+        return None, None, 'Provide emails and/or roll_nos'
+    if len(emails) + len(roll_nos) > BULK_ENROLL_LIMIT:
+        return None, None, f'At most {BULK_ENROLL_LIMIT} students per request'
+    return [str(e).strip() for e in emails], [str(r).strip() for r in roll_nos], None
+
+
+def _resolve_students(emails, roll_nos):
+    """
+    Look up users by email or roll number in one query.
+    Returns {identifier: user dict} for every identifier that matched a user.
+    """
+    users = User.objects.filter(
+        Q(email__in=emails) | Q(student_profile__roll_no__in=roll_nos)
+    ).values_list('id', 'username', 'email', 'role', 'student_profile__roll_no')
+
+    found = {}
+    for user_id, username, email, role, roll_no in users:
+        user = {'id': user_id, 'username': username, 'email': email, 'roll_no': roll_no, 'role': role}
+        found[email] = user
+        if roll_no:
+            found[roll_no] = user
+    return found
+
+
+def _group_students(identifiers, found):
+    """Split identifiers into students (deduplicated), not_found and not_student"""
+    students, not_found, not_student = {}, [], []
+    for identifier in identifiers:
+        user = found.get(identifier)
+        if user is None:
+            not_found.append(identifier)
+        elif user['role'] != 'student':
+            not_student.append(identifier)
+        else:
+            students.setdefault(user['id'], {
+                'identifier': identifier,
+                'id': user['id'],
+                'username': user['username'],
+                'email': user['email'],
+                'roll_no': user['roll_no'],
+            })
+    return students, not_found, not_student
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_enroll_students(request, class_id):
+    """
+    Enroll many existing students in a class
+    POST /api/v1/classes/{class_id}/enroll-students/
+    Body: {"emails": ["a@example.com"], "roll_nos": ["CS001"]}
+    """
+    user = request.user
+
+    try:
+        class_obj = Class.objects.get(id=class_id, teacher=user)
+    except Class.DoesNotExist:
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    emails, roll_nos, error = _parse_student_identifiers(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    found = _resolve_students(emails, roll_nos)
+    students, not_found, not_student = _group_students(emails + roll_nos, found)
+
+    already = set(Enrollment.objects.filter(
+        class_obj=class_obj,
+        student_id__in=students
+    ).values_list('student_id', flat=True))
+
+    to_enroll = [sid for sid in students if sid not in already]
+    if to_enroll:
+        Enrollment.objects.bulk_create(
+            [Enrollment(class_obj=class_obj, student_id=sid) for sid in to_enroll],
+            ignore_conflicts=True
+        )
+        invalidate_rosters([class_obj.id])
+
+    return Response({
+        'message': f'{len(to_enroll)} students enrolled in {class_obj.class_code}',
+        'enrolled': [students[sid] for sid in to_enroll],
+        'already_enrolled': [students[sid] for sid in students if sid in already],
+        'not_found': not_found,
+        'not_student': not_student,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_unenroll_students(request, class_id):
+    """
+    Remove many students from a class
+    POST /api/v1/classes/{class_id}/unenroll-students/
+    Body: {"emails": ["a@example.com"], "roll_nos": ["CS001"]}
+    """
+    user = request.user
+
+    try:
+        class_obj = Class.objects.get(id=class_id, teacher=user)
+    except Class.DoesNotExist:
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    emails, roll_nos, error = _parse_student_identifiers(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    found = _resolve_students(emails, roll_nos)
+    students, not_found, not_student = _group_students(emails + roll_nos, found)
+
+    enrollments = Enrollment.objects.filter(class_obj=class_obj, student_id__in=students)
+    enrolled = set(enrollments.values_list('student_id', flat=True))
+    if enrolled:
+        enrollments.delete()
+        invalidate_rosters([class_obj.id])
+
+    return Response({
+        'message': f'{len(enrolled)} students removed from {class_obj.class_code}',
+        'unenrolled': [students[sid] for sid in students if sid in enrolled],
+        'not_enrolled': [students[sid] for sid in students if sid not in enrolled],
+        'not_found': not_found,
+        'not_student': not_student,
+    }, status=status.HTTP_200_OK)
+
+
 # ============================================
 #  SESSION MANAGEMENT VIEWS
 # ============================================
 
+@idempotent
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_session(request):
@@ -464,6 +747,8 @@ def create_session(request):
         qr_code_data=json.dumps(qr_data),
         status='active'
     )
+    # Cache what the first wave of scans and the teacher's polling will read
+    warm_session(session)
     
     response_serializer = SessionSerializer(session)
     return Response({
@@ -489,12 +774,12 @@ def get_active_sessions(request):
         teacher=user,
         status='active',
         end_time__gt=timezone.now()
-    ).select_related('class_obj')
+    )
     
-    serializer = SessionSerializer(sessions, many=True)
+    sessions_data = SESSION.serialize(SESSION.values(sessions))
     return Response({
-        'sessions': serializer.data,
-        'total': sessions.count()
+        'sessions': sessions_data,
+        'total': len(sessions_data)
     })
 
 
@@ -516,19 +801,31 @@ def get_session_details(request, session_id):
         )
     
     # Get attendance records
-    records = AttendanceRecord.objects.filter(session=session).select_related('student')
+    records = AttendanceRecord.objects.filter(session=session)
+    compact = None
+    if session.status == 'completed':
+        # A compacted session has no records left, only its bitmap
+        compact = CompactSessionAttendance.objects.filter(session=session).first()
     
     session_data = SessionSerializer(session).data
-    records_data = AttendanceRecordSerializer(records, many=True).data
+    if compact is not None:
+        records_data = ATTENDANCE_RECORD.serialize(
+            ATTENDANCE_RECORD.from_objects(with_students(expand(compact, session=session)))
+        )
+        total_present = compact.present_count
+    else:
+        records_data = ATTENDANCE_RECORD.serialize(ATTENDANCE_RECORD.values(records))
+        total_present = records.filter(status='present').count()
     
     return Response({
         'session': session_data,
         'attendance': records_data,
-        'total_present': records.filter(status='present').count(),
+        'total_present': total_present,
         'total_students': session.class_obj.student_count
     })
 
 
+@idempotent
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_attendance(request, session_id):
@@ -536,14 +833,16 @@ def mark_attendance(request, session_id):
     user = request.user
     
     if user.role != 'student':
+        record_scan('not_student')
         return Response(
             {'error': 'Only students can mark attendance'},
             status=status.HTTP_403_FORBIDDEN
         )
     
-    try:
-        session = AttendanceSession.objects.get(session_id=session_id)
-    except AttendanceSession.DoesNotExist:
+    # Session state and the enrolled ids come from caches warmed by create_session
+    session = get_session(session_id)
+    if session is None:
+        record_scan('session_not_found')
         return Response(
             {'error': 'Invalid QR code - Session not found'},
             status=status.HTTP_404_NOT_FOUND
@@ -551,6 +850,7 @@ def mark_attendance(request, session_id):
     
     # Check if session is active
     if session.status != 'active':
+        record_scan('session_ended')
         return Response(
             {'error': 'This session has ended'},
             status=status.HTTP_400_BAD_REQUEST
@@ -558,21 +858,24 @@ def mark_attendance(request, session_id):
     
     # Check if session has expired
     if not session.is_active:
+        record_scan('session_expired')
         return Response(
             {'error': f'Session expired at {session.end_time.strftime("%I:%M %p")}'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
     # Check if student is enrolled in the class
-    if not Enrollment.objects.filter(class_obj=session.class_obj, student=user).exists():
+    if not is_enrolled(session.class_obj_id, user.id):
+        record_scan('not_enrolled')
         return Response(
-            {'error': f'You are not enrolled in {session.class_obj.class_code}'},
+            {'error': f'You are not enrolled in {session.class_code}'},
             status=status.HTTP_403_FORBIDDEN
         )
     
     # Check if already marked
-    existing_record = AttendanceRecord.objects.filter(session=session, student=user).first()
+    existing_record = AttendanceRecord.objects.filter(session_id=session.id, student=user).first()
     if existing_record:
+        record_scan('already_marked')
         return Response({
             'error': 'Attendance already marked',
             'marked_at': existing_record.marked_at,
@@ -581,19 +884,225 @@ def mark_attendance(request, session_id):
     
     # Mark attendance
     record = AttendanceRecord.objects.create(
-        session=session,
+        session_id=session.id,
         student=user,
         status='present'
     )
+    record_scan()
     
     return Response({
-        'message': f'Attendance marked for {session.class_obj.class_code}',
-        'class': session.class_obj.class_name,
+        'message': f'Attendance marked for {session.class_code}',
+        'class': session.class_name,
         'marked_at': record.marked_at,
         'status': 'present'
     }, status=status.HTTP_201_CREATED)
 
 
+OFFLINE_SYNC_LIMIT = 200
+# Allowance for device clocks that drift from the server's
+SCAN_CLOCK_SKEW = timedelta(minutes=2)
+# How long after a session ends its offline scans are still accepted
+OFFLINE_SYNC_MAX_AGE = timedelta(hours=48)
+
+
+def _insert_scanned_records(rows):
+    """
+    One multi-row INSERT of (session_id, student_id, marked_at) present records.
+    bulk_create would replace marked_at with the current time (auto_now_add),
+    but offline scans keep the time they were scanned. Rows that collide with
+    a record inserted concurrently (e.g. an online scan) are skipped; returns
+    the session ids that were inserted.
+    """
+    quote = connection.ops.quote_name
+    fields = [AttendanceRecord._meta.get_field(name) for name in ('session', 'student', 'marked_at', 'status', 'auto_marked')]
+    columns = ', '.join(quote(field.column) for field in fields)
+    params = []
+    for session_id, student_id, marked_at in rows:
+        params += [session_id, student_id, connection.ops.adapt_datetimefield_value(marked_at), 'present', False]
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    # No conflict target: a partitioned table's unique index is per partition
+    insert = connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+    suffix = connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{insert} {quote(AttendanceRecord._meta.db_table)} ({columns}) VALUES {placeholders} {suffix} '
+            f'RETURNING {quote(fields[0].column)}',
+            params
+        )
+        return {session_id for session_id, in cursor.fetchall()}
+
+
+@idempotent
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_offline_scans(request):
+    """
+    Student uploads QR scans queued while offline
+    POST /api/v1/attendance/sync/
+    Body: {
+        "scans": [
+            {"session_id": "<uuid from the QR code>", "scanned_at": "2024-01-15T09:05:00+05:30"}
+        ]
+    }
+    A scan is accepted when it falls inside its session's start and end time
+    and arrives within 48 hours of the session ending. It replaces an absent
+    mark left by end_session, but not one the teacher set. Returns one
+    outcome per scan: accepted, invalid, session_not_found, not_enrolled,
+    outside_window, sync_window_closed, session_finalized, already_marked,
+    marked_by_teacher or duplicate
+    """
+    user = request.user
+
+    if user.role != 'student':
+        return Response(
+            {'error': 'Only students can mark attendance'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    scans = request.data.get('scans')
+    if not isinstance(scans, list) or not scans:
+        return Response(
+            {'error': 'scans must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(scans) > OFFLINE_SYNC_LIMIT:
+        return Response(
+            {'error': f'At most {OFFLINE_SYNC_LIMIT} scans per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Validate scan shape before touching the database
+    now = timezone.now()
+    results, parsed = [], []
+    for index, scan in enumerate(scans):
+        result = {'index': index}
+        results.append(result)
+        if not isinstance(scan, dict):
+            result['outcome'] = 'invalid'
+            result['error'] = 'scan must be an object'
+            continue
+        try:
+            session_id = uuid.UUID(str(scan.get('session_id')))
+        except ValueError:
+            result['outcome'] = 'invalid'
+            result['error'] = 'session_id must be a UUID'
+            continue
+        result['session_id'] = str(session_id)
+        try:
+            scanned_at = parse_datetime(str(scan.get('scanned_at') or ''))
+        except ValueError:
+            scanned_at = None
+        if scanned_at is None or timezone.is_naive(scanned_at):
+            result['outcome'] = 'invalid'
+            result['error'] = 'scanned_at must be an ISO 8601 datetime with a UTC offset'
+            continue
+        if scanned_at > now + SCAN_CLOCK_SKEW:
+            result['outcome'] = 'invalid'
+            result['error'] = 'scanned_at is in the future'
+            continue
+        parsed.append((result, session_id, scanned_at))
+
+    # One query each for the sessions, the student's enrollments in their
+    # classes and (locked, below) the student's existing records in them
+    sessions = {
+        session.session_id: session
+        for session in AttendanceSession.objects.filter(
+            session_id__in={session_id for _, session_id, _ in parsed}
+        ).select_related('class_obj').annotate(
+            finalized=_compacted()
+        ).order_by()
+    }
+    enrolled = set(Enrollment.objects.filter(
+        student=user, class_obj_id__in={session.class_obj_id for session in sessions.values()}
+    ).order_by().values_list('class_obj_id', flat=True))
+
+    with transaction.atomic():
+        # Locked until commit, so a teacher's edit cannot land between the
+        # check and the upgrade; new rows race only with other inserts
+        existing = {
+            session_pk: (record_id, record_status, auto_marked)
+            for session_pk, record_id, record_status, auto_marked in AttendanceRecord.objects.select_for_update().filter(
+                student=user, session_id__in=[session.id for session in sessions.values()]
+            ).order_by().values_list('session_id', 'id', 'status', 'auto_marked')
+        }
+        touched = _apply_offline_scans(user, parsed, sessions, enrolled, existing, now)
+        if touched:
+            refresh_for_sessions(touched.values())
+
+    summary = {}
+    for result in results:
+        outcome = result['outcome']
+        summary[outcome] = summary.get(outcome, 0) + 1
+        record_scan(None if outcome == 'accepted' else outcome)
+
+    return Response({
+        'success': True,
+        'message': f'Processed {len(scans)} scans',
+        'summary': summary,
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+def _apply_offline_scans(user, parsed, sessions, enrolled, existing, now):
+    """
+    Set each parsed scan's outcome and write the accepted ones.
+    Returns {session pk: session} of the sessions whose records changed.
+    """
+    new_rows, new_results, upgrades, touched = [], {}, [], {}
+    for result, session_id, scanned_at in parsed:
+        session = sessions.get(session_id)
+        if session is None:
+            result['outcome'] = 'session_not_found'
+            continue
+        result['class_code'] = session.class_obj.class_code
+        if session.class_obj_id not in enrolled:
+            result['outcome'] = 'not_enrolled'
+            continue
+        if session.id in touched:
+            result['outcome'] = 'duplicate'
+            continue
+        if not session.start_time - SCAN_CLOCK_SKEW <= scanned_at <= session.end_time + SCAN_CLOCK_SKEW:
+            result['outcome'] = 'outside_window'
+            continue
+        # Also for sessions the teacher never ended
+        if now > session.end_time + OFFLINE_SYNC_MAX_AGE:
+            result['outcome'] = 'sync_window_closed'
+            continue
+        if session.finalized:
+            result['outcome'] = 'session_finalized'
+            continue
+        record_id, record_status, auto_marked = existing.get(session.id, (None, None, False))
+        if record_status == 'present':
+            result['outcome'] = 'already_marked'
+            continue
+        if record_id is not None and not auto_marked:
+            result['outcome'] = 'marked_by_teacher'
+            continue
+
+        # Clamped so records are never marked before their session started
+        marked_at = max(min(scanned_at, session.end_time), session.start_time)
+        if record_id is None:
+            new_rows.append((session.id, user.id, marked_at))
+            new_results[session.id] = result
+        else:
+            upgrades.append(AttendanceRecord(id=record_id, status='present', marked_at=marked_at, auto_marked=False))
+        result['outcome'] = 'accepted'
+        result['marked_at'] = marked_at
+        touched[session.id] = session
+
+    if new_rows:
+        inserted = _insert_scanned_records(new_rows)
+        # Marked online (or by another sync) since the records were read
+        for session_pk in new_results.keys() - inserted:
+            new_results[session_pk]['outcome'] = 'already_marked'
+            del new_results[session_pk]['marked_at']
+            del touched[session_pk]
+    if upgrades:
+        AttendanceRecord.objects.bulk_update(upgrades, ['status', 'marked_at', 'auto_marked'])
+    return touched
+
+
+@idempotent
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def end_session(request, session_id):
@@ -641,7 +1150,8 @@ def end_session(request, session_id):
                 AttendanceRecord(
                     session=session,
                     student=enrollment.student,
-                    status='absent'
+                    status='absent',
+                    auto_marked=True
                 )
             )
         
@@ -655,6 +1165,8 @@ def end_session(request, session_id):
         session.status = 'completed'
         session.end_time = timezone.now()
         session.save()
+        refresh_for_sessions([session])
+        forget_sessions([session.session_id])
     
     # Get final statistics
     total_students = enrolled_students.count()
@@ -698,7 +1210,9 @@ def get_student_enrolled_classes(request):
     # Get all enrollments for this student
     enrollments = Enrollment.objects.filter(
         student=user
-    ).select_related('class_obj__teacher')
+    ).select_related('class_obj__teacher').annotate(
+        class_student_count=Count('class_obj__enrollments')
+    )
     
     classes_data = []
     for enrollment in enrollments:
@@ -710,7 +1224,7 @@ def get_student_enrolled_classes(request):
             'semester': class_obj.semester,
             'teacher_name': class_obj.teacher.username,
             'teacher_email': class_obj.teacher.email,
-            'student_count': class_obj.student_count,
+            'student_count': enrollment.class_student_count,
             'enrolled_at': enrollment.enrolled_at,
             'created_at': class_obj.created_at,
         })
@@ -721,77 +1235,290 @@ def get_student_enrolled_classes(request):
     })
 
 
+DASHBOARD_RECENT_DEFAULT = 10
+DASHBOARD_RECENT_LIMIT = 100
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
-def get_student_attendance_history(request):
-    """Get attendance history for logged-in student"""
+def get_student_dashboard(request):
+    """
+    Everything the student app shows on launch, in one round trip
+    GET /api/v1/students/dashboard/?recent=10
+    Returns enrolled classes with present/total/percentage and any active
+    session (with whether it is already marked), overall totals and the
+    latest `recent` records. Five queries regardless of history size.
+    """
     user = request.user
-    
+
     if user.role != 'student':
         return Response(
-            {'error': 'Only students can view attendance history'},
+            {'error': 'Only students can view the dashboard'},
             status=status.HTTP_403_FORBIDDEN
         )
-    
-    # Get all attendance records for this student
-    records = AttendanceRecord.objects.filter(
+
+    try:
+        recent_limit = int(request.query_params.get('recent', DASHBOARD_RECENT_DEFAULT))
+    except ValueError:
+        recent_limit = -1
+    if not 0 <= recent_limit <= DASHBOARD_RECENT_LIMIT:
+        return Response(
+            {'error': f'recent must be an integer between 0 and {DASHBOARD_RECENT_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    enrollments = Enrollment.objects.filter(
         student=user
-    ).select_related('session__class_obj').order_by('-marked_at')
-    
-    attendance_data = []
-    for record in records:
-        session = record.session
-        attendance_data.append({
-            'id': record.id,
-            'class_code': session.class_obj.class_code,
-            'class_name': session.class_obj.class_name,
-            'semester': session.class_obj.semester,
-            'date': session.start_time.date(),
-            'time': session.start_time.time(),
-            'status': record.status,
-            'marked_at': record.marked_at,
+    ).select_related('class_obj__teacher').annotate(
+        class_student_count=Count('class_obj__enrollments')
+    )
+
+    # Per-class totals in one grouped aggregate
+    totals = {
+        row['class_id']: [row['present'], row['total']]
+        for row in AttendanceRecord.objects.filter(student=user).values(
+            class_id=F('session__class_obj_id')
+        ).annotate(
+            present=Count('id', filter=Q(status='present')),
+            total=Count('id'),
+        )
+    }
+
+    # Compacted sessions hold the student's marks in their bitmaps, found
+    # through the snapshot index so they outlive the enrollment
+    compact_records = [
+        record
+        for row in CompactSessionAttendance.objects.filter(
+            session__class_obj__compact_roster__student=user
+        ).select_related('session__class_obj')
+        for record in expand(row, student_id=user.id)
+    ]
+    for record in compact_records:
+        class_totals = totals.setdefault(record.session.class_obj_id, [0, 0])
+        class_totals[0] += record.status == 'present'
+        class_totals[1] += 1
+
+    active = {}
+    for session in AttendanceSession.objects.filter(
+        class_obj__enrollments__student=user,
+        status='active',
+        end_time__gt=timezone.now()
+    ).annotate(
+        marked=Exists(AttendanceRecord.objects.filter(session=OuterRef('pk'), student=user))
+    ).order_by('end_time'):
+        active.setdefault(session.class_obj_id, {
+            'session_id': session.session_id,
+            'start_time': session.start_time,
+            'end_time': session.end_time,
+            'already_marked': session.marked,
         })
-    
+
+    classes_data = []
+    for enrollment in enrollments:
+        class_obj = enrollment.class_obj
+        present, total = totals.get(class_obj.id, (0, 0))
+        classes_data.append({
+            'id': class_obj.id,
+            'class_code': class_obj.class_code,
+            'class_name': class_obj.class_name,
+            'semester': class_obj.semester,
+            'teacher_name': class_obj.teacher.username,
+            'student_count': enrollment.class_student_count,
+            'present': present,
+            'total': total,
+            'percentage': round(present / total * 100, 2) if total else 0,
+            'active_session': active.get(class_obj.id),
+        })
+
+    recent = []
+    if recent_limit:
+        live = AttendanceRecord.objects.filter(
+            student=user
+        ).select_related('session__class_obj').order_by('-marked_at')[:recent_limit]
+        compact_records.sort(key=attrgetter('marked_at'), reverse=True)
+        recent = _student_history_rows(islice(
+            heapq.merge(live, compact_records, key=attrgetter('marked_at'), reverse=True), recent_limit
+        ))
+
+    present = sum(c['present'] for c in classes_data)
+    total = sum(c['total'] for c in classes_data)
     return Response({
-        'attendance': attendance_data,
-        'total': len(attendance_data)
+        'classes': classes_data,
+        'summary': {
+            'present': present,
+            'total': total,
+            'percentage': round(present / total * 100, 2) if total else 0,
+            'active_sessions': sum(1 for c in classes_data if c['active_session']),
+        },
+        'recent_attendance': recent,
     })
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
-def check_student_by_email(request):
+def get_student_attendance_history(request):
     """
-    Check if a student exists by email and return their details
-    GET /api/v1/auth/check-student/?email=student@example.com
+    Get attendance history for logged-in student
+    Query params:
+    - date_from: Filter from session date (YYYY-MM-DD) (optional)
+    - date_to: Filter to session date (YYYY-MM-DD) (optional)
+    - include_archived: 'true' to add records of archived semesters as archived_attendance (optional)
+    - fields: comma-separated row fields to return, e.g. class_code,date,status (optional)
+    - layout: 'normalized' to list classes once, with records referring to them by class_id (optional)
     """
-    email = request.query_params.get('email')
+    user = request.user
     
-    if not email:
+    if user.role != 'student':
         return Response(
-            {'error': 'Email parameter is required'},
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': 'Only students can view attendance history'},
+            status=status.HTTP_403_FORBIDDEN
         )
     
-    # Validate email format
-    import re
-    email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    if not re.match(email_pattern, email):
+    try:
+        fields = _requested_fields(request, list(STUDENT_HISTORY_FIELDS))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    normalized = _normalized_layout(request)
+    if normalized and fields:
         return Response(
-            {'error': 'Invalid email format'},
+            {'error': 'fields cannot be combined with layout=normalized'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    try:
-        user = User.objects.get(email=email, role='student')
-        
-        # Try to get student profile
-        try:
-            profile = user.student_profile
-            roll_no = profile.roll_no
-        except StudentProfile.DoesNotExist:
-            roll_no = None
-        
+
+    # Get all attendance records for this student
+    records = _filter_student_history(request, AttendanceRecord.objects.filter(
+        student=user
+    ).select_related('session__class_obj').order_by('-marked_at'))
+
+    # Sessions stored in compact form hold the student's mark in a bitmap;
+    # their roster snapshot, not the current enrollment, says whose they are
+    compact = _filter_student_history(request, CompactSessionAttendance.objects.filter(
+        session__class_obj__compact_roster__student=user
+    ).select_related('session__class_obj'), prune=False)
+    compact_records = sorted(
+        (record for row in compact for record in expand(row, student_id=user.id)),
+        key=attrgetter('marked_at'), reverse=True
+    )
+
+    archived = None
+    if _query_flag(request.query_params.get('include_archived')):
+        archived = _filter_student_history(request, ArchivedAttendanceRecord.objects.filter(
+            student=user
+        ).select_related('session__class_obj').order_by('-marked_at'))
+
+    if normalized:
+        attendance_data = _normalized_rows(records, compact_records, with_student=False)
+        archived_data = _normalized_rows(archived, [], with_student=False) if archived is not None else None
+        response_data = {
+            'classes': _normalized_classes(attendance_data + (archived_data or [])),
+            'attendance': attendance_data,
+            'total': len(attendance_data)
+        }
+    else:
+        selected = {name: STUDENT_HISTORY_FIELDS[name] for name in fields} if fields else STUDENT_HISTORY_FIELDS
+        if fields:
+            # marked_at is always loaded: merging with compact records orders by it
+            paths = {path for name in fields for path in STUDENT_HISTORY_SOURCES[name]} | {'marked_at'}
+            records = _project(records, sorted(paths))
+            if archived is not None:
+                archived = _project(archived, sorted(paths))
+        attendance_data = _student_history_rows(
+            heapq.merge(records, compact_records, key=attrgetter('marked_at'), reverse=True), selected
+        )
+        archived_data = _student_history_rows(archived, selected) if archived is not None else None
+        response_data = {
+            'attendance': attendance_data,
+            'total': len(attendance_data)
+        }
+
+    if archived_data is not None:
+        response_data['archived_attendance'] = archived_data
+        response_data['archived_total'] = len(archived_data)
+    
+    return Response(response_data)
+
+
+def _filter_student_history(request, records, prune=True):
+    """
+    Apply the student history date filters to live, archived or compact rows.
+    prune adds the marked_at bound, for querysets that have marked_at.
+    """
+    from_date = _parse_date(request.query_params.get('date_from'))
+    if from_date:
+        records = records.filter(session__start_time__date__gte=from_date)
+        if prune:
+            records = records.filter(marked_at__gte=marked_since(from_date))  # prunes older partitions
+    to_date = _parse_date(request.query_params.get('date_to'))
+    if to_date:
+        records = records.filter(session__start_time__date__lte=to_date)
+    return records
+
+
+# Student history row fields: how each is read from a record, and the
+# model paths it needs loaded
+STUDENT_HISTORY_FIELDS = {
+    'id': attrgetter('id'),
+    'class_code': attrgetter('session.class_obj.class_code'),
+    'class_name': attrgetter('session.class_obj.class_name'),
+    'semester': attrgetter('session.class_obj.semester'),
+    'date': lambda record: record.session.start_time.date(),
+    'time': lambda record: record.session.start_time.time(),
+    'status': attrgetter('status'),
+    'marked_at': attrgetter('marked_at'),
+}
+STUDENT_HISTORY_SOURCES = {
+    'id': ['id'],
+    'class_code': ['session__class_obj__class_code'],
+    'class_name': ['session__class_obj__class_name'],
+    'semester': ['session__class_obj__semester'],
+    'date': ['session__start_time'],
+    'time': ['session__start_time'],
+    'status': ['status'],
+    'marked_at': ['marked_at'],
+}
+
+
+def _student_history_rows(records, fields=STUDENT_HISTORY_FIELDS):
+    """History rows for live or archived records (both share field names)"""
+    return [{name: read(record) for name, read in fields.items()} for record in records]
+
+
+EMAIL_PATTERN = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+CHECK_STUDENTS_LIMIT = 5000
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def check_student_by_email(request):
+    """
+    Check if a student exists by email and return their details
+    GET /api/v1/auth/check-student/?email=student@example.com
+    """
+    email = request.query_params.get('email')
+    
+    if not email:
+        return Response(
+            {'error': 'Email parameter is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validate email format
+    if not EMAIL_PATTERN.match(email):
+        return Response(
+            {'error': 'Invalid email format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        user = User.objects.select_related('student_profile').get(email=email, role='student')
+        
+        # Try to get student profile
+        try:
+            profile = user.student_profile
+            roll_no = profile.roll_no
+        except StudentProfile.DoesNotExist:
+            roll_no = None
+        
         return Response({
             'exists': True,
             'student': {
@@ -813,6 +1540,69 @@ def check_student_by_email(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def check_students_by_email(request):
+    """
+    Batch version of check_student_by_email
+    POST /api/v1/auth/check-students/
+    Body: {"emails": ["a@example.com", "b@example.com"]}
+    Returns a map keyed by email: {"exists": true, "student": {...}} or {"exists": false}
+    """
+    if request.user.role != 'teacher':
+        return Response(
+            {'error': 'Only teachers can look up students'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    emails = request.data.get('emails')
+
+    if not isinstance(emails, list) or not emails:
+        return Response(
+            {'error': 'emails must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(emails) > CHECK_STUDENTS_LIMIT:
+        return Response(
+            {'error': f'At most {CHECK_STUDENTS_LIMIT} emails per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    valid, invalid = [], []
+    for email in emails:
+        if isinstance(email, str) and EMAIL_PATTERN.match(email):
+            valid.append(email)
+        else:
+            invalid.append(email)
+
+    students = User.objects.filter(
+        email__in=valid,
+        role='student'
+    ).select_related('student_profile')
+
+    results = {email: {'exists': False} for email in valid}
+    for user in students:
+        try:
+            roll_no = user.student_profile.roll_no
+        except StudentProfile.DoesNotExist:
+            roll_no = None
+        results[user.email] = {
+            'exists': True,
+            'student': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'roll_no': roll_no,
+            }
+        }
+
+    return Response({
+        'results': results,
+        'found': sum(1 for r in results.values() if r['exists']),
+        'invalid': invalid,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['PUT'])
 @permission_classes([permissions.IsAuthenticated])
 def update_student_in_class(request, class_id, student_id):
@@ -836,6 +1626,10 @@ def update_student_in_class(request, class_id, student_id):
                 )
             profile.roll_no = roll_no
             profile.save()
+            # The roll number shows on the roster of every class the student is in
+            invalidate_rosters(Enrollment.objects.filter(
+                student_id=student_id
+            ).order_by().values_list('class_obj_id', flat=True))
         
         return Response({'message': 'Student updated successfully'})
     
@@ -856,6 +1650,11 @@ def get_teacher_attendance_history(request):
     - session_id: Filter by specific session (optional)
     - date_from: Filter from date (YYYY-MM-DD) (optional)
     - date_to: Filter to date (YYYY-MM-DD) (optional)
+    - include_archived: 'true' to add records of archived semesters as
+      archived_attendance and count them in the statistics (optional)
+    - fields: comma-separated record fields to return, e.g. id,status,marked_at (optional)
+    - layout: 'normalized' to list classes and students once, with records
+      referring to them by class_id / student_id (optional)
     """
     user = request.user
     
@@ -865,15 +1664,93 @@ def get_teacher_attendance_history(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
+    try:
+        fields = _requested_fields(request, TEACHER_HISTORY.keys)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    normalized = _normalized_layout(request)
+    if normalized and fields:
+        return Response(
+            {'error': 'fields cannot be combined with layout=normalized'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     # Base query: all attendance records for teacher's classes
-    records = AttendanceRecord.objects.filter(
+    records = _filter_teacher_history(request, AttendanceRecord.objects.filter(
         session__teacher=user
-    ).select_related(
-        'student__student_profile',
-        'session__class_obj'
-    ).order_by('-marked_at')
+    ).order_by('-marked_at'))
     
-    # Apply filters
+    # Sessions stored in compact form are expanded and merged in by marked_at
+    compact = list(_filter_teacher_history(request, CompactSessionAttendance.objects.filter(
+        session__teacher=user
+    ).select_related('session__class_obj'), prune=False))
+    compact_records = [record for row in compact for record in expand(row)]
+    compact_records.sort(key=attrgetter('marked_at'), reverse=True)
+
+    if normalized:
+        attendance_rows = _normalized_rows(records, compact_records)
+        response_data = {'attendance': attendance_rows}
+    else:
+        # Rows are read with values_list(); marked_at is always loaded because
+        # merging with compact records orders by it
+        layout = TEACHER_HISTORY.select(fields or TEACHER_HISTORY.keys, keep=['marked_at'])
+        rows = layout.values(records)
+        if compact_records:
+            with_students(compact_records)
+            rows = heapq.merge(
+                rows, layout.from_objects(compact_records), key=itemgetter(layout.index('marked_at')), reverse=True
+            )
+        response_data = {'attendance': layout.serialize(rows)}
+    
+    # Calculate statistics
+    counts = records.aggregate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+    )
+    total_records, present_count, absent_count = counts['total'], counts['present'], counts['absent']
+    for row in compact:
+        present_count += row.present_count
+        absent_count += row.absent_count
+        total_records += row.present_count + row.absent_count
+
+    if _query_flag(request.query_params.get('include_archived')):
+        # Archived records share AttendanceRecord's field names, so the same
+        # filters and row layouts apply
+        archived = _filter_teacher_history(request, ArchivedAttendanceRecord.objects.filter(
+            session__teacher=user
+        ).order_by('-marked_at'))
+        if normalized:
+            response_data['archived_attendance'] = _normalized_rows(archived, [])
+        else:
+            response_data['archived_attendance'] = layout.serialize(layout.values(archived))
+        archived_counts = archived.aggregate(
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+        )
+        present_count += archived_counts['present']
+        absent_count += archived_counts['absent']
+        total_records += archived_counts['present'] + archived_counts['absent']
+
+    if normalized:
+        rows = response_data['attendance'] + response_data.get('archived_attendance', [])
+        response_data['classes'] = _normalized_classes(rows)
+        response_data['students'] = _normalized_students(rows)
+    
+    response_data['statistics'] = {
+        'total': total_records,
+        'present': present_count,
+        'absent': absent_count,
+        'attendance_rate': round((present_count / total_records * 100), 2) if total_records > 0 else 0
+    }
+    return Response(response_data)
+
+
+def _filter_teacher_history(request, records, prune=True):
+    """
+    Apply the teacher history query param filters to live, archived or compact rows.
+    prune adds the marked_at bound, for querysets that have marked_at.
+    """
     class_id = request.query_params.get('class_id')
     if class_id:
         records = records.filter(session__class_obj_id=class_id)
@@ -887,6 +1764,8 @@ def get_teacher_attendance_history(request):
         try:
             from_date = timezone.datetime.strptime(date_from, '%Y-%m-%d').date()
             records = records.filter(session__start_time__date__gte=from_date)
+            if prune:
+                records = records.filter(marked_at__gte=marked_since(from_date))  # prunes older partitions
         except ValueError:
             pass
     
@@ -897,25 +1776,430 @@ def get_teacher_attendance_history(request):
             records = records.filter(session__start_time__date__lte=to_date)
         except ValueError:
             pass
-    
-    serializer = TeacherAttendanceHistorySerializer(records, many=True)
-    
-    # Calculate statistics
-    total_records = records.count()
-    present_count = records.filter(status='present').count()
-    absent_count = records.filter(status='absent').count()
-    
+    return records
+
+
+def _query_flag(value):
+    """True for 'true' / '1' / 'yes' query parameter values"""
+    return (value or '').lower() in ('true', '1', 'yes')
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD query parameter, returning None when absent or invalid"""
+    if not value:
+        return None
+    try:
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _requested_fields(request, allowed):
+    """
+    Names from the comma-separated `fields` query parameter, in `allowed`
+    order; None when absent. Raises ValueError naming unknown fields.
+    """
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(
+            f'Unknown fields: {", ".join(sorted(unknown))}. Allowed: {", ".join(allowed)}'
+        )
+    return [name for name in allowed if name in requested]
+
+
+def _project(records, paths):
+    """Load only the given field paths, following only the relations they cross"""
+    relations = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+    records = records.select_related(None)
+    if relations:  # select_related() with no arguments would follow every foreign key
+        records = records.select_related(*relations)
+    return records.only(*paths)
+
+
+def _normalized_layout(request):
+    """True for layout=normalized, which lists classes and students once"""
+    return request.query_params.get('layout') == 'normalized'
+
+
+def _normalized_rows(records, compact_records, with_student=True):
+    """
+    values() rows for records and expanded compact records, merged newest
+    first, referring to classes (and students) by id.
+    """
+    names = ['id', 'student_id', 'status', 'marked_at'] if with_student else ['id', 'status', 'marked_at']
+    rows = records.values(*names, class_id=F('session__class_obj_id'), session_date=F('session__start_time'))
+    compact_rows = [{
+        'id': None,
+        **({'student_id': record.student_id} if with_student else {}),
+        'status': record.status,
+        'marked_at': record.marked_at,
+        'class_id': record.session.class_obj_id,
+        'session_date': record.session.start_time,
+    } for record in compact_records]
+    return list(heapq.merge(rows, compact_rows, key=itemgetter('marked_at'), reverse=True))
+
+
+def _normalized_classes(rows):
+    class_ids = {row['class_id'] for row in rows}
+    return list(Class.objects.filter(id__in=class_ids).order_by('id').values(
+        'id', 'class_code', 'class_name', 'semester'
+    ))
+
+
+def _normalized_students(rows):
+    student_ids = {row['student_id'] for row in rows}
+    return list(User.objects.filter(id__in=student_ids).order_by('id').values(
+        'id', 'username', 'email',
+        roll_no=Coalesce('student_profile__roll_no', Value('N/A')),
+    ))
+
+
+def _defaulter_values(queryset, class_path):
+    """values() of the defaulter row fields, reaching the class through class_path"""
+    return queryset.values(
+        'student_id',
+        class_id=F(f'{class_path}_id'),
+        class_code=F(f'{class_path}__class_code'),
+        class_name=F(f'{class_path}__class_name'),
+        student_name=F('student__username'),
+        student_email=F('student__email'),
+        roll_no=F('student__student_profile__roll_no'),
+    )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_defaulter_report(request):
+    """
+    Students below an attendance threshold across the teacher's classes
+    Query params:
+    - threshold: percentage, default 75 (optional)
+    - class_id: Filter by specific class (optional)
+    - date_from: Filter from date (YYYY-MM-DD) (optional)
+    - date_to: Filter to date (YYYY-MM-DD) (optional)
+    Computed with one grouped aggregate per (class, student) plus the bitmaps
+    of compacted sessions, sorted by percentage
+    """
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response(
+            {'error': 'Only teachers can view attendance reports'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        threshold = float(request.query_params.get('threshold', 75))
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 <= threshold <= 100:
+        return Response(
+            {'error': 'threshold must be a number between 0 and 100'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Records and compact rows both reach the session through `session`
+    filters = {'session__teacher': user}
+
+    class_id = request.query_params.get('class_id')
+    if class_id:
+        filters['session__class_obj_id'] = class_id
+
+    from_date = _parse_date(request.query_params.get('date_from'))
+    if from_date:
+        filters['session__start_time__date__gte'] = from_date
+
+    to_date = _parse_date(request.query_params.get('date_to'))
+    if to_date:
+        filters['session__start_time__date__lte'] = to_date
+
+    # {(class_id, student_id): [present, total]}, and the row fields of the
+    # pairs that have live records
+    counts, info = {}, {}
+    for row in _defaulter_values(AttendanceRecord.objects.filter(**filters), 'session__class_obj').annotate(
+        present=Count('id', filter=Q(status='present')),
+        total_sessions=Count('id'),
+    ).order_by():
+        key = (row['class_id'], row['student_id'])
+        counts[key] = [row.pop('present'), row.pop('total_sessions')]
+        info[key] = row
+    for student_id, class_pk, record_status in statuses(
+        CompactSessionAttendance.objects.filter(**filters).values_list('session__class_obj_id', 'student_ids', 'present')
+    ):
+        pair = counts.setdefault((class_pk, student_id), [0, 0])
+        pair[0] += record_status == 'present'
+        pair[1] += 1
+
+    below = {key: pair for key, pair in counts.items() if pair[0] * 100 / pair[1] < threshold}
+    missing = below.keys() - info.keys()
+    if missing:
+        # Pairs seen only in compacted sessions, looked up through their roster snapshot
+        for row in _defaulter_values(CompactRosterStudent.objects.filter(
+            class_obj_id__in={class_pk for class_pk, _ in missing},
+            student_id__in={student_id for _, student_id in missing},
+        ), 'class_obj'):
+            info[(row['class_id'], row['student_id'])] = row
+
+    defaulters = []
+    for key, (present, total) in below.items():
+        defaulters.append({**info[key], 'present': present, 'total_sessions': total, 'percentage': present * 100 / total})
+    defaulters.sort(key=lambda row: (row['percentage'], row['class_code'], row['roll_no'] is None, row['roll_no'] or ''))
+    for row in defaulters:
+        row['percentage'] = round(row['percentage'], 2)
+        row['roll_no'] = row['roll_no'] or 'N/A'
+
     return Response({
-        'attendance': serializer.data,
-        'statistics': {
-            'total': total_records,
-            'present': present_count,
-            'absent': absent_count,
-            'attendance_rate': round((present_count / total_records * 100), 2) if total_records > 0 else 0
-        }
+        'threshold': threshold,
+        'defaulters': defaulters,
+        'total': len(defaulters)
     })
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_class_attendance_trend(request, class_id):
+    """
+    Attendance rate per day or week for trend charts, read from the daily rollups
+    Query params:
+    - period: 'day' (default) or 'week' (weeks start on Monday)
+    - date_from / date_to: Filter by local date (YYYY-MM-DD) (optional)
+    Bucket starts are local midnight in TIME_ZONE; results are cached until
+    the class's next session ends or its completed records change.
+    """
+    user = request.user
+
+    if not Class.objects.filter(id=class_id, teacher=user).exists():
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    period = request.query_params.get('period', 'day')
+    if period not in ('day', 'week'):
+        return Response(
+            {'error': 'period must be "day" or "week"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    buckets = get_trend(
+        class_id,
+        period=period,
+        date_from=_parse_date(request.query_params.get('date_from')),
+        date_to=_parse_date(request.query_params.get('date_to')),
+    )
+
+    return Response({
+        'class_id': class_id,
+        'period': period,
+        'timezone': settings.TIME_ZONE,
+        'buckets': buckets,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_class_at_risk_students(request, class_id):
+    """
+    Students on an absence streak or whose attendance is trending down
+    Query params:
+    - streak: consecutive absences up to the latest session, default 3 (optional)
+    - window: sessions per rolling window, default 5 (optional)
+    - drop: percentage-point fall from the previous window to the latest, default 20 (optional)
+    - date_from / date_to: Limit sessions by start date (YYYY-MM-DD) (optional)
+    Computed over completed sessions only, ordered by current streak then delta
+    """
+    user = request.user
+
+    try:
+        class_obj = Class.objects.get(id=class_id, teacher=user)
+    except Class.DoesNotExist:
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        streak = int(request.query_params.get('streak', 3))
+        window = int(request.query_params.get('window', 5))
+        drop = float(request.query_params.get('drop', 20))
+    except ValueError:
+        streak = window = 0
+    if streak < 1 or window < 1 or not 0 <= drop <= 100:
+        return Response(
+            {'error': 'streak and window must be positive integers and drop a number between 0 and 100'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    matrix = load_class_matrix(
+        class_obj,
+        date_from=_parse_date(request.query_params.get('date_from')),
+        date_to=_parse_date(request.query_params.get('date_to')),
+    )
+    flagged, stats, reasons = at_risk(matrix.values, streak=streak, window=window, drop=drop)
+
+    students = []
+    for index in flagged:
+        student_id, username, roll_no = matrix.students[index]
+        students.append({
+            'id': student_id,
+            'username': username,
+            'roll_no': roll_no or 'N/A',
+            'attendance_rate': percentage(stats['attendance_rate'][index]),
+            'recent_rate': percentage(stats['recent_rate'][index]),
+            'previous_rate': percentage(stats['previous_rate'][index]),
+            'delta': percentage(stats['delta'][index]),
+            'longest_absence_streak': int(stats['longest_absence_streak'][index]),
+            'current_absence_streak': int(stats['current_absence_streak'][index]),
+            'reasons': reasons[int(index)],
+        })
+
+    return Response({
+        'class': {
+            'id': class_obj.id,
+            'class_code': class_obj.class_code,
+            'class_name': class_obj.class_name,
+        },
+        'sessions_analyzed': len(matrix.sessions),
+        'streak': streak,
+        'window': window,
+        'drop': drop,
+        'students': students,
+        'total': len(students),
+    })
+
+
+MATRIX_SYMBOLS = {'present': 'P', 'absent': 'A'}
+MATRIX_NO_RECORD = '-'
+MATRIX_ENCODINGS = ('packed', 'chars', 'rle')
+# 2-bit cell values of the packed encoding
+MATRIX_CODES = {MATRIX_NO_RECORD: 0, MATRIX_SYMBOLS['present']: 1, MATRIX_SYMBOLS['absent']: 2}
+
+
+def _run_length(row):
+    """Encode 'PPPAP' as 'P3A1P1'"""
+    return ''.join(f'{symbol}{len(list(run))}' for symbol, run in groupby(row))
+
+
+def _pack_cells(row):
+    """Encode 'PA-P' as base64 of 2 bits per cell, cell i in bits 2*(i % 4) of byte i // 4"""
+    packed = bytearray((len(row) + 3) // 4)
+    for index, symbol in enumerate(row):
+        packed[index >> 2] |= MATRIX_CODES[symbol] << ((index & 3) << 1)
+    return base64.b64encode(packed).decode()
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_class_attendance_matrix(request, class_id):
+    """
+    Register grid of every enrolled student against every session of a class
+    Query params:
+    - encoding: 'packed' (default, base64 of 2 bits per session), 'chars'
+      (one symbol per session) or 'rle' (run-length, e.g. P12A1P3)
+    - date_from / date_to: Limit sessions by start date (YYYY-MM-DD) (optional)
+    Session metadata is sent once; each student's row covers the
+    chronologically ordered sessions: P = present, A = absent, - = no record.
+    Packed rows hold session i in bits 2*(i % 4) of byte i // 4, with
+    0 = no record, 1 = present and 2 = absent
+    """
+    user = request.user
+
+    try:
+        class_obj = Class.objects.get(id=class_id, teacher=user)
+    except Class.DoesNotExist:
+        return Response(
+            {'error': 'Class not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    encoding = request.query_params.get('encoding', 'packed')
+    if encoding not in MATRIX_ENCODINGS:
+        return Response(
+            {'error': 'encoding must be "packed", "chars" or "rle"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    sessions = AttendanceSession.objects.filter(class_obj=class_obj)
+    records = AttendanceRecord.objects.filter(session__class_obj=class_obj)
+
+    from_date = _parse_date(request.query_params.get('date_from'))
+    if from_date:
+        sessions = sessions.filter(start_time__date__gte=from_date)
+        records = records.filter(session__start_time__date__gte=from_date)
+
+    to_date = _parse_date(request.query_params.get('date_to'))
+    if to_date:
+        sessions = sessions.filter(start_time__date__lte=to_date)
+        records = records.filter(session__start_time__date__lte=to_date)
+
+    sessions = list(sessions.order_by('start_time', 'id').values_list('id', 'session_id', 'start_time', 'status'))
+    column = {pk: index for index, (pk, *_) in enumerate(sessions)}
+
+    students = Enrollment.objects.filter(class_obj=class_obj).order_by(
+        'student__student_profile__roll_no', 'student__username'
+    ).values_list('student_id', 'student__username', 'student__student_profile__roll_no')
+    rows = {student_id: bytearray(MATRIX_NO_RECORD.encode() * len(sessions)) for student_id, _, _ in students}
+
+    # Compacted sessions are read after the records, so a session compacted in
+    # between is seen twice (with the same marks) rather than not at all
+    compact = statuses(CompactSessionAttendance.objects.filter(session_id__in=list(column)).values_list(
+        'session_id', 'student_ids', 'present'
+    ))
+    for student_id, session_pk, record_status in chain(
+        records.values_list('student_id', 'session_id', 'status'), compact
+    ):
+        row = rows.get(student_id)
+        index = column.get(session_pk)
+        # Sessions started after the sessions query have no column yet
+        if row is not None and index is not None:
+            row[index] = ord(MATRIX_SYMBOLS[record_status])
+
+    encode = {'packed': _pack_cells, 'chars': str, 'rle': _run_length}[encoding]
+    students_data = []
+    for student_id, username, roll_no in students:
+        row = rows[student_id].decode()
+        students_data.append({
+            'id': student_id,
+            'username': username,
+            'roll_no': roll_no or 'N/A',
+            'present': row.count(MATRIX_SYMBOLS['present']),
+            'attendance': encode(row),
+        })
+
+    legend = {'P': 'present', 'A': 'absent', MATRIX_NO_RECORD: 'no record'}
+    if encoding == 'packed':
+        legend = {MATRIX_CODES[symbol]: meaning for symbol, meaning in legend.items()}
+
+    return Response({
+        'class': {
+            'id': class_obj.id,
+            'class_code': class_obj.class_code,
+            'class_name': class_obj.class_name,
+            'semester': class_obj.semester,
+        },
+        'encoding': encoding,
+        'legend': legend,
+        'sessions': [
+            {'session_id': session_id, 'start_time': start_time, 'status': session_status}
+            for _, session_id, start_time, session_status in sessions
+        ],
+        'students': students_data,
+    })
+
+
+# Compacted sessions keep their attendance in a bitmap and are final: a live
+# record written next to it would be counted twice by history and rollups
+FINALIZED_ERROR = 'Attendance of this session is finalized and can no longer be changed'
+
+
+def _compacted(session_ref='pk'):
+    return Exists(CompactSessionAttendance.objects.filter(session=OuterRef(session_ref)))
+
+
 @api_view(['PUT'])
 @permission_classes([permissions.IsAuthenticated])
 def update_attendance_status(request, record_id):
@@ -930,7 +2214,9 @@ def update_attendance_status(request, record_id):
     
     try:
         # Verify record belongs to teacher's class
-        record = AttendanceRecord.objects.select_related('session').get(
+        record = AttendanceRecord.objects.select_related('session').annotate(
+            finalized=_compacted('session')
+        ).get(
             id=record_id,
             session__teacher=user
         )
@@ -940,6 +2226,9 @@ def update_attendance_status(request, record_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
+    if record.finalized:
+        return Response({'error': FINALIZED_ERROR}, status=status.HTTP_409_CONFLICT)
+    
     serializer = UpdateAttendanceStatusSerializer(data=request.data)
     
     if not serializer.is_valid():
@@ -949,7 +2238,9 @@ def update_attendance_status(request, record_id):
     old_status = record.status
     
     record.status = new_status
+    record.auto_marked = False
     record.save()
+    refresh_for_sessions([record.session])
     
     return Response({
         'message': f'Attendance updated from {old_status} to {new_status}',
@@ -957,6 +2248,82 @@ def update_attendance_status(request, record_id):
     })
 
 
+@api_view(['PUT'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_update_attendance_status(request):
+    """
+    Update the status of many attendance records across sessions (teacher only)
+    PUT /api/v1/attendance/bulk-update/
+    Body: {
+        "updates": [
+            {"record_id": 1, "status": "absent"},
+            {"record_id": 2, "status": "present"}
+        ]
+    }
+    """
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response(
+            {'error': 'Only teachers can update attendance'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    serializer = BulkUpdateAttendanceStatusSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Last entry wins if a record is listed twice
+    targets = {item['record_id']: item['status'] for item in serializer.validated_data['updates']}
+
+    # Verify ownership of the whole set in one query
+    owned = AttendanceRecord.objects.filter(
+        id__in=targets,
+        session__teacher=user
+    ).annotate(finalized=_compacted('session')).values_list(
+        'id', 'status', 'session__class_obj_id', 'session__start_time', 'session__status', 'finalized'
+    )
+
+    current = {}
+    finalized = []
+    before = {'present': 0, 'absent': 0}
+    after = {'present': 0, 'absent': 0}
+    changes = {'present': [], 'absent': []}
+    changed_days = set()
+    for record_id, old_status, class_id, start_time, session_status, is_finalized in owned:
+        if is_finalized:
+            finalized.append(record_id)
+            continue
+        current[record_id] = old_status
+        new_status = targets[record_id]
+        before[old_status] += 1
+        after[new_status] += 1
+        if new_status != old_status:
+            changes[new_status].append(record_id)
+            if session_status == 'completed':
+                changed_days.add((class_id, timezone.localdate(start_time)))
+
+    # One UPDATE ... WHERE id IN (...) per target status
+    updated = 0
+    with transaction.atomic():
+        for new_status, record_ids in changes.items():
+            if record_ids:
+                updated += AttendanceRecord.objects.filter(id__in=record_ids).update(status=new_status, auto_marked=False)
+        refresh_daily_rollups(changed_days)
+
+    return Response({
+        'message': f'Updated {updated} of {len(targets)} records',
+        'updated': updated,
+        'unchanged': len(current) - updated,
+        'not_found': sorted(set(targets) - set(current) - set(finalized)),
+        'finalized': sorted(finalized),
+        'before': before,
+        'after': after,
+    })
+
+
+@idempotent
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def manual_mark_attendance(request, session_id):
@@ -977,7 +2344,7 @@ def manual_mark_attendance(request, session_id):
         )
     
     try:
-        session = AttendanceSession.objects.get(
+        session = AttendanceSession.objects.annotate(finalized=_compacted()).get(
             session_id=session_id,
             teacher=user
         )
@@ -987,6 +2354,9 @@ def manual_mark_attendance(request, session_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
+    if session.finalized:
+        return Response({'error': FINALIZED_ERROR}, status=status.HTTP_409_CONFLICT)
+    
     student_id = request.data.get('student_id')
     new_status = request.data.get('status')
     
@@ -1021,8 +2391,9 @@ def manual_mark_attendance(request, session_id):
     record, created = AttendanceRecord.objects.update_or_create(
         session=session,
         student=student,
-        defaults={'status': new_status}
+        defaults={'status': new_status, 'auto_marked': False}
     )
+    refresh_for_sessions([session])
     
     action = 'marked' if created else 'updated'
     
@@ -1039,23 +2410,76 @@ def manual_mark_attendance(request, session_id):
     }, status=status.HTTP_200_OK)
 
 
-@api_view(['GET'])
+BULK_MARK_LIMIT = 500
+
+
+def _set_statuses(session, statuses):
+    """
+    Give each student in {student_id: status} a record of that status for the
+    session, creating missing ones. Returns {student_id: record_id}.
+    """
+    if not is_partitioned():
+        records = AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(session=session, student_id=student_id, status=record_status)
+                for student_id, record_status in statuses.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['session', 'student'],
+            update_fields=['status', 'auto_marked'],
+        )
+        return {record.student_id: record.id for record in records}
+
+    # A partitioned table only has per-partition unique indexes, which ON
+    # CONFLICT cannot arbitrate: update the existing records and insert the
+    # rest, and go again if a concurrent scan inserted one in between
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                existing = dict(AttendanceRecord.objects.filter(
+                    session=session, student_id__in=statuses
+                ).values_list('student_id', 'id'))
+                for record_status in ('present', 'absent'):
+                    AttendanceRecord.objects.filter(id__in=[
+                        record_id for student_id, record_id in existing.items()
+                        if statuses[student_id] == record_status
+                    ]).update(status=record_status, auto_marked=False)
+                new_records = AttendanceRecord.objects.bulk_create([
+                    AttendanceRecord(session=session, student_id=student_id, status=record_status)
+                    for student_id, record_status in statuses.items()
+                    if student_id not in existing
+                ])
+            return {**existing, **{record.student_id: record.id for record in new_records}}
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+@idempotent
+@api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
-def get_session_attendance_details(request, session_id):
+def bulk_manual_mark_attendance(request, session_id):
     """
-    Get detailed attendance information for a specific session
-    Returns session info + list of all enrolled students with their attendance status
+    Teacher marks attendance for many students of one session at once
+    POST /api/v1/sessions/{session_id}/mark-students/
+    Body: {
+        "records": [
+            {"student_id": 1, "status": "present"},
+            {"roll_no": "CS001", "status": "absent"}
+        ]
+    }
+    Returns one outcome per item: marked, updated, not_enrolled, duplicate or invalid
     """
     user = request.user
-    
+
     if user.role != 'teacher':
         return Response(
-            {'error': 'Only teachers can view session attendance details'},
+            {'error': 'Only teachers can manually mark attendance'},
             status=status.HTTP_403_FORBIDDEN
         )
-    
+
     try:
-        session = AttendanceSession.objects.select_related('class_obj').get(
+        session = AttendanceSession.objects.annotate(finalized=_compacted()).get(
             session_id=session_id,
             teacher=user
         )
@@ -1064,40 +2488,159 @@ def get_session_attendance_details(request, session_id):
             {'error': 'Session not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+    if session.finalized:
+        return Response({'error': FINALIZED_ERROR}, status=status.HTTP_409_CONFLICT)
+
+    items = request.data.get('records')
+    if not isinstance(items, list) or not items:
+        return Response(
+            {'error': 'records must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > BULK_MARK_LIMIT:
+        return Response(
+            {'error': f'At most {BULK_MARK_LIMIT} records per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Validate item shape before touching the database
+    student_ids, roll_nos = set(), set()
+    for item in items:
+        if not isinstance(item, dict) or item.get('status') not in ('present', 'absent'):
+            continue
+        if item.get('student_id') is not None:
+            try:
+                student_ids.add(int(item['student_id']))
+            except (TypeError, ValueError):
+                pass
+        elif item.get('roll_no'):
+            roll_nos.add(str(item['roll_no']))
+
+    # Resolve every referenced student against the class roster in one query
+    enrolled = Enrollment.objects.filter(class_obj_id=session.class_obj_id).filter(
+        Q(student_id__in=student_ids) | Q(student__student_profile__roll_no__in=roll_nos)
+    ).values_list('student_id', 'student__student_profile__roll_no', 'student__username')
+    by_id, by_roll_no = {}, {}
+    for student_id, roll_no, username in enrolled:
+        by_id[student_id] = username
+        if roll_no:
+            by_roll_no[roll_no] = student_id
+
+    existing = dict(AttendanceRecord.objects.filter(
+        session=session, student_id__in=by_id
+    ).values_list('student_id', 'id'))
+
+    results = []
+    pending = {}
+    for index, item in enumerate(items):
+        result = {'index': index}
+        results.append(result)
+        if not isinstance(item, dict) or item.get('status') not in ('present', 'absent'):
+            result['outcome'] = 'invalid'
+            result['error'] = 'status must be "present" or "absent"'
+            continue
+        if item.get('student_id') is not None:
+            try:
+                student_id = int(item['student_id'])
+            except (TypeError, ValueError):
+                result['outcome'] = 'invalid'
+                result['error'] = 'student_id must be an integer'
+                continue
+        elif item.get('roll_no'):
+            student_id = by_roll_no.get(str(item['roll_no']))
+        else:
+            result['outcome'] = 'invalid'
+            result['error'] = 'student_id or roll_no is required'
+            continue
+
+        if student_id not in by_id:
+            result['outcome'] = 'not_enrolled'
+            continue
+        result['student_id'] = student_id
+        if student_id in pending:
+            result['outcome'] = 'duplicate'
+            continue
+
+        result['student_name'] = by_id[student_id]
+        result['status'] = item['status']
+        result['outcome'] = 'updated' if student_id in existing else 'marked'
+        pending[student_id] = result
+
+    if pending:
+        with transaction.atomic():
+            record_ids = _set_statuses(session, {
+                student_id: result['status'] for student_id, result in pending.items()
+            })
+            refresh_for_sessions([session])
+        for student_id, result in pending.items():
+            result['record_id'] = record_ids[student_id]
+
+    summary = {}
+    for result in results:
+        summary[result['outcome']] = summary.get(result['outcome'], 0) + 1
+
+    return Response({
+        'success': True,
+        'message': f'Processed {len(items)} records',
+        'summary': summary,
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def get_session_attendance_details(request, session_id):
+    """
+    Get detailed attendance information for a specific session
+    Returns session info + list of all enrolled students with their attendance status
+    """
+    user = request.user
     
-    # Get all enrolled students
-    enrollments = Enrollment.objects.filter(
-        class_obj=session.class_obj
-    ).select_related('student__student_profile')
+    if user.role != 'teacher':
+        return Response(
+            {'error': 'Only teachers can view session attendance details'},
+            status=status.HTTP_403_FORBIDDEN
+        )
     
-    # Get attendance records for this session
-    attendance_records = AttendanceRecord.objects.filter(
-        session=session
-    ).select_related('student')
+    # Polled while the session runs: the session and roster come from caches
+    # warmed by create_session, so only the records are read each time
+    session = get_session(session_id)
+    if session is None or session.teacher_id != user.id:
+        return Response(
+            {'error': 'Session not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    # Create a map of student_id -> attendance record
-    attendance_map = {record.student_id: record for record in attendance_records}
+    # Map of student_id -> (record id, status, marked_at)
+    attendance_map = {
+        student_id: record
+        for student_id, *record in AttendanceRecord.objects.filter(
+            session_id=session.id
+        ).order_by().values_list('student_id', 'id', 'status', 'marked_at')
+    }
+    if not attendance_map and session.status == 'completed':
+        # Compacted sessions keep their marks in a bitmap, without record ids
+        compact = CompactSessionAttendance.objects.select_related('session').filter(session_id=session.id).first()
+        if compact is not None:
+            attendance_map = {
+                record.student_id: (None, record.status, record.marked_at) for record in expand(compact)
+            }
     
     # Build student list with attendance status
     students_data = []
-    for enrollment in enrollments:
-        student = enrollment.student
-        record = attendance_map.get(student.id)
-        
-        try:
-            roll_no = student.student_profile.roll_no
-        except StudentProfile.DoesNotExist:
-            roll_no = 'N/A'
+    for student_id, username, email, roll_no in get_roster(session.class_obj_id):
+        record_id, record_status, marked_at = attendance_map.get(student_id, (None, None, None))
         
         students_data.append({
-            'id': student.id,
-            'username': student.username,
-            'email': student.email,
-            'roll_no': roll_no,
-            'status': record.status if record else 'absent',
-            'marked_at': record.marked_at.isoformat() if record and record.marked_at else None,
-            'record_id': record.id if record else None,
-            'has_record': record is not None
+            'id': student_id,
+            'username': username,
+            'email': email,
+            'roll_no': 'N/A' if roll_no is None else roll_no,
+            'status': record_status or 'absent',
+            'marked_at': marked_at.isoformat() if marked_at else None,
+            'record_id': record_id,
+            'has_record': record_status is not None
         })
     
     # Calculate statistics
@@ -1107,7 +2650,7 @@ def get_session_attendance_details(request, session_id):
     attendance_rate = round((present_count / total_students * 100), 2) if total_students > 0 else 0
     
     return Response({
-        'session': SessionSerializer(session).data,
+        'session': session.data(),
         'students': students_data,
         'statistics': {
             'total': total_students,
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings, picked up automatically from the working directory.
+
+Metrics from every worker are written to PROMETHEUS_MULTIPROC_DIR so the
+/api/v1/metrics/ endpoint can aggregate them, whichever worker serves it.
+Each worker warms the caches of sessions already running before it takes
+requests, so a deploy mid-lecture does not send every scan to the database.
+The worker count is exported as WEB_CONCURRENCY, which settings read to tell
+whether the default cache has to be shared between workers.
+"""
+import os
+import shutil
+import tempfile
+
+# Set before anything imports prometheus_client: the value class (per-process
+# files or in-memory) is picked once, at import time
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'attendance-metrics')
+)
+
+
+def on_starting(server):
+    # Stale files from a previous run would be summed into the new counters
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+    # Workers are forked after this and inherit it (covers --workers too)
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # The app (and so Django) is loaded by now. A failure only costs a cold
+    # cache, so it must not keep the worker from serving
+    from attendance.session_cache import warm_active_sessions
+
+    try:
+        warmed = warm_active_sessions()
+    except Exception:
+        worker.log.exception('Warming active session caches failed')
+    else:
+        worker.log.info('Warmed caches for %d active sessions', warmed)